@@ -1,239 +1,3249 @@
+import time
+STARTUP_STARTED = time.perf_counter()
+
 import os
+import csv
+import hashlib
 import json
+import marshal
+import numpy as np
+import random
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Comment, NavigableString
 import re
-from flask import Flask, jsonify, render_template_string, send_file
-from datetime import datetime
+import sqlite3
+import tempfile
+import unicodedata
+import zlib
+from flask import Flask, Response, g, jsonify, render_template, send_file, request
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
 import threading
-import time
-import pandas as pd
-from io import BytesIO
+import uuid
+import heapq
+import itertools
+import math
+import multiprocessing
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from collections.abc import Mapping
+from contextlib import closing, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from io import BytesIO, StringIO
+# openpyxl importeras först vid Excel-export - bara den tar ~0.1 s av uppstarten. numpy
+# importeras direkt: indexet i minnet (FacetIndex) skapas redan när modulen laddas.
+
+app = Flask(__name__)
+
+# Uppstartens faser (sekunder) - skrivs ut när artiklarna laddats och visas i /health
+startup_timings = {}
+
+@contextmanager
+def startup_phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round(time.perf_counter() - start, 3)
+
+# Mätvärden i Prometheus-textformat (/metrics). Räknas per process; med
+# flera gunicorn-workers syns scrapingens siffror hos den som scrapar.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+class Counter:
+    TYPE = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        METRICS.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+class Gauge(Counter):
+    TYPE = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self.lock:
+            self.values[key] = value
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # etiketter -> [antal per hink, summa, antal]
+        self.lock = threading.Lock()
+        METRICS.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ('le',)
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                for bound, cumulative in zip(self.buckets, itertools.accumulate(counts)):
+                    lines.append(f"{self.name}_bucket{format_labels(names, key + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{format_labels(names, key + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, key)} {count}")
+        return lines
+
+METRICS = []
+
+SCRAPE_STAGE_SECONDS = Histogram(
+    'laundry_scrape_stage_seconds',
+    'Tid per scrapingsteg: fetch per förfrågan, classify per artikel, link_match per '
+    'uppslag, övriga per sida. Nästlade steg räknas inte dubbelt.',
+    labels=('stage',))
+SCRAPE_HTTP_RESPONSES = Counter('laundry_scrape_http_responses_total', 'Svar vid hämtning (listsidor och källor) per HTTP-status', labels=('status',))
+SCRAPE_FETCH_ERRORS = Counter('laundry_scrape_fetch_errors_total', 'Hämtningar som misslyckades utan svar (timeout, anslutningsfel)')
+SCRAPE_RETRIES = Counter('laundry_scrape_retries_total', 'Omförsök vid hämtning per orsak (status eller fel)', labels=('reason',))
+SCRAPE_REQUEST_RATE = Gauge('laundry_scrape_request_rate', 'Aktuell takt (förfrågningar/s) per värd', labels=('host',))
+SCRAPE_BYTES = Counter('laundry_scrape_downloaded_bytes_total', 'Nedladdade bytes (svarskroppar)')
+SCRAPE_ARTICLES_PER_PAGE = Histogram('laundry_scrape_articles_per_page', 'Nya artiklar per hämtad sida',
+                                     buckets=(0, 1, 2, 5, 10, 15, 20, 30, 50))
+ENRICH_SOURCES = Counter('laundry_enrich_sources_total', 'Hämtade artikelkällor per utfall', labels=('outcome',))
+HTTP_REQUEST_SECONDS = Histogram('laundry_http_request_seconds', 'Svarstid per Flask-vy (till första byte)',
+                                 labels=('endpoint', 'method', 'status'))
+
+_stage_stack = threading.local()
+
+@contextmanager
+def scrape_stage(stage):
+    """Mät ett scrapingsteg; tid i nästlade steg dras av från det yttre steget"""
+    stack = getattr(_stage_stack, 'frames', None)
+    if stack is None:
+        stack = _stage_stack.frames = []
+    frame = [0.0]  # tid i nästlade steg
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+        observed = getattr(_stage_stack, 'observed', None)
+        if observed is not None:
+            observed.append((stage, elapsed - frame[0]))  # i en parsningsprocess - skickas tillbaka
+        else:
+            SCRAPE_STAGE_SECONDS.observe(elapsed - frame[0], stage=stage)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'okänd',
+                                     method=request.method, status=response.status_code)
+    return response
+
+# Status för scrapingen i den här processen - delas med övriga workers via ScrapeCoordinator
+scrape_status = {
+    "is_scraping": False,
+    "completed": False,
+    "progress": "Inte startad",
+    "current_page": 0,
+    "total_articles": 0,
+    "error": None,
+    "resumed": False,
+    "resumed_from_page": None
+}
+
+MAX_PAGES = 657  # Totalt antal sidor
+BASE_URL = "https://thelaundrynews.com/"
+
+# Parallell hämtning - antal trådar och förfrågningar per sekund och värd.
+# SCRAPE_RATE är starttakten; den justeras efter hur sajten svarar, mellan
+# SCRAPE_RATE_MIN och SCRAPE_RATE * SCRAPE_RATE_HEADROOM.
+SCRAPE_WORKERS = int(os.environ.get('SCRAPE_WORKERS', 8))
+SCRAPE_RATE = float(os.environ.get('SCRAPE_RATE', 5))
+SCRAPE_RATE_MIN = 0.2
+SCRAPE_RATE_HEADROOM = 4
+SCRAPE_TIMEOUT = 10
+
+# Omförsök per förfrågan: exponentiell backoff med jitter, Retry-After respekteras
+SCRAPE_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+RETRY_AFTER_MAX = 120           # längre Retry-After än så kortas av
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Sidor som fortfarande misslyckas läggs i en kö och hämtas om efter att
+# resten är klart, i upp till SCRAPE_RETRY_ROUNDS omgångar med ökande paus
+SCRAPE_RETRY_ROUNDS = 3
+SCRAPE_RETRY_ROUND_DELAY = 10
+PAGE_POSITIONS = 1000  # positioner per sida inom en körning
+
+class RateLimiter:
+    """Trådsäker begränsare per värd som anpassar takten efter svaren (AIMD).
+
+    Varje svar med normal svarstid höjer takten med 1/takt, dvs. ungefär
+    ett steg per sekund. Fel (429/5xx, timeouts) eller en glidande svarstid
+    över LATENCY_TOLERANCE gånger den lägsta uppmätta halverar den, högst
+    en gång per BACKOFF_COOLDOWN så att en skur samtidiga fel räknas som
+    ett. Retry-After pausar hela värden. rate <= 0 betyder obegränsat.
+    """
+
+    LATENCY_TOLERANCE = 3.0
+    BACKOFF_COOLDOWN = 1.0
+
+    def __init__(self, rate, min_rate=SCRAPE_RATE_MIN, max_rate=None, name=''):
+        self.rate = rate
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0
+        self.max_rate = max_rate or rate * SCRAPE_RATE_HEADROOM
+        self.name = name
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+        self.latency = None        # glidande medelvärde
+        self.best_latency = None   # golv som långsamt följer med uppåt
+        self.backed_off_at = 0.0
+        SCRAPE_REQUEST_RATE.set(rate, host=name)
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + (1.0 / self.rate if self.rate > 0 else 0.0)
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Inga nya förfrågningar mot värden på `seconds` sekunder"""
+        with self.lock:
+            self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+    def success(self, latency):
+        with self.lock:
+            if self.latency is None:
+                self.latency = self.best_latency = latency
+            else:
+                self.latency = 0.8 * self.latency + 0.2 * latency
+                self.best_latency = min(latency, self.best_latency + 0.05 * (latency - self.best_latency))
+            if self.latency > self.LATENCY_TOLERANCE * self.best_latency:
+                self._back_off()
+            elif self.rate > 0:
+                self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+                SCRAPE_REQUEST_RATE.set(round(self.rate, 3), host=self.name)
+
+    def failure(self):
+        with self.lock:
+            self._back_off()
+
+    def _back_off(self):
+        now = time.monotonic()
+        if self.rate <= 0 or now - self.backed_off_at < self.BACKOFF_COOLDOWN:
+            return
+        self.backed_off_at = now
+        self.rate = max(self.min_rate, self.rate / 2)
+        SCRAPE_REQUEST_RATE.set(round(self.rate, 3), host=self.name)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(url, rate=None):
+    """En gemensam begränsare per värd så att vi är artiga mot varje sajt"""
+    host = urlsplit(url).netloc
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(host)
+        if limiter is None:
+            limiter = _rate_limiters[host] = RateLimiter(SCRAPE_RATE if rate is None else rate, name=host)
+        return limiter
+
+def create_session(pool_size=SCRAPE_WORKERS, hosts=4):
+    """Skapa en requests.Session som delas mellan trådarna: en pool med
+    `pool_size` anslutningar per värd, för upp till `hosts` värdar"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=max(pool_size, 1))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = 'Mozilla/5.0'
+    return session
+
+def page_url(page):
+    return f"{BASE_URL}page/{page}/" if page > 1 else BASE_URL
+
+def write_json_atomic(path, data):
+    """Skriv JSON via temporärfil + rename så att filen aldrig blir halvskriven"""
+    write_bytes_atomic(path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+def write_bytes_atomic(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+# ETag/Last-Modified per sid-URL för villkorliga GET i inkrementellt läge
+VALIDATORS_FILE = 'page_validators.json'
+
+def load_page_validators():
+    if os.path.exists(VALIDATORS_FILE):
+        try:
+            with open(VALIDATORS_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Kunde inte ladda {VALIDATORS_FILE}: {e}")
+    return {}
+
+def save_page_validators(validators):
+    write_json_atomic(VALIDATORS_FILE, validators)
+
+def remember_validators(validators, url, response):
+    """Spara ETag/Last-Modified från ett 200-svar"""
+    entry = {}
+    if response.headers.get('ETag'):
+        entry['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        entry['last_modified'] = response.headers['Last-Modified']
+    if entry:
+        validators[url] = entry
+    else:
+        validators.pop(url, None)
+
+def retry_after_seconds(response):
+    """Retry-After i sekunder (heltal eller HTTP-datum), None om den saknas eller är ogiltig"""
+    value = response.headers.get('Retry-After', '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+def backoff_delay(attempt):
+    """Full jitter: slumpad väntan upp till base * 2^attempt (med tak)"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def fetch_page(session, page, validators=None, attempts=SCRAPE_ATTEMPTS):
+    """Hämta en listsida (respekterar och justerar värdens takt).
+
+    Med `validators` skickas If-None-Match/If-Modified-Since så att en
+    oförändrad sida besvaras med 304 utan innehåll. Omförsök som i fetch_url.
+    """
+    url = page_url(page)
+    headers = {}
+    entry = (validators or {}).get(url)
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return fetch_url(session, url, headers, attempts)
+
+def fetch_url(session, url, headers=None, attempts=SCRAPE_ATTEMPTS, limiter=None, stage='fetch', stream=False):
+    """GET med värdens takt (`limiter`, standard get_rate_limiter(url)).
+
+    Timeouts, anslutningsfel och RETRYABLE_STATUS försöks igen upp till
+    `attempts` gånger med backoff; sedan kastas felet eller returneras det
+    sista svaret. Med stream=True har bara huvudet lästs när svaret
+    returneras - anroparen läser kroppen och stänger svaret.
+    """
+    limiter = limiter or get_rate_limiter(url)
+    for attempt in range(attempts):
+        limiter.wait()
+        start = time.perf_counter()
+        try:
+            with scrape_stage(stage):
+                response = session.get(url, timeout=SCRAPE_TIMEOUT, headers=headers, stream=stream)
+        except requests.RequestException as e:
+            SCRAPE_FETCH_ERRORS.inc()
+            limiter.failure()
+            if attempt + 1 == attempts:
+                raise
+            SCRAPE_RETRIES.inc(reason=type(e).__name__)
+            time.sleep(backoff_delay(attempt))
+            continue
+        SCRAPE_HTTP_RESPONSES.inc(status=response.status_code)
+        if not stream:
+            SCRAPE_BYTES.inc(len(response.content))
+        if response.status_code not in RETRYABLE_STATUS:
+            limiter.success(time.perf_counter() - start)
+            return response
+        limiter.failure()
+        if attempt + 1 == attempts:
+            return response
+        response.close()
+        SCRAPE_RETRIES.inc(reason=str(response.status_code))
+        retry_after = retry_after_seconds(response)
+        if retry_after is not None:
+            # Servern har sagt hur länge - gäller alla trådar mot värden
+            limiter.pause(retry_after)
+        time.sleep(max(retry_after or 0.0, backoff_delay(attempt)))
+
+def iter_pages_in_order(session, pages, workers=SCRAPE_WORKERS, validators=None, fetch=None):
+    """Hämta sidor parallellt men leverera (sida, resultat, fel) i sidordning.
+
+    Resultatet är det `fetch` (standard fetch_page) ger för sidan. Håller
+    högst 2*workers förfrågningar i luften. Om konsumenten avbryter (t.ex.
+    vid sista sidan) avbryts de väntande hämtningarna.
+    """
+    fetch = fetch or fetch_page
+    pages = iter(pages)
+    window = max(workers, 1) * 2
+    pool = ThreadPoolExecutor(max_workers=max(workers, 1))
+    pending = deque()
+    try:
+        for page in pages:
+            pending.append((page, pool.submit(fetch, session, page, validators)))
+            if len(pending) >= window:
+                break
+        while pending:
+            page, future = pending.popleft()
+            try:
+                yield page, future.result(), None
+            except Exception as e:
+                yield page, None, e
+            for page in pages:
+                pending.append((page, pool.submit(fetch, session, page, validators)))
+                break
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# Klassificeringsregler - en tabell för allt.
+#   topic:       matchas mot titeln, första regeln som träffar vinner
+#   modus:       matchas mot titel + källa, alla regler som träffar räknas
+#   source_type: matchas mot källan, första regeln som träffar vinner
+# Nyckelord matchas som hela ord (plural-s/es tillåts). Avslutande '*'
+# betyder prefix, t.ex. 'jewel*' träffar både jewel och jewellery - bara
+# för stammar som inte börjar andra vanliga ord; annars skrivs böjningarna
+# ut (import* skulle träffa important, trade* trademark, crypto* cryptic).
+CLASSIFICATION_RULES = {
+    'topic': [
+        (('fraud', 'high'), ['fraud*', 'scam', 'scammer', 'scammed', 'scamming']),
+        (('crime', 'high'), ['trafficking', 'trafficker*', 'smuggl*']),
+        (('corruption', 'high'), ['corrupt*']),
+    ],
+    'modus': [
+        # Fastigheter & Lyxvaror
+        ('fastigheter', ['property', 'properties', 'real estate', 'housing', 'apartment', 'villa', 'building', 'land']),
+        ('lyxvaror', ['luxury', 'yacht', 'jet', 'watch', 'jewel*', 'art', 'artwork', 'painting', 'car', 'vehicle', 'supercar', 'ferrari', 'lamborghini']),
+        ('guld-ädelmetall', ['gold', 'diamond', 'precious metal', 'bullion']),
+        # Finansiella system
+        ('kryptovalutor', ['crypto', 'cryptocurrency', 'cryptocurrencies', 'cryptoasset', 'crypto-asset', 'bitcoin', 'blockchain', 'digital currency', 'token', 'nft']),
+        ('banker-skalbolag', ['bank', 'banking', 'account', 'transfer', 'wire', 'swift', 'offshore', 'shell company', 'shell companies', 'nominee']),
+        ('lån', ['loan', 'mortgage', 'credit', 'debt', 'lending']),
+        ('spel-kasino', ['casino', 'gambling', 'betting', 'poker']),
+        # Handel & Business
+        ('handelsbaserat', ['trade', 'traded', 'trader', 'trading', 'export', 'exported', 'exporter', 'exporting',
+                            'import', 'imported', 'importer', 'importing', 'invoic*', 'overvaluation', 'undervaluation', 'mis-invoicing']),
+        ('hawala-kontanter', ['hawala', 'cash courier', 'money service', 'remittance', 'exchange']),
+        ('företag', ['company', 'companies', 'business', 'businesses', 'corporate', 'subsidiary', 'subsidiaries', 'front business']),
+        # Specifika branscher
+        ('kontantintensiva', ['restaurant', 'bar', 'nightclub', 'salon', 'carwash', 'car wash']),
+        ('välgörenhet', ['charity', 'charities', 'foundation', 'ngo', 'non-profit']),
+        ('försäkring-fonder', ['insurance', 'pension', 'investment fund', 'hedge fund']),
+    ],
+    'source_type': [
+        ('official', ['eppo', 'europol', 'fca', 'gov', 'gov.uk', 'government']),
+        ('news', ['guardian', 'bbc']),
+        ('report', ['occrp', 'global initiative']),
+    ],
+}
+
+DEFAULT_CLASSIFICATION = {'topic': ('crime', 'medium'), 'modus': 'övrigt', 'source_type': 'unknown'}
+
+# Modus-ord som står i nästan varje ingress om penningtvätt (pengarna fördes
+# över via bankkonton, företaget, "criminal property") och därför inte säger
+# något om upplägget där. De räknas i rubriken men inte i ingressen.
+LEAD_GENERIC_KEYWORDS = {
+    'property', 'properties', 'land', 'building', 'housing',
+    'art', 'watch', 'jet', 'car', 'vehicle',
+    'bank', 'banking', 'account', 'transfer', 'wire', 'token',
+    'loan', 'credit', 'debt', 'lending',
+    'trade', 'traded', 'trader', 'trading', 'exchange',
+    'company', 'companies', 'business', 'businesses', 'corporate',
+    'bar', 'foundation',
+}
+
+class KeywordMatcher:
+    """Alla nyckelord kompilerade till ett reguljärt uttryck.
+
+    Varje nyckelord är en egen grupp i en lookahead, så en enda finditer
+    över texten hittar varje ord som startar en träff - även överlappande
+    som 'shell company' och 'company'. Vid samma startposition fångar
+    regexen bara det längsta nyckelordet; de kortare som kan börja på samma
+    ställe ('car' i 'car wash') provas sedan var för sig.
+    """
+
+    def __init__(self, rules):
+        targets = {}
+        for field, field_rules in rules.items():
+            for priority, (label, keywords) in enumerate(field_rules):
+                for keyword in keywords:
+                    targets.setdefault(keyword.lower(), []).append((field, priority, label))
+
+        self.keywords = sorted(targets, key=len, reverse=True)
+        self.targets = [targets[k] for k in self.keywords]
+        self.pattern = re.compile(
+            r'\b(?=' + '|'.join(f'({self._keyword_pattern(k)})' for k in self.keywords) + ')'
+        )
+        # Kortare nyckelord vars fasta början är en början på nyckelordet: kan träffa på samma position
+        stems = [k.rstrip('*') for k in self.keywords]
+        self.shorter = [
+            [(re.compile(self._keyword_pattern(self.keywords[j])), self.targets[j])
+             for j in range(i + 1, len(self.keywords)) if stems[i].startswith(stems[j])]
+            for i in range(len(self.keywords))
+        ]
+
+    @staticmethod
+    def _keyword_pattern(keyword):
+        if keyword.endswith('*'):
+            return re.escape(keyword[:-1]) + r'\w*'
+        return re.escape(keyword) + r'(?:e?s)?\b'
+
+    def matches(self, text):
+        """Ge (position, [(fält, prioritet, etikett), ...]) för varje träff"""
+        for m in self.pattern.finditer(text):
+            i = m.lastindex - 1
+            pos = m.start()
+            targets = self.targets[i]
+            for pattern, more in self.shorter[i]:
+                if pattern.match(text, pos):
+                    targets = targets + more
+            yield pos, targets
+
+def compile_rules(rules=CLASSIFICATION_RULES):
+    global classification_matcher, lead_matcher
+    classification_matcher = KeywordMatcher(rules)
+    # Ingressen ger bara topic och modus, och inte via de allmänna orden
+    lead_matcher = KeywordMatcher({
+        'topic': rules['topic'],
+        'modus': [(label, [k for k in keywords if k not in LEAD_GENERIC_KEYWORDS]) for label, keywords in rules['modus']],
+    })
+    return classification_matcher
+
+classification_matcher = lead_matcher = None
+compile_rules()
+
+def classify_article(title, source, lead=None):
+    """Klassificera topic/severity, modus och source_type i ett svep över texten.
+
+    `lead` är ingressen från artikelns egen sida (berikningen): den räknas
+    för modus (utom LEAD_GENERIC_KEYWORDS), och för topic om rubriken inte
+    ger något.
+    """
+    text = f"{title} {source}".lower()
+    title_end = len(title)
+    
+    topic_hit = None
+    lead_topic_hit = None
+    source_hit = None
+    modus_hits = set()
+    for pos, targets in classification_matcher.matches(text):
+        for field, priority, label in targets:
+            if field == 'modus':
+                modus_hits.add((priority, label))
+            elif field == 'topic' and pos < title_end:
+                if topic_hit is None or priority < topic_hit[0]:
+                    topic_hit = (priority, label)
+            elif field == 'source_type' and pos > title_end:
+                if source_hit is None or priority < source_hit[0]:
+                    source_hit = (priority, label)
+    
+    for _, targets in lead_matcher.matches(lead.lower()) if lead else ():
+        for field, priority, label in targets:
+            if field == 'modus':
+                modus_hits.add((priority, label))
+            elif lead_topic_hit is None or priority < lead_topic_hit[0]:
+                lead_topic_hit = (priority, label)
+    
+    topic_hit = topic_hit or lead_topic_hit
+    topic, severity = topic_hit[1] if topic_hit else DEFAULT_CLASSIFICATION['topic']
+    modus = [label for _, label in sorted(modus_hits)] or [DEFAULT_CLASSIFICATION['modus']]
+    source_type = source_hit[1] if source_hit else DEFAULT_CLASSIFICATION['source_type']
+    
+    return {
+        'source_type': source_type,
+        'topic': topic,
+        'severity': severity,
+        'modus': modus
+    }
+
+def reclassify_articles(articles, sources=None):
+    """Kör om klassificeringen, ger (id, ny klassificering) för artiklar som ändrats.
+
+    `sources` är berikningens resultat per URL (store.sources()); finns en
+    ingress för artikeln används den.
+    """
+    updates = []
+    sources = sources or {}
+    for article in articles:
+        lead = (sources.get(article.get('url')) or {}).get('lead')
+        result = classify_article(article.get('title', ''), article.get('source', ''), lead)
+        if any(article.get(k) != v for k, v in result.items()):
+            updates.append((article['id'], result))
+    return updates
+
+class LinkIndex:
+    """Inverterat index ord -> länkar för en sidas externa länkar.
+
+    Byggs en gång per sida. best_match räknar överlapp bara för länkar som
+    delar minst ett ord med titeln och väljer den bästa, inte den första.
+    """
+
+    def __init__(self, links):
+        self.urls = []
+        self.sizes = []
+        self.postings = {}
+        for link_text, link_url in links.items():
+            tokens = set(link_text.lower().split())
+            link_id = len(self.urls)
+            self.urls.append(link_url)
+            self.sizes.append(len(tokens))
+            for token in tokens:
+                self.postings.setdefault(token, []).append(link_id)
+
+    def best_match(self, title, min_overlap=4):
+        """Länken med flest gemensamma ord (minst `min_overlap`), vid lika
+        överlapp den med högst Jaccard-likhet, annars None"""
+        tokens = set(title.lower().split())
+        overlap = {}
+        for token in tokens:
+            for link_id in self.postings.get(token, ()):
+                overlap[link_id] = overlap.get(link_id, 0) + 1
+        
+        best_id = None
+        best_score = None
+        for link_id, shared in overlap.items():
+            if shared < min_overlap:
+                continue
+            score = (shared, shared / (len(tokens) + self.sizes[link_id] - shared), -link_id)
+            if best_score is None or score > best_score:
+                best_id, best_score = link_id, score
+        
+        return self.urls[best_id] if best_id is not None else None
+
+# Snabbare parser om lxml finns installerat
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+DATE_RE = re.compile(r'\d{1,2} \w+,? \d{4}')
+DATE_NODE_RE = re.compile(r'^\s*\d{1,2} \w+,? \d{4}')  # för find_all(string=...), som söker
+ARTICLE_DATE_FORMATS = ['%d %B, %Y', '%d %B %Y', '%d %b, %Y', '%d %b %Y']
+
+def parse_article_date(text):
+    """'12 March, 2024' -> date(2024, 3, 12), None om det inte går att tolka"""
+    if not text:
+        return None
+    text = ' '.join(text.split())
+    for fmt in ARTICLE_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def iso_date(text):
+    """Rå datumsträng -> 'YYYY-MM-DD', None om den inte går att tolka"""
+    parsed = parse_article_date(text)
+    return parsed.isoformat() if parsed else None
+
+CARD_MAX_DEPTH = 6  # hur många nivåer upp från datumet vi letar efter kortet
+TITLE_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+def is_external_link(href):
+    return bool(href) and 'http' in href and 'thelaundrynews' not in href
+
+def clean_text(text):
+    return ' '.join(text.split())
+
+def extract_cards(soup):
+    """Läs artikelkort direkt ur DOM-strukturen.
+
+    För varje datum går vi uppåt till närmaste element som har en extern
+    rubriklänk men inget annat datum - det är kortet. Rubrik och URL tas
+    från länken, källan är närmaste text före datumet i kortet.
+    Ger en lista med (källa, datum, rubrik, url).
+    """
+    date_nodes = soup.find_all(string=DATE_NODE_RE)
+    
+    # Antal datum under varje element - ett kort innehåller bara ett
+    dates_below = {}
+    for node in date_nodes:
+        for parent in node.parents:
+            dates_below[id(parent)] = dates_below.get(id(parent), 0) + 1
+    
+    # Bästa rubriklänken under varje element: extern länk i en rubrik i
+    # första hand, annars den med längst text (över 20 tecken)
+    title_links = {}
+    for a in soup.find_all('a', href=True):
+        if not is_external_link(a['href']):
+            continue
+        text = clean_text(a.get_text(' '))
+        in_heading = any(p.name in TITLE_TAGS for p in a.parents)
+        if not in_heading and len(text) <= 20:
+            continue
+        rank = (in_heading, len(text))
+        for depth, parent in enumerate(a.parents):
+            if depth >= CARD_MAX_DEPTH + 2:
+                break
+            current = title_links.get(id(parent))
+            if current is None or rank > current[0]:
+                title_links[id(parent)] = (rank, text, a['href'])
+    
+    cards = []
+    for node in date_nodes:
+        card = node.parent
+        link = None
+        for _ in range(CARD_MAX_DEPTH):
+            if card is None or dates_below.get(id(card), 0) > 1:
+                break
+            link = title_links.get(id(card))
+            if link is not None:
+                break
+            card = card.parent
+        if link is None:
+            continue
+        
+        source = None
+        for element in node.previous_elements:
+            if element is card:
+                break
+            if isinstance(element, NavigableString) and not isinstance(element, Comment) and element.strip():
+                source = clean_text(element)
+                break
+        
+        _, title, url = link
+        cards.append((source, node.strip(), title, url))
+    
+    return cards
+
+def extract_text_lines(soup):
+    """Reserv: gissa (källa, datum, rubrik, url) ur sidans textrader"""
+    # Hitta alla externa länkar
+    links = {}
+    for a in soup.find_all('a', href=True):
+        href = a.get('href')
+        text = a.get_text(strip=True)
+        if is_external_link(href) and len(text) > 20:
+            links[text] = href
+    with scrape_stage('link_match'):
+        link_index = LinkIndex(links)
+    
+    # Hitta artiklar via text-parsing
+    text = soup.get_text()
+    lines = [l.strip() for l in text.split('\n') if l.strip()]
+    
+    candidates = []
+    for i, line in enumerate(lines):
+        if DATE_RE.match(line) and i > 0 and i < len(lines) - 1:
+            title = lines[i+1]
+            with scrape_stage('link_match'):
+                url = link_index.best_match(title)
+            candidates.append((lines[i-1], line, title, url))
+    return candidates
+
+def parse_listing(content, parser=HTML_PARSER, structured=True):
+    """Extrahera och klassificera alla artiklar på en listsida (varje titel en gång).
+
+    Artikelkorten läses ur DOM-strukturen; hittas inga faller vi tillbaka
+    på textheuristiken. Rör inget delat tillstånd, så den kan köras i
+    parsningsprocesserna.
+    """
+    articles = []
+    titles = set()
+    with scrape_stage('parse'):
+        soup = BeautifulSoup(content, parser)
+    
+    with scrape_stage('extract'):
+        candidates = extract_cards(soup) if structured else []
+        if not candidates:
+            candidates = extract_text_lines(soup)
+    
+    for potential_source, raw_date, title, url in candidates:
+        if (potential_source and len(potential_source) < 100 and 
+            title and 30 < len(title) < 400 and
+            title not in titles):
+            
+            with scrape_stage('classify'):
+                classification = classify_article(title, potential_source)
+            articles.append({
+                'source': potential_source,
+                'title': title,
+                'date': raw_date,
+                'published': iso_date(raw_date),
+                'url': url,
+                **classification
+            })
+            
+            titles.add(title)
+    
+    return articles
+
+def select_new(articles, seen):
+    """Artiklarna vars titel inte finns i `seen`; deras titlar läggs till i `seen`"""
+    new = [a for a in articles if a['title'] not in seen]
+    seen.update(a['title'] for a in new)
+    return new
+
+def parse_page(content, seen, parser=HTML_PARSER, structured=True):
+    """Extrahera och klassificera artiklarna på en listsida, utom titlar som redan finns i `seen`"""
+    return select_new(parse_listing(content, parser, structured), seen)
+
+# Parsning, extrahering och klassificering körs i en processpool, så att
+# de inte tävlar med Flask-trådarna om GIL:en och kan använda flera kärnor.
+# Hämtningstrådarna skickar sidornas rå-HTML dit; högst PARSE_QUEUE_PER_PROCESS
+# sidor per process får vänta eller parsas samtidigt, annars väntar hämtningen.
+# SCRAPE_PARSE_PROCESSES=0 parsar i hämtningstråden i stället.
+SCRAPE_PARSE_PROCESSES = int(os.environ.get('SCRAPE_PARSE_PROCESSES', min(os.cpu_count() or 1, 4)))
+PARSE_QUEUE_PER_PROCESS = 2
+
+_parse_pool = None
+_parse_slots = None
+_parse_pool_lock = threading.Lock()
+
+def in_worker_process():
+    """Sant i multiprocessing-processer, även medan de importerar huvudmodulen"""
+    return (multiprocessing.parent_process() is not None
+            or getattr(multiprocessing.current_process(), '_inheriting', False))
+
+def get_parse_pool():
+    """Processpoolen (skapas vid första användningen), eller None för parsning i tråden"""
+    global _parse_pool, _parse_slots
+    with _parse_pool_lock:
+        if _parse_pool is None and SCRAPE_PARSE_PROCESSES > 0:
+            # Inte fork: processen har trådar. Forkservern ska inte heller importera
+            # huvudmodulen (med den här modulens uppstart) i förväg.
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(method)
+            if method == 'forkserver':
+                context.set_forkserver_preload([])
+            _parse_pool = ProcessPoolExecutor(SCRAPE_PARSE_PROCESSES, mp_context=context)
+            _parse_slots = threading.BoundedSemaphore(SCRAPE_PARSE_PROCESSES * PARSE_QUEUE_PER_PROCESS)
+        return _parse_pool
+
+def _run_in_worker(fn, content, parser):
+    """Körs i en parsningsprocess: resultatet plus stegtiderna, som processen inte kan rapportera själv"""
+    _stage_stack.observed = observed = []
+    try:
+        return fn(content, parser), observed
+    finally:
+        _stage_stack.observed = None
+
+def run_in_parse_pool(fn, content):
+    """fn(content, HTML_PARSER) i parsningspoolen (fn måste gå att importera från modulen)"""
+    global _parse_pool
+    pool = get_parse_pool()
+    if pool is None:
+        return fn(content, HTML_PARSER)
+    try:
+        with _parse_slots:
+            result, observed = pool.submit(_run_in_worker, fn, content, HTML_PARSER).result()
+    except BrokenProcessPool:
+        # En parsningsprocess dog - börja om med en ny pool och parsa den här sidan här
+        with _parse_pool_lock:
+            if _parse_pool is pool:
+                _parse_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return fn(content, HTML_PARSER)
+    for stage, seconds in observed:
+        SCRAPE_STAGE_SECONDS.observe(seconds, stage=stage)
+    return result
+
+def parse_listing_in_pool(content):
+    return run_in_parse_pool(parse_listing, content)
+
+def fetch_and_parse_page(session, page, validators=None):
+    """Hämta en listsida, cacha den och parsa den direkt i poolen: (svar, artiklar, digest) - None om inte 200"""
+    response = fetch_page(session, page, validators)
+    if response.status_code != 200:
+        return response, None, None
+    digest = page_cache.put(response.content) if PAGE_CACHE else None
+    return response, parse_listing_in_pool(response.content), digest
+
+def replay_cached_page(session, page, validators=None, scrape_run=None):
+    """Som fetch_and_parse_page men från sidcachen (sidan som körningen `scrape_run` sparade), utan nätverk"""
+    response = page_cache.load(page, scrape_run)
+    return response, parse_listing_in_pool(response.content), response.digest
+
+# Nära dubbletter: samma nyhet med lite annan rubrik eller från en annan källa.
+# MinHash över ordpar (bigram) i den normaliserade rubriken; signaturernas
+# LSH-hinkar ligger i databasen, så en ny artikel jämförs bara med de få
+# artiklar den delar hink med. Dubbletter får samma cluster_id (id för den
+# första artikeln i gruppen) i stället för att kastas. Bara gruppens första
+# artikel läggs i hinkarna, så de växer inte med stora grupper.
+#
+# Teckenshinglar med tröskel 0.5 slog ihop olika nyheter med samma mall
+# ("UK businessman charged ..." / "US businesswoman charged ..."); ordpar
+# och 0.7 gör det inte, men precisionen är inte uppmätt på riktiga rubriker.
+# Därför är grupperingen avstängd tills DUPLICATE_GROUPING=1.
+DUPLICATE_GROUPING = os.environ.get('DUPLICATE_GROUPING', '0') == '1'
+MINHASH_SCHEME = 2              # ändras när signaturerna inte längre går att jämföra med de sparade
+MINHASH_PERMUTATIONS = 60
+LSH_BANDS = 15                  # 15 band à 4 rader: likhet 0.7 blir kandidat med ~98 % sannolikhet
+DUPLICATE_THRESHOLD = 0.7       # uppskattad Jaccard-likhet (ordpar) för att räknas som samma nyhet
+TITLE_STOPWORDS = {'a', 'an', 'the', 'of', 'in', 'on', 'at', 'to', 'for', 'over', 'by', 'with',
+                   'and', 'or', 'as', 'is', 'are', 'was', 'be', 'from', 'after', 'into'}
+_minhash_params = None
+
+def normalize_title(title):
+    """Gemener, utan accenter, skiljetecken och småord"""
+    text = unicodedata.normalize('NFKD', title.lower()).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(w for w in re.findall(r'[a-z0-9]+', text) if w not in TITLE_STOPWORDS)
+
+def title_shingles(title):
+    """Ordparen i den normaliserade rubriken (enstaka ordet för rubriker på ett ord)"""
+    words = normalize_title(title or '').split()
+    if len(words) < 2:
+        return set(words)
+    return {f'{first} {second}' for first, second in zip(words, words[1:])}
+
+def title_minhash(title):
+    """MinHash-signatur (numpy uint64) för rubriken, None om inget finns kvar att jämföra"""
+    global _minhash_params
+    if _minhash_params is None:
+        # Fasta parametrar: signaturerna sparas i databasen och måste gå att jämföra mellan körningar
+        rng = np.random.default_rng(20240501)
+        _minhash_params = (rng.integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1),
+                           rng.integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64))
+    
+    shingles = title_shingles(title)
+    if not shingles:
+        return None
+    shingles = np.fromiter((zlib.crc32(s.encode('ascii')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # splitmix64 sprider crc32-värdena över 64 bitar, sedan a*x + b (mod 2^64) per permutation
+    x = shingles ^ (shingles >> np.uint64(30))
+    x *= np.uint64(0xbf58476d1ce4e5b9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94d049bb133111eb)
+    x ^= x >> np.uint64(31)
+    a, b = _minhash_params
+    return (np.outer(a, x) + b[:, None]).min(axis=1)
+
+def lsh_buckets(signature):
+    """(band, hink) per band - lika hink i något band gör två artiklar till kandidater"""
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    for band in range(LSH_BANDS):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+        yield band, int.from_bytes(digest, 'big', signed=True)
+
+DB_PATH = os.environ.get('ARTICLES_DB', 'articles.db')
+JSON_PATH = 'articles.json'
+
+# date är datumet som det stod på sidan, published samma datum tolkat till ISO-format
+ARTICLE_FIELDS = ['source', 'title', 'date', 'published', 'url', 'source_type', 'topic', 'severity']
+PUBLIC_FIELDS = ['id'] + ARTICLE_FIELDS + ['modus', 'cluster_id']  # det API:t visar
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id          INTEGER PRIMARY KEY,
+    title       TEXT NOT NULL UNIQUE,
+    source      TEXT,
+    date        TEXT,
+    published   TEXT,
+    url         TEXT,
+    source_type TEXT,
+    topic       TEXT,
+    severity    TEXT,
+    scrape_run  INTEGER NOT NULL DEFAULT 0,
+    position    INTEGER NOT NULL DEFAULT 0,
+    changed_in  INTEGER NOT NULL DEFAULT 0, -- datasetversionen som senast ändrade raden
+    cluster_id  INTEGER                     -- första artikeln med samma nyhet (nära dubbletter)
+);
+CREATE INDEX IF NOT EXISTS idx_articles_date ON articles(date);
+CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source);
+CREATE INDEX IF NOT EXISTS idx_articles_source_type ON articles(source_type);
+CREATE INDEX IF NOT EXISTS idx_articles_severity ON articles(severity);
+CREATE INDEX IF NOT EXISTS idx_articles_topic ON articles(topic);
+CREATE INDEX IF NOT EXISTS idx_articles_order ON articles(scrape_run DESC, position);
+
+CREATE TABLE IF NOT EXISTS article_modus (
+    article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    modus      TEXT NOT NULL,
+    UNIQUE (article_id, modus)
+);
+CREATE INDEX IF NOT EXISTS idx_article_modus_modus ON article_modus(modus, article_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+-- MinHash-signaturer och LSH-hinkar (bara gruppernas första artikel) för dubblettsökningen
+CREATE TABLE IF NOT EXISTS article_minhash (
+    article_id INTEGER PRIMARY KEY REFERENCES articles(id) ON DELETE CASCADE,
+    signature  BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band       INTEGER NOT NULL,
+    bucket     INTEGER NOT NULL,
+    article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets(band, bucket);
+
+-- Delat mellan gunicorn-workers: vem som scrapar och hur det går
+CREATE TABLE IF NOT EXISTS scrape_lease (
+    id         INTEGER PRIMARY KEY CHECK (id = 1),
+    holder     TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shared_state (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+-- Berikning: vad artikelns egen sida (url) gav, en rad per hämtad URL
+CREATE TABLE IF NOT EXISTS article_sources (
+    url        TEXT PRIMARY KEY,
+    status     INTEGER NOT NULL,    -- HTTP-status
+    fetched_at TEXT NOT NULL,
+    lead       TEXT,                -- ingress/första styckena
+    published  TEXT                 -- 'YYYY-MM-DD' enligt källan
+);
+
+-- Listsidorna som varje scrapingkörning sparade; innehållet ligger i PAGE_CACHE_DIR
+CREATE TABLE IF NOT EXISTS page_cache (
+    scrape_run    INTEGER NOT NULL,
+    page          INTEGER NOT NULL,
+    url           TEXT NOT NULL,
+    digest        TEXT NOT NULL,    -- sha256 av rå-HTML:en, också filnamnet
+    size          INTEGER NOT NULL, -- okomprimerade byte
+    fetched_at    TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    content_type  TEXT,
+    PRIMARY KEY (scrape_run, page)
+);
+-- Körningarna i sidcachen; replay utgår från senaste fullständiga hela körningen
+CREATE TABLE IF NOT EXISTS page_cache_runs (
+    scrape_run  INTEGER PRIMARY KEY,
+    incremental INTEGER NOT NULL,
+    complete    INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Nyast först: senaste scrapingkörningen, sedan sidordning inom körningen
+ORDER_BY = "ORDER BY a.scrape_run DESC, a.position"
+
+class ArticleStore:
+    """Artikellager i en inbäddad SQLite-databas.
+
+    Varje tråd får en egen anslutning; WAL gör att läsningar från
+    Flask-trådarna inte blockeras av scrapingens skrivningar.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        with self.connection() as conn:
+            page_cache_columns = {row['name'] for row in conn.execute("PRAGMA table_info(page_cache)")}
+            if page_cache_columns and 'scrape_run' not in page_cache_columns:
+                # Den gamla tabellen hade bara senaste sidan per URL, ingen hel körning att
+                # läsa om; filerna rensas vid nästa körning
+                conn.execute("DROP TABLE page_cache")
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(articles)")}
+            if 'changed_in' not in columns:
+                conn.execute("ALTER TABLE articles ADD COLUMN changed_in INTEGER NOT NULL DEFAULT 0")
+            if 'published' not in columns:
+                conn.execute("ALTER TABLE articles ADD COLUMN published TEXT")
+                self._backfill_published(conn)
+            if 'cluster_id' not in columns:
+                # Fylls i av assign_pending_clusters i bakgrunden
+                conn.execute("ALTER TABLE articles ADD COLUMN cluster_id INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_changed ON articles(changed_in)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_cluster ON articles(cluster_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published)")
+            self._reset_stale_clusters(conn)
+
+    def _reset_stale_clusters(self, conn):
+        """Släng signaturer och grupper från ett äldre MinHash-schema - de går inte att jämföra med nya"""
+        row = conn.execute("SELECT value FROM meta WHERE key = 'minhash_scheme'").fetchone()
+        if row and row[0] == MINHASH_SCHEME:
+            return
+        conn.execute("DELETE FROM lsh_buckets")
+        conn.execute("DELETE FROM article_minhash")
+        if conn.execute("SELECT 1 FROM articles WHERE cluster_id IS NOT NULL LIMIT 1").fetchone():
+            version = self._bump_version(conn)
+            conn.execute("UPDATE articles SET cluster_id = NULL, changed_in = ? WHERE cluster_id IS NOT NULL",
+                         (version,))
+            print("🔗 Dubblettgrupperna nollställda (nytt MinHash-schema)")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('minhash_scheme', ?)", (MINHASH_SCHEME,))
+
+    def _backfill_published(self, conn):
+        """Tolka datumen för artiklar sparade innan published fanns"""
+        rows = conn.execute("SELECT id, date FROM articles WHERE published IS NULL AND date IS NOT NULL")
+        updates = [(published, article_id) for article_id, date in rows if (published := iso_date(date))]
+        if updates:
+            version = self._bump_version(conn)
+            conn.executemany("UPDATE articles SET published = ?, changed_in = ? WHERE id = ?",
+                             [(published, version, article_id) for published, article_id in updates])
+            print(f"✅ Tolkade datum för {len(updates)} befintliga artiklar")
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self.local.conn = conn
+        return conn
+
+    def count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def titles(self, scrape_run=None):
+        if scrape_run is None:
+            rows = self.connection().execute("SELECT title FROM articles")
+        else:
+            rows = self.connection().execute("SELECT title FROM articles WHERE scrape_run = ?", (scrape_run,))
+        return {row[0] for row in rows}
+
+    def dataset_id(self):
+        """Slumpat id som skapas med databasen - skiljer en ny databas från en gammal med samma version"""
+        conn = self.connection()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dataset_id', ?)",
+                         (random.getrandbits(62),))
+        return conn.execute("SELECT value FROM meta WHERE key = 'dataset_id'").fetchone()[0]
+
+    def dataset_version(self):
+        """Ökas i samma transaktion som varje ändring av artiklarna"""
+        row = self.connection().execute("SELECT value FROM meta WHERE key = 'dataset_version'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _bump_version(conn):
+        return conn.execute("""
+            INSERT INTO meta (key, value) VALUES ('dataset_version', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1
+            RETURNING value
+        """).fetchone()[0]
+
+    def next_run(self):
+        """Ett nytt körningsnummer. Räknaren i meta går bara uppåt, så en körning som inte
+        sparar några artiklar (inkrementell utan nyheter) ger inte sitt nummer vidare"""
+        conn = self.connection()
+        with conn:
+            return conn.execute("""
+                INSERT INTO meta (key, value) VALUES ('scrape_run', 1 + MAX(
+                    (SELECT COALESCE(MAX(scrape_run), 0) FROM articles),
+                    (SELECT COALESCE(MAX(scrape_run), 0) FROM page_cache_runs)))
+                ON CONFLICT(key) DO UPDATE SET value = MAX(value + 1, excluded.value)
+                RETURNING value
+            """).fetchone()[0]
+
+    def upsert_articles(self, articles, scrape_run=0, position=0):
+        """Spara en sidas artiklar i en transaktion (nyckel: titel).
+
+        Ger tillbaka de sparade artiklarna med id, scrape_run och position.
+        """
+        if not articles:
+            return []
+        # Äldre articles.json saknar published - tolka datumet här
+        articles = [a if a.get('published') or not a.get('date') else {**a, 'published': iso_date(a['date'])}
+                    for a in articles]
+        conn = self.connection()
+        with conn:
+            version = self._bump_version(conn)
+            conn.executemany(f"""
+                INSERT INTO articles ({', '.join(ARTICLE_FIELDS)}, scrape_run, position, changed_in)
+                VALUES ({', '.join('?' * len(ARTICLE_FIELDS))}, ?, ?, ?)
+                ON CONFLICT(title) DO UPDATE SET
+                    {', '.join(f'{f} = excluded.{f}' for f in ARTICLE_FIELDS if f != 'title')},
+                    scrape_run = excluded.scrape_run,
+                    position = excluded.position,
+                    changed_in = excluded.changed_in
+            """, [
+                [a.get(f) for f in ARTICLE_FIELDS] + [scrape_run, position + i, version]
+                for i, a in enumerate(articles)
+            ])
+            ids = self._ids_for_titles(conn, [a['title'] for a in articles])
+            self._replace_modus(conn, [(ids[a['title']], a.get('modus', [])) for a in articles])
+            clusters = self._assign_clusters(conn, list(ids.values())) if DUPLICATE_GROUPING else {}
+        
+        return [
+            {'id': ids[a['title']], **{f: a.get(f) for f in ARTICLE_FIELDS}, 'modus': a.get('modus', []),
+             'scrape_run': scrape_run, 'position': position + i, 'cluster_id': clusters.get(ids[a['title']])}
+            for i, a in enumerate(articles)
+        ]
+
+    @staticmethod
+    def _assign_clusters(conn, ids):
+        """Ge artiklar utan cluster_id ett, via LSH-kandidater i databasen. Ger {id: cluster_id}."""
+        clusters = {}
+        pending = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for row in conn.execute(
+                    f"SELECT id, title, cluster_id FROM articles WHERE id IN ({', '.join('?' * len(chunk))})", chunk):
+                if row['cluster_id'] is None:
+                    pending.append((row['id'], row['title']))
+                else:
+                    clusters[row['id']] = row['cluster_id']
+        
+        # I id-ordning, så att en dubblett inom samma sida hittar den första
+        for article_id, title in sorted(pending):
+            cluster_id = article_id
+            signature = title_minhash(title)
+            if signature is not None:
+                buckets = list(lsh_buckets(signature))
+                candidates = conn.execute(f"""
+                    SELECT DISTINCT b.article_id, m.signature
+                    FROM (VALUES {', '.join(['(?, ?)'] * len(buckets))}) AS v
+                    JOIN lsh_buckets b ON b.band = v.column1 AND b.bucket = v.column2
+                    JOIN article_minhash m ON m.article_id = b.article_id
+                """, [v for bucket in buckets for v in bucket]).fetchall()
+                if candidates:
+                    others = np.frombuffer(b''.join(c['signature'] for c in candidates), dtype=np.uint64)
+                    similarity = (others.reshape(len(candidates), -1) == signature).mean(axis=1)
+                    best = int(similarity.argmax())
+                    if similarity[best] >= DUPLICATE_THRESHOLD:
+                        cluster_id = candidates[best]['article_id']
+                conn.execute("INSERT OR REPLACE INTO article_minhash (article_id, signature) VALUES (?, ?)",
+                             (article_id, signature.tobytes()))
+                if cluster_id == article_id:
+                    conn.executemany("INSERT INTO lsh_buckets (band, bucket, article_id) VALUES (?, ?, ?)",
+                                     [(band, bucket, article_id) for band, bucket in buckets])
+            conn.execute("UPDATE articles SET cluster_id = ? WHERE id = ?", (cluster_id, article_id))
+            clusters[article_id] = cluster_id
+        return clusters
+
+    def assign_pending_clusters(self, batch_size=500):
+        """Dubblettgruppera nästa batch artiklar sparade innan cluster_id fanns, äldst först. Ger antal (0 = klart)."""
+        conn = self.connection()
+        with conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM articles WHERE cluster_id IS NULL ORDER BY id LIMIT ?", (batch_size,))]
+            if ids:
+                version = self._bump_version(conn)
+                self._assign_clusters(conn, ids)
+                conn.executemany("UPDATE articles SET changed_in = ? WHERE id = ?", [(version, i) for i in ids])
+        return len(ids)
+
+    def cluster(self, cluster_id):
+        """Alla artiklar i en dubblettgrupp, äldst först"""
+        rows = self.connection().execute(
+            "SELECT a.* FROM articles a WHERE a.cluster_id = ? ORDER BY a.id", (cluster_id,)).fetchall()
+        return self._with_modus(rows)
+
+    def unenriched_urls(self, limit=None):
+        """Externa artikel-URL:er som inte hämtats än, nyast först"""
+        rows = self.connection().execute(f"""
+            SELECT a.url FROM articles a LEFT JOIN article_sources s ON s.url = a.url
+            WHERE a.url IS NOT NULL AND s.url IS NULL {ORDER_BY}
+        """)
+        urls = list(dict.fromkeys(row[0] for row in rows if is_external_link(row[0])))
+        return urls[:limit] if limit else urls
+
+    def save_sources(self, sources):
+        """sources: dictar med article_sources-kolumnerna"""
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO article_sources (url, status, fetched_at, lead, published) "
+                "VALUES (:url, :status, :fetched_at, :lead, :published)", sources)
+
+    def sources(self, urls=None):
+        """Berikningens resultat per URL: alla, eller bara för `urls`"""
+        conn = self.connection()
+        if urls is None:
+            rows = conn.execute("SELECT * FROM article_sources WHERE lead IS NOT NULL OR published IS NOT NULL")
+            return {row['url']: dict(row) for row in rows}
+        urls = list(set(urls))
+        found = {}
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            rows = conn.execute(f"SELECT * FROM article_sources WHERE url IN ({', '.join('?' * len(chunk))})", chunk)
+            found.update((row['url'], dict(row)) for row in rows)
+        return found
+
+    def articles_with_urls(self, urls):
+        conn = self.connection()
+        urls = list(set(urls))
+        articles = []
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            rows = conn.execute(f"SELECT a.* FROM articles a WHERE a.url IN ({', '.join('?' * len(chunk))})", chunk)
+            articles.extend(self._with_modus(rows.fetchall()))
+        return articles
+
+    def fill_published(self, updates):
+        """updates: (id, 'YYYY-MM-DD') för artiklar som saknar tolkat datum"""
+        if not updates:
+            return
+        conn = self.connection()
+        with conn:
+            version = self._bump_version(conn)
+            conn.executemany("UPDATE articles SET published = ?, changed_in = ? WHERE id = ? AND published IS NULL",
+                             [(published, version, article_id) for article_id, published in updates])
+
+    def update_classification(self, updates):
+        """updates: lista med (id, klassificering) från classify_article"""
+        if not updates:
+            return
+        conn = self.connection()
+        with conn:
+            version = self._bump_version(conn)
+            conn.executemany(
+                "UPDATE articles SET source_type = ?, topic = ?, severity = ?, changed_in = ? WHERE id = ?",
+                [(c['source_type'], c['topic'], c['severity'], version, article_id) for article_id, c in updates]
+            )
+            self._replace_modus(conn, [(article_id, c['modus']) for article_id, c in updates])
+
+    @staticmethod
+    def _ids_for_titles(conn, titles):
+        ids = {}
+        for i in range(0, len(titles), 500):
+            chunk = titles[i:i + 500]
+            rows = conn.execute(
+                f"SELECT id, title FROM articles WHERE title IN ({', '.join('?' * len(chunk))})", chunk)
+            ids.update((row['title'], row['id']) for row in rows)
+        return ids
+
+    @staticmethod
+    def _replace_modus(conn, modus_by_id):
+        conn.executemany("DELETE FROM article_modus WHERE article_id = ?",
+                         [(article_id,) for article_id, _ in modus_by_id])
+        conn.executemany("INSERT OR IGNORE INTO article_modus (article_id, modus) VALUES (?, ?)",
+                         [(article_id, m) for article_id, modus in modus_by_id for m in modus])
+
+    def iter_articles(self, batch_size=1000):
+        """Alla artiklar nyast först, hämtade i omgångar"""
+        cursor = self.connection().execute(f"SELECT a.* FROM articles a {ORDER_BY}")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from self._with_modus(rows)
+
+    def all_articles(self):
+        return list(self.iter_articles())
+
+    def changed_since(self, version):
+        """Artiklar som lagts till eller ändrats efter en viss datasetversion"""
+        rows = self.connection().execute(
+            "SELECT a.* FROM articles a WHERE a.changed_in > ?", (version,)).fetchall()
+        return self._with_modus(rows)
+
+    def _with_modus(self, rows):
+        if not rows:
+            return []
+        ids = [row['id'] for row in rows]
+        modus = {}
+        conn = self.connection()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for article_id, m in conn.execute(
+                    f"SELECT article_id, modus FROM article_modus WHERE article_id IN ({', '.join('?' * len(chunk))}) ORDER BY rowid",
+                    chunk):
+                modus.setdefault(article_id, []).append(m)
+        return [
+            {'id': row['id'], **{f: row[f] for f in ARTICLE_FIELDS}, 'modus': modus.get(row['id'], []),
+             'scrape_run': row['scrape_run'], 'position': row['position'], 'cluster_id': row['cluster_id']}
+            for row in rows
+        ]
+
+    def import_json(self, path=JSON_PATH):
+        """Läs in en articles.json (samma ordning som i filen), returnerar antal"""
+        with open(path, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+        articles = [a for a in articles if a.get('title')]
+        self.upsert_articles(articles, scrape_run=self.next_run())
+        return len(articles)
+
+    def export_json(self, fp):
+        """Skriv alla artiklar i articles.json-format till en öppen textfil"""
+        fp.write('[')
+        for i, article in enumerate(self.iter_articles()):
+            article = {f: article[f] for f in ARTICLE_FIELDS + ['modus']}
+            fp.write((',\n' if i else '\n') + json.dumps(article, ensure_ascii=False))
+        fp.write('\n]\n')
+
+with startup_phase('store'):
+    store = ArticleStore()
+
+INDEX_FACETS = ['source', 'source_type', 'severity', 'topic', 'modus']
+
+class Vocabulary:
+    """Internerade strängar: värde <-> litet heltal. Kod 0 är None."""
+
+    def __init__(self, values=()):
+        self.values = [None]
+        self.codes = {None: 0}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, values):
+        """Koderna för de värden som finns"""
+        return [self.codes[v] for v in values if v in self.codes]
+
+class ArticlesView(Mapping):
+    """id -> artikel som vanlig dict, byggd ur kolumnerna vid åtkomst"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __getitem__(self, article_id):
+        article = self.index.get(article_id)
+        if article is None:
+            raise KeyError(article_id)
+        return article
+
+    def __iter__(self):
+        with self.index.lock:
+            return iter(self.index.column('id').tolist())
+
+    def __len__(self):
+        return len(self.index)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+ANALYTICS_MAX_PERIODS = 1000
+
+class TrendAggregates:
+    """Materialiserade antal artiklar per period (vecka/månad) och facettvärde.
+
+    En matris per (periodlängd, facett): rad = period räknat från den
+    första, kolumn = kod i FacetIndex ordlistor (för modus: bitnumret).
+    FacetIndex håller den uppdaterad - ersatta rader dras av med sina gamla
+    värden och läggs till med de nya - så en fråga läser bara matriserna.
+    Artiklar utan tolkbart datum (dag 0) räknas bara i `undated`.
+    """
+
+    PERIODS = ('week', 'month')
+    FACETS = ['modus', 'topic', 'severity', 'source', 'source_type']
+
+    def __init__(self):
+        self.counts = {}  # (period, facet) -> [första periodnummer, matris]
+        self.undated = 0
+
+    @staticmethod
+    def period_numbers(days, period):
+        """Periodnummer för dagarna (ordinaler): veckor från 0001-01-01 (en måndag), månader från 1970-01"""
+        if period == 'week':
+            return (days - 1) // 7
+        return (days.astype(np.int64) - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+    @staticmethod
+    def period_label(number, period):
+        if period == 'week':
+            year, week, _ = date.fromordinal(number * 7 + 1).isocalendar()
+            return f"{year}-W{week:02d}"
+        return f"{1970 + number // 12}-{number % 12 + 1:02d}"
+
+    @staticmethod
+    def _pairs(facet, values):
+        """(radindex, kod) för varje värde; modus ger ett par per satt bit, kod 0 (saknas) hoppas över"""
+        if facet != 'modus':
+            rows = np.flatnonzero(values)
+            return rows, values[rows].astype(np.int64)
+        rows, codes = [], []
+        for code in range(1, int(values.max()).bit_length() if len(values) else 0):
+            hit = np.flatnonzero(values & np.uint64(1 << code))
+            rows.append(hit)
+            codes.append(np.full(len(hit), code, dtype=np.int64))
+        return (np.concatenate(rows), np.concatenate(codes)) if rows else (np.zeros(0, np.intp), np.zeros(0, np.int64))
+
+    def update(self, columns, sign=1):
+        """Räkna in (sign=1) eller ut (sign=-1) raderna; columns: kolumnnamn -> värden för raderna"""
+        days = columns['day']
+        dated = np.flatnonzero(days)
+        self.undated += sign * (len(days) - len(dated))
+        if not len(dated):
+            return
+        numbers = {period: self.period_numbers(days[dated], period) for period in self.PERIODS}
+        for period in self.PERIODS:
+            # Facett None: alla daterade artiklar, kolumn 0
+            self._add((period, None), numbers[period], np.zeros(len(dated), np.int64), sign)
+        for facet in self.FACETS:
+            rows, codes = self._pairs(facet, columns[facet][dated])
+            if not len(rows):
+                continue
+            for period in self.PERIODS:
+                self._add((period, facet), numbers[period][rows], codes, sign)
+
+    def _add(self, key, numbers, codes, sign):
+        lo, hi, width = int(numbers.min()), int(numbers.max()), int(codes.max()) + 1
+        first, matrix = self.counts.get(key, (lo, np.zeros((0, 0), np.int64)))
+        start = min(first, lo)
+        height = max(first + matrix.shape[0], hi + 1) - start
+        if start != first or height > matrix.shape[0] or width > matrix.shape[1]:
+            grown = np.zeros((height, max(width, matrix.shape[1])), np.int64)
+            grown[first - start:first - start + matrix.shape[0], :matrix.shape[1]] = matrix
+            matrix = grown
+        np.add.at(matrix, (numbers - start, codes), sign)
+        self.counts[key] = (start, matrix)
+
+    def table(self, period, facet, first=None, last=None):
+        """(periodnummer, matris) för perioderna first..last (inklusive), nollor där inget finns"""
+        start, matrix = self.counts.get((period, facet), (0, np.zeros((0, 0), np.int64)))
+        if not matrix.size:
+            return np.zeros(0, np.int64), matrix
+        first = start if first is None else first
+        last = start + matrix.shape[0] - 1 if last is None else last
+        if last < first:
+            return np.zeros(0, np.int64), np.zeros((0, matrix.shape[1]), np.int64)
+        table = np.zeros((last - first + 1, matrix.shape[1]), np.int64)
+        lo, hi = max(first, start), min(last, start + matrix.shape[0] - 1)
+        if lo <= hi:
+            table[lo - first:hi - first + 1] = matrix[lo - start:hi - start + 1]
+        return np.arange(first, last + 1), table
+
+    def span(self, period):
+        """Första och sista periodnummer med artiklar, eller None"""
+        start, matrix = self.counts.get((period, None), (0, np.zeros((0, 0), np.int64)))
+        used = np.flatnonzero(matrix[:, 0]) if matrix.size else []
+        return (start + int(used[0]), start + int(used[-1])) if len(used) else None
+
+class FacetIndex:
+    """Artiklarna i minnet som kolumner, med facettfilter som vektoroperationer.
+
+    En rad per artikel, sorterade på id. Kategoriska fält (källa, typ,
+    ämne, allvarlighetsgrad, datumsträngar) lagras som koder i numpy-arrayer
+    med en Vocabulary per fält, modus som en bitmask (bit = kod i modus-
+    ordlistan). Bara titel och url ligger kvar som Python-strängar. Filter
+    blir jämförelser över kolumnerna; sorteringsordningarna (nyast scrapade
+    respektive nyast publicerade först) är radpermutationer som sorteras om
+    först när något ändrats. Nycklarna (-scrape_run, position, id) och
+    (-dag, -scrape_run, position, id) används som cursor. Artiklarna lämnas
+    ut som dicts via get()/articles.
+    """
+
+    # Kolumn -> numpy-typ. Koder och dag 0 = saknas (id och dagar börjar på 1).
+    COLUMNS = {
+        'id': 'int64',
+        'scrape_run': 'int32',
+        'position': 'int32',
+        'day': 'int32',
+        'cluster_id': 'int64',
+        'source': 'int32',
+        'date': 'int32',
+        'published': 'int32',
+        'source_type': 'int16',
+        'topic': 'int16',
+        'severity': 'int16',
+        'modus': 'uint64',
+        'has_url': 'bool',
+    }
+    CODED = ['source', 'date', 'published', 'source_type', 'topic', 'severity']
+    SCAN_CHUNK = 512  # rader per filtersteg; växer när få träffar
+    SELECTIVE = 0.05  # villkor som träffar högst 5 % av raderna går via postningslistorna
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.size = 0
+        self.data = {name: np.zeros(0, dtype) for name, dtype in self.COLUMNS.items()}
+        self.titles = []
+        self.urls = []
+        self.vocab = {field: Vocabulary() for field in self.CODED}
+        # Reglernas ordning, så att modus-listan kommer tillbaka som klassificeringen gav den
+        self.vocab['modus'] = Vocabulary([label for label, _ in CLASSIFICATION_RULES['modus']]
+                                         + [DEFAULT_CLASSIFICATION['modus']])
+        self.articles = ArticlesView(self)
+        self._days = {}      # (published-kod, date-kod) -> dag
+        self._labels = {}    # modus-bitmask -> etiketter
+        self._sorted = None  # version som permutationerna nedan gäller
+        self._order = self._by_date = self._by_date_days = None
+        self._postings = {}  # (ordning, facett) -> per kod: stigande index i ordningens permutation
+        self.trends = TrendAggregates()
+        # Ökas vid varje ändring - nyckel för cachar av härledd data
+        self.version = getattr(self, 'version', 0) + 1
+
+    def column(self, name):
+        """Kolumnens använda del (en vy, inte en kopia)"""
+        return self.data[name][:self.size]
+
+    def _day(self, published, date_code):
+        key = (published, date_code)
+        day = self._days.get(key)
+        if day is None:
+            if published:
+                day = date.fromisoformat(self.vocab['published'].values[published]).toordinal()
+            else:
+                parsed = parse_article_date(self.vocab['date'].values[date_code])
+                day = parsed.toordinal() if parsed else 0
+            self._days[key] = day
+        return day
+
+    def _modus_bits(self, labels):
+        bits = 0
+        for label in labels or ():
+            code = self.vocab['modus'].code(label)
+            if code >= 64:
+                raise ValueError(f"För många modus-värden för bitmasken ({label})")
+            bits |= 1 << code
+        return bits
+
+    def _row_values(self, article):
+        """Kolumnvärdena för en artikel, i COLUMNS-ordning"""
+        codes = {field: self.vocab[field].code(article.get(field)) for field in self.CODED}
+        return (article['id'], article['scrape_run'], article['position'],
+                self._day(codes['published'], codes['date']), article.get('cluster_id') or 0,
+                *(codes[field] for field in self.CODED), self._modus_bits(article.get('modus')),
+                bool(article.get('url')))
+
+    def add(self, articles):
+        """Lägg till eller ersätt artiklar (måste ha id, scrape_run och position)"""
+        if not articles:
+            return
+        with self.lock:
+            ids = self.column('id')
+            incoming = np.unique(np.fromiter((a['id'] for a in articles), 'int64', len(articles)))
+            rows = np.searchsorted(ids, incoming)
+            replaced = rows[rows < self.size]
+            self.trends.update(self._trend_columns(replaced[ids[replaced] == incoming[rows < self.size]]), -1)
+            appended = []
+            for article in articles:
+                row = int(np.searchsorted(ids, article['id']))
+                if row < self.size and ids[row] == article['id']:
+                    self._set_row(row, article)
+                else:
+                    appended.append(article)
+            if appended:
+                self._append(appended)
+            self.trends.update(self._trend_columns(np.searchsorted(self.column('id'), incoming)))
+            self.version += 1
+
+    def _set_row(self, row, article):
+        for name, value in zip(self.COLUMNS, self._row_values(article)):
+            self.data[name][row] = value
+        self.titles[row] = article['title']
+        self.urls[row] = article.get('url')
+
+    def _append(self, articles):
+        size = self.size + len(articles)
+        if size > len(self.data['id']):
+            capacity = max(size, 2 * len(self.data['id']), 1024)
+            for name, column in self.data.items():
+                grown = np.zeros(capacity, column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.data[name] = grown
+        rows = np.array([self._row_values(a) for a in articles], dtype=object)
+        for i, name in enumerate(self.COLUMNS):
+            self.data[name][self.size:size] = rows[:, i].astype(self.COLUMNS[name])
+        self.titles.extend(a['title'] for a in articles)
+        self.urls.extend(a.get('url') for a in articles)
+        last = self.data['id'][self.size - 1] if self.size else 0
+        self.size = size
+        # Nya artiklar får nästan alltid högre id än de gamla; annars sortera om raderna
+        ids = self.column('id')
+        if ids[size - len(articles)] < last or np.any(np.diff(ids[size - len(articles):]) < 0):
+            self._permute(np.argsort(ids, kind='stable'))
+
+    def _permute(self, rows):
+        for name in self.COLUMNS:
+            self.data[name][:self.size] = self.data[name][rows]
+        self.titles = [self.titles[i] for i in rows]
+        self.urls = [self.urls[i] for i in rows]
+
+    def rebuild(self, articles):
+        """Bygg om från grunden - en kolumn i taget i stället för rad för rad"""
+        with self.lock:
+            self.__init__()
+            articles = sorted(articles, key=lambda a: a['id'])
+            n = len(articles)
+            for name in ('id', 'scrape_run', 'position'):
+                self.data[name] = np.fromiter((a[name] for a in articles), self.COLUMNS[name], n)
+            self.data['cluster_id'] = np.fromiter((a.get('cluster_id') or 0 for a in articles), 'int64', n)
+            for field in self.CODED:
+                code = self.vocab[field].code
+                self.data[field] = np.fromiter((code(a.get(field)) for a in articles), self.COLUMNS[field], n)
+            self.data['day'] = np.fromiter(map(self._day, self.data['published'].tolist(), self.data['date'].tolist()),
+                                           'int32', n)
+            self.data['modus'] = np.fromiter((self._modus_bits(a.get('modus')) for a in articles), 'uint64', n)
+            self.data['has_url'] = np.fromiter((bool(a.get('url')) for a in articles), 'bool', n)
+            self.titles = [a['title'] for a in articles]
+            self.urls = [a.get('url') for a in articles]
+            self.size = n
+            self.trends.update(self._trend_columns(slice(0, n)))
+
+    def __len__(self):
+        return self.size
+
+    def get(self, article_id):
+        """Artikeln som dict, eller None"""
+        with self.lock:
+            ids = self.column('id')
+            row = int(np.searchsorted(ids, article_id))
+            if row == self.size or ids[row] != article_id:
+                return None
+            return self._articles([row])[0]
+
+    def _articles(self, rows):
+        """Raderna som dicts - kolumnerna plockas ut en gång per anrop, inte per fält och rad"""
+        rows = np.asarray(rows, dtype=np.intp)
+        values = {}
+        for field in ARTICLE_FIELDS:
+            if field == 'title':
+                values[field] = [self.titles[i] for i in rows.tolist()]
+            elif field == 'url':
+                values[field] = [self.urls[i] for i in rows.tolist()]
+            else:
+                lookup = self.vocab[field].values
+                values[field] = [lookup[code] for code in self.data[field][rows].tolist()]
+        values['modus'] = [list(self._modus_labels(bits)) for bits in self.data['modus'][rows].tolist()]
+        for name in ('id', 'scrape_run', 'position'):
+            values[name] = self.data[name][rows].tolist()
+        values['cluster_id'] = [c or None for c in self.data['cluster_id'][rows].tolist()]
+        fields = ['id'] + ARTICLE_FIELDS + ['modus', 'scrape_run', 'position', 'cluster_id']
+        return [dict(zip(fields, row)) for row in zip(*(values[f] for f in fields))]
+
+    def _modus_labels(self, bits):
+        labels = self._labels.get(bits)
+        if labels is None:
+            labels = self._labels[bits] = tuple(label for code, label in enumerate(self.vocab['modus'].values)
+                                                if bits >> code & 1)
+        return labels
+
+    def _conditions(self, filters):
+        """[(kolumn, koder eller modus-bitmask)], eller None om något filter inte kan träffa"""
+        conditions = []
+        for facet, values in (filters or {}).items():
+            codes = self.vocab[facet].lookup(values)
+            if not codes:
+                return None
+            if facet == 'modus':
+                conditions.append((facet, np.uint64(sum(1 << code for code in codes))))
+            else:
+                conditions.append((facet, np.array(codes, dtype=self.COLUMNS[facet])))
+        return conditions
+
+    def _matches(self, rows, conditions, day_range=None):
+        """Mask över rows (radnummer, eller slice för alla rader) för raderna som uppfyller alla villkor"""
+        mask = None
+        for facet, wanted in conditions:
+            values = self.data[facet][rows]
+            if facet == 'modus':
+                hit = (values & wanted) != 0
+            elif len(wanted) == 1:
+                hit = values == wanted[0]
+            else:
+                hit = np.isin(values, wanted)
+            mask = hit if mask is None else mask & hit
+        if day_range:
+            days = self.data['day'][rows]
+            hit = (days >= day_range[0]) & (days <= day_range[1])
+            mask = hit if mask is None else mask & hit
+        return mask
+
+    def ids_for(self, facet, values):
+        """Mängden id som har något av värdena i facetten"""
+        with self.lock:
+            conditions = self._conditions({facet: values})
+            if conditions is None:
+                return set()
+            rows = slice(0, self.size)
+            return set(self.data['id'][rows][self._matches(rows, conditions)].tolist())
+
+    def stats(self):
+        """Dashboardens nyckeltal, räknade över kolumnerna"""
+        with self.lock:
+            severity = self.vocab['severity'].codes.get('high')
+            modus = self.column('modus')
+            per_label = {label: int(np.count_nonzero(modus & np.uint64(1 << code)))
+                         for code, label in enumerate(self.vocab['modus'].values) if code}
+            return {
+                'total': self.size,
+                'sources': int(np.count_nonzero(np.bincount(self.column('source'))[1:])),
+                'with_url': int(np.count_nonzero(self.column('has_url'))),
+                'high': int(np.count_nonzero(self.column('severity') == severity)) if severity else 0,
+                'modus': {label: count for label, count in per_label.items() if count},
+            }
+
+    def _trend_columns(self, rows):
+        return {name: self.data[name][rows] for name in ['day'] + TrendAggregates.FACETS}
+
+    def analytics(self, period='month', facets=None, since=None, until=None, top=10):
+        """Antal per period och facettvärde ur de materialiserade aggregaten.
+
+        period: 'week' eller 'month'. facets: delmängd av TrendAggregates.FACETS.
+        since/until: datetime.date, perioderna som innehåller dem tas med.
+        top: antal källor per period i top_sources.
+        """
+        trends = self.trends
+        with self.lock:
+            span = trends.span(period)
+            if span is None:
+                return {'period': period, 'periods': [], 'total': [], 'series': {}, 'top_sources': [],
+                        'undated': trends.undated}
+            first, last = span
+            if since:
+                first = int(trends.period_numbers(np.array([since.toordinal()]), period)[0])
+            if until:
+                last = int(trends.period_numbers(np.array([until.toordinal()]), period)[0])
+            if last - first + 1 > ANALYTICS_MAX_PERIODS:
+                raise ValueError(f"högst {ANALYTICS_MAX_PERIODS} perioder per anrop")
+            numbers, totals = trends.table(period, None, first, last)
+            series = {}
+            for facet in facets or trends.FACETS:
+                _, table = trends.table(period, facet, first, last)
+                labels = self.vocab[facet].values  # modus: koden är bitnumret
+                used = np.flatnonzero(table.sum(axis=0)) if table.size else []
+                series[facet] = {labels[code]: table[:, code].tolist() for code in used if code}
+            _, sources = trends.table(period, 'source', first, last)
+            top_sources = [[] for _ in numbers]
+            if sources.size:
+                top_sources = []
+                order = np.argsort(-sources, axis=1, kind='stable')[:, :top]
+                names = self.vocab['source'].values
+                for row, codes in enumerate(order.tolist()):
+                    top_sources.append([{'source': names[code], 'count': int(sources[row, code])}
+                                        for code in codes if sources[row, code] > 0])
+            return {
+                'period': period,
+                'periods': [trends.period_label(int(n), period) for n in numbers],
+                'total': totals[:, 0].tolist(),
+                'series': series,
+                'top_sources': top_sources,
+                'undated': trends.undated,
+            }
+
+    def _key(self, row, order):
+        data = self.data
+        key = (-int(data['scrape_run'][row]), int(data['position'][row]), int(data['id'][row]))
+        return (-int(data['day'][row]),) + key if order == 'date' else key
+
+    def _sort(self):
+        """Permutationerna för båda ordningarna, om något ändrats sedan sist"""
+        if self._sorted == self.version:
+            return
+        data = {name: self.column(name) for name in ('id', 'position', 'scrape_run', 'day')}
+        self._order = np.lexsort((data['id'], data['position'], -data['scrape_run']))
+        dated = np.flatnonzero(data['day'])
+        self._by_date = dated[np.lexsort((data['id'][dated], data['position'][dated],
+                                          -data['scrape_run'][dated], -data['day'][dated]))]
+        self._by_date_days = -data['day'][self._by_date]  # stigande, för datumintervall
+        self._postings = {}
+        self._sorted = self.version
+
+    def _posting_lists(self, order, facet):
+        """Per kod (modus: bit) de index i ordningens permutation som har den, stigande - byggs vid behov"""
+        key = (order, facet)
+        postings = self._postings.get(key)
+        if postings is None:
+            values = self.data[facet][self._by_date if order == 'date' else self._order]
+            codes = len(self.vocab[facet].values)
+            if facet == 'modus':
+                postings = [np.flatnonzero(values & np.uint64(1 << code)) for code in range(codes)]
+            else:
+                grouped = np.argsort(values, kind='stable')
+                bounds = np.concatenate(([0], np.cumsum(np.bincount(values, minlength=codes))))
+                postings = [grouped[bounds[code]:bounds[code + 1]] for code in range(codes)]
+            self._postings[key] = postings
+        return postings
+
+    def _selective_rows(self, conditions, order, lo, hi):
+        """Raderna i ordningens lo..hi som uppfyller det smalaste villkoret, ur dess
+        postningslista - None om inget villkor är smalt nog (då skannas kolumnerna)"""
+        best = None
+        for facet, wanted in conditions:
+            postings = self._posting_lists(order, facet)
+            codes = [c for c in range(64) if int(wanted) >> c & 1] if facet == 'modus' else wanted.tolist()
+            lists = [postings[code] for code in codes if code < len(postings)]
+            count = sum(map(len, lists))
+            if best is None or count < best[0]:
+                best = (count, lists)
+        if best is None or best[0] > self.SELECTIVE * self.size:
+            return None
+        lists = best[1]
+        # Flera koder: slå ihop (modus-bitar kan överlappa)
+        positions = np.unique(np.concatenate(lists)) if len(lists) > 1 else lists[0] if lists else np.zeros(0, np.intp)
+        positions = positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]
+        return (self._by_date if order == 'date' else self._order)[positions]
+
+    def _date_range(self, since, until):
+        """Intervallet i _by_date för since..until (inklusive)"""
+        lo = np.searchsorted(self._by_date_days, -until.toordinal(), 'left') if until else 0
+        hi = np.searchsorted(self._by_date_days, -since.toordinal(), 'right') if since else len(self._by_date)
+        return int(lo), int(hi)
+
+    def query(self, filters=None, since=None, until=None, cursor=None, limit=100, order='scrape'):
+        """Filtrera och paginera.
+
+        filters: facett -> lista med värden (ELLER inom en facett, OCH mellan
+        facetter). since/until: datetime.date, inklusive. order: 'scrape'
+        (senast scrapade först) eller 'date' (senast publicerade först, bara
+        daterade artiklar). cursor: nyckeln för sista artikeln på föregående
+        sida, i samma ordning. Ger (artiklar, nästa cursor).
+
+        Är något villkor smalt (SELECTIVE) tas kandidaterna ur dess
+        postningslista i stället för att kolumnerna skannas i ordning.
+        """
+        with self.lock:
+            conditions = self._conditions(filters)
+            if conditions is None:
+                return [], None
+            self._sort()
+            
+            day_range = None
+            lo, hi = self._date_range(since, until)
+            if order == 'date':
+                # Datumintervallet är ett utsnitt av tidsordningen
+                rows = self._selective_rows(conditions, order, lo, hi)
+                if rows is None:
+                    rows = self._by_date[lo:hi]
+            elif (since or until) and hi - lo < self.size // 4:
+                # Smalt datumintervall: ta intervallets rader och sortera dem i vanlig ordning
+                rows = self._by_date[lo:hi]
+                data = self.data
+                rows = rows[np.lexsort((data['id'][rows], data['position'][rows], -data['scrape_run'][rows]))]
+            else:
+                rows = self._selective_rows(conditions, order, 0, self.size)
+                if rows is None:
+                    rows = self._order
+                if since or until:
+                    day_range = (since.toordinal() if since else 1, until.toordinal() if until else np.iinfo('int32').max)
+            
+            start = bisect_right(range(len(rows)), cursor, key=lambda i: self._key(rows[i], order)) if cursor else 0
+            found = []
+            chunk = max(self.SCAN_CHUNK, limit + 1)
+            while start < len(rows) and len(found) <= limit:
+                candidates = rows[start:start + chunk]
+                if conditions or day_range:
+                    candidates = candidates[self._matches(candidates, conditions, day_range)]
+                found.extend(candidates[:limit + 1 - len(found)].tolist())
+                start += chunk
+                chunk *= 4
+            
+            next_cursor = self._key(found[limit - 1], order) if len(found) > limit else None
+            return self._articles(found[:limit]), next_cursor
+
+article_index = FacetIndex()
+
+TOKEN_RE = re.compile(r'\w+')
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+SEARCH_FIELDS = {'title': 1.0, 'source': 0.5}  # fält och vikt
+FIELD_GAP = 1000  # positionsavstånd mellan fält så att fraser inte går över fältgränsen
+PREFIX_MIN_LENGTH = 2        # kortare prefix (a*) hoppas över, som stoppord
+PREFIX_MAX_EXPANSIONS = 50   # bara de vanligaste termerna med prefixet räknas
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+class SearchIndex:
+    """Inverterat fulltextindex över titel och källa med BM25-rankning.
+
+    term -> {id: BM25-bidrag utan idf}, plus positioner för frassökning.
+    Längdnormaliseringen räknas in när artikeln indexeras (mot en sparad
+    snittlängd som räknas om först när snittet glidit iväg), så en fråga
+    är bara uppslag och summering. Stöder fraser ("money laundering"),
+    prefix (crypt*) och vanliga ord; alla delar måste träffa (OCH).
+    """
+
+    K1 = 1.2
+    B = 0.75
+    AVG_DRIFT = 0.1  # räkna om bidragen när snittlängden ändrats mer än 10 %
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.impacts = {}    # term -> {id: tf * (k1 + 1) / (tf + norm)}
+        self.positions = {}  # term -> {id: positioner}
+        self.doc_terms = {}  # id -> (text-nyckel, {term: viktad tf}), för borttagning/omräkning
+        self.doc_len = {}    # id -> viktad längd
+        self.total_len = 0.0
+        self.norm_avg = None  # snittlängden bidragen räknades med
+        self.vocabulary = []  # sorterade termer, för prefixsökning
+
+    def _norm(self, article_id):
+        return self.K1 * (1 - self.B + self.B * self.doc_len[article_id] / self.norm_avg)
+
+    def _impact(self, tf, norm):
+        return tf * (self.K1 + 1) / (tf + norm)
+
+    @staticmethod
+    def _analyze(article):
+        """Termernas positioner, viktad tf per term och viktad längd"""
+        positions = {}
+        weights = {}
+        length = 0.0
+        for n, (field, weight) in enumerate(SEARCH_FIELDS.items()):
+            tokens = tokenize(article.get(field))
+            length += weight * len(tokens)
+            for i, token in enumerate(tokens):
+                positions.setdefault(token, []).append(n * FIELD_GAP + i)
+                weights[token] = weights.get(token, 0.0) + weight
+        return positions, weights, length
+
+    def add(self, articles):
+        with self.lock:
+            for article in articles:
+                text_key = tuple(article.get(field) for field in SEARCH_FIELDS)
+                current = self.doc_terms.get(article['id'])
+                if current is not None and current[0] == text_key:
+                    continue  # samma text, inget att indexera om
+                self._remove(article['id'])
+                
+                positions, weights, length = self._analyze(article)
+                self.doc_len[article['id']] = length
+                self.total_len += length
+                if self.norm_avg is None:
+                    self.norm_avg = length or 1.0
+                norm = self._norm(article['id'])
+                
+                for term, term_positions in positions.items():
+                    docs = self.impacts.get(term)
+                    if docs is None:
+                        docs = self.impacts[term] = {}
+                        self.positions[term] = {}
+                        insort(self.vocabulary, term)
+                    docs[article['id']] = self._impact(weights[term], norm)
+                    self.positions[term][article['id']] = term_positions
+                self.doc_terms[article['id']] = (text_key, weights)
+
+    def _remove(self, article_id):
+        current = self.doc_terms.pop(article_id, None)
+        if current is None:
+            return
+        for term in current[1]:
+            docs = self.impacts[term]
+            del docs[article_id]
+            del self.positions[term][article_id]
+            if not docs:
+                del self.impacts[term]
+                del self.positions[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+        self.total_len -= self.doc_len.pop(article_id)
+
+    def _renormalize(self):
+        """Räkna om alla bidrag mot aktuell snittlängd"""
+        self.norm_avg = (self.total_len / len(self.doc_len)) or 1.0
+        for article_id, (_, weights) in self.doc_terms.items():
+            norm = self._norm(article_id)
+            for term, tf in weights.items():
+                self.impacts[term][article_id] = self._impact(tf, norm)
+
+    def _check_drift(self):
+        if not self.doc_len:
+            return
+        avg = self.total_len / len(self.doc_len)
+        if avg and abs(avg - self.norm_avg) > self.AVG_DRIFT * avg:
+            self._renormalize()
+
+    def rebuild(self, articles):
+        """Bygg om från grunden: positioner först, bidragen en gång mot den slutliga snittlängden"""
+        with self.lock:
+            self.__init__()
+            for article in articles:
+                positions, weights, length = self._analyze(article)
+                article_id = article['id']
+                self.doc_len[article_id] = length
+                self.total_len += length
+                self.doc_terms[article_id] = (tuple(article.get(field) for field in SEARCH_FIELDS), weights)
+                for term, term_positions in positions.items():
+                    docs = self.positions.get(term)
+                    if docs is None:
+                        docs = self.positions[term] = {}
+                        self.impacts[term] = {}
+                    docs[article_id] = term_positions
+            self.vocabulary = sorted(self.positions)
+            if self.doc_len:
+                self._renormalize()
+
+    def _expand_prefix(self, prefix):
+        """De PREFIX_MAX_EXPANSIONS termer med prefixet som finns i flest artiklar"""
+        start = bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in itertools.islice(self.vocabulary, start, None):
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        if len(terms) > PREFIX_MAX_EXPANSIONS:
+            terms = heapq.nlargest(PREFIX_MAX_EXPANSIONS, terms, key=lambda t: len(self.impacts[t]))
+        return terms
+
+    def _prefix_docs(self, prefix, candidates=None):
+        """{id: summa idf * bidrag} över prefixets expansioner, genom att gå igenom deras postningar"""
+        n = len(self.doc_len)
+        scores = {}
+        for term in self._expand_prefix(prefix):
+            docs = self.impacts[term]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            if candidates is not None and len(candidates) < len(docs):
+                postings = ((i, docs[i]) for i in candidates if i in docs)
+            else:
+                postings = docs.items()
+            for article_id, impact in postings:
+                if candidates is None or article_id in candidates:
+                    scores[article_id] = scores.get(article_id, 0.0) + idf * impact
+        return scores
+
+    def _phrase_docs(self, terms, candidates=None):
+        """{id: bidrag} för artiklar där termerna står i följd (poängsätts som en term)"""
+        postings = [self.positions.get(t) for t in terms]
+        if not all(postings):
+            return {}
+        ids = set(min(postings, key=len))
+        if candidates is not None:
+            ids &= candidates
+        for p in postings:
+            ids.intersection_update(p.keys())
+        
+        weights = list(SEARCH_FIELDS.values())
+        matches = {}
+        for article_id in ids:
+            following = [set(p[article_id]) for p in postings[1:]]
+            starts = [pos for pos in postings[0][article_id]
+                      if all(pos + i + 1 in positions for i, positions in enumerate(following))]
+            if starts:
+                tf = sum(weights[pos // FIELD_GAP] for pos in starts)
+                matches[article_id] = self._impact(tf, self._norm(article_id))
+        return matches
+
+    def parse_query(self, query):
+        """Dela upp en fråga i delar: ('term', t), ('prefix', p) eller ('phrase', [t...])"""
+        parts = []
+        for phrase, word in QUERY_RE.findall(query):
+            if phrase:
+                terms = tokenize(phrase)
+                if len(terms) == 1:
+                    parts.append(('term', terms[0]))
+                elif terms:
+                    parts.append(('phrase', terms))
+            elif word.endswith('*') and tokenize(word):
+                prefix = tokenize(word)[0]
+                if len(prefix) >= PREFIX_MIN_LENGTH:
+                    parts.append(('prefix', prefix))
+            else:
+                parts.extend(('term', t) for t in tokenize(word))
+        return parts
+
+    def search(self, query, allowed=None, limit=20):
+        """Ger ([(id, poäng)], antal träffar). `allowed` är en lista med
+        id-mängder (facettfilter) som en träff måste finnas i alla av."""
+        with self.lock:
+            parts = self.parse_query(query)
+            if not parts:
+                return [], 0
+            self._check_drift()
+            
+            # Ord först, sedan prefix och fraser mot redan smala kandidater
+            parts.sort(key=lambda part: ('term', 'prefix', 'phrase').index(part[0]))
+            n = len(self.doc_len)
+            part_docs = []  # (idf, {id: bidrag}); prefix har idf inräknat per expansion
+            candidates = None
+            for kind, value in parts:
+                if kind == 'term':
+                    docs = self.impacts.get(value, {})
+                    idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                elif kind == 'prefix':
+                    docs, idf = self._prefix_docs(value, candidates), 1.0
+                else:
+                    docs = self._phrase_docs(value, candidates)
+                    idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                if not docs:
+                    return [], 0
+                part_docs.append((idf, docs))
+                
+                if candidates is None:
+                    candidates = set(docs)
+                    for ids in allowed or []:
+                        candidates &= ids
+                else:
+                    candidates.intersection_update(docs)
+                if not candidates:
+                    return [], 0
+            
+            # Summera idf * bidrag per kandidat; varje del finns i varje kandidat
+            ids = list(candidates)
+            scores = [0.0] * len(ids)
+            for idf, docs in part_docs:
+                scores = [s + idf * v for s, v in zip(scores, map(docs.__getitem__, ids))]
+            
+            best = [(i, s) for s, i in heapq.nlargest(limit, zip(scores, ids))]
+            return best, len(candidates)
+
+search_index = SearchIndex()
+
+# Datasetversionen indexen i minnet motsvarar. Andra workers skriver till
+# samma databas, så varje process läser själv in det som ändrats sedan dess.
+_index_sync = {'version': 0}
+_index_sync_lock = threading.Lock()
+
+def sync_indexes():
+    """Håll indexen i minnet i fas med databasen, returnerar antal inlästa artiklar.
+
+    Versionskollen är en enda rad i meta-tabellen; bara artiklar ändrade
+    efter den version vi senast läste hämtas.
+    """
+    if store.dataset_version() == _index_sync['version']:
+        return 0
+    
+    with _index_sync_lock:
+        version = store.dataset_version()
+        if version == _index_sync['version']:
+            return 0
+        articles = store.changed_since(_index_sync['version'])
+        article_index.add(articles)
+        search_index.add(articles)
+        _index_sync['version'] = version
+        return len(articles)
+
+# Snabbladdning: alla artiklar som marshal-tuplar med datasetets id och version.
+# Vid start läses snapshoten plus det som ändrats i databasen sedan den skrevs.
+SNAPSHOT_PATH = os.environ.get('ARTICLES_SNAPSHOT', 'articles.snapshot')
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_FIELDS = ['id'] + ARTICLE_FIELDS + ['modus', 'scrape_run', 'position', 'cluster_id']
+
+def save_snapshot(articles, version, path=SNAPSHOT_PATH):
+    write_bytes_atomic(path, marshal.dumps({
+        'format': SNAPSHOT_FORMAT,
+        'dataset': store.dataset_id(),
+        'version': version,
+        'fields': SNAPSHOT_FIELDS,
+        'rows': [tuple(a[f] for f in SNAPSHOT_FIELDS) for a in articles],
+    }))
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """(version, artiklar) om snapshoten hör till den här databasen, annars None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = marshal.loads(f.read())  # marshal.load på en fil läser i små bitar
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        print(f"⚠️ Kunde inte läsa {path}: {e}")
+        return None
+    if (snapshot.get('format') != SNAPSHOT_FORMAT or snapshot.get('fields') != SNAPSHOT_FIELDS
+            or snapshot.get('dataset') != store.dataset_id()
+            or snapshot.get('version', 0) > store.dataset_version()):
+        return None
+    return snapshot['version'], [dict(zip(SNAPSHOT_FIELDS, row)) for row in snapshot['rows']]
+
+def load_indexes():
+    """Fyll indexen från snapshot + senare ändringar, eller från hela databasen"""
+    with _index_sync_lock:
+        version = store.dataset_version()
+        with startup_phase('read'):
+            snapshot = load_snapshot()
+            if snapshot is not None:
+                snapshot_version, articles = snapshot
+                changed = store.changed_since(snapshot_version) if snapshot_version < version else []
+                if changed:
+                    by_id = {a['id']: a for a in articles}
+                    by_id.update((a['id'], a) for a in changed)
+                    articles = list(by_id.values())
+            else:
+                articles = store.all_articles()
+        startup_timings['source'] = 'snapshot' if snapshot is not None else 'database'
+        with startup_phase('facet_index'):
+            article_index.rebuild(articles)
+        with startup_phase('search_index'):
+            search_index.rebuild(articles)
+        _index_sync['version'] = version
+    
+    if snapshot is None or changed:
+        with startup_phase('snapshot_write'):
+            save_snapshot(articles, version)
+
+def ingest_articles(articles, scrape_run, position):
+    """Spara en sidas artiklar och håll indexen i minnet uppdaterade"""
+    with scrape_stage('enrich'):
+        # Redan berikade artiklar behåller klassificeringen från ingressen
+        apply_sources(articles, store.sources(a['url'] for a in articles if a.get('url')))
+    with scrape_stage('persist'):
+        saved = store.upsert_articles(articles, scrape_run, position)
+    with scrape_stage('index'):
+        sync_indexes()
+    return saved
+
+# Kontrollpunkt för en pågående scraping. Sidornas artiklar committas till
+# databasen per sida; kontrollpunkten talar om var vi var så att en avbruten
+# körning (timeout, omstart) kan fortsätta i stället för att börja om.
+CHECKPOINT_PATH = 'scrape_checkpoint.json'
+
+def load_checkpoint():
+    if os.path.exists(CHECKPOINT_PATH):
+        try:
+            with open(CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Kunde inte läsa {CHECKPOINT_PATH}: {e}")
+    return None
+
+def save_checkpoint(checkpoint):
+    checkpoint['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    write_json_atomic(CHECKPOINT_PATH, checkpoint)
+
+def clear_checkpoint():
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
+# Rå-HTML för varje hämtad listsida, zlib-komprimerad och namngiven efter
+# innehållets sha256 (samma innehåll sparas en gång). Med cachen kan hela
+# artikelmängden byggas om offline (replay), t.ex. efter en parserändring,
+# utan att sajten belastas. PAGE_CACHE=0 stänger av sparandet.
+PAGE_CACHE = os.environ.get('PAGE_CACHE', '1') == '1'
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', 'page_cache')
+PAGE_CACHE_LEVEL = 6
+
+class CachedPage:
+    """Ett cachat 200-svar med de fält scrapingen läser av requests.Response"""
+    status_code = 200
+
+    def __init__(self, content, headers, digest):
+        self.content = content
+        self.headers = headers
+        self.digest = digest
+
+class PageCache:
+    """Innehållsadresserade sidor på disk, metadata i databasens page_cache.
+
+    Filerna skrivs av hämtningstrådarna (put); raden i page_cache skrivs
+    (record) först när sidans artiklar sparats, så cachen pekar bara på
+    sidor som faktiskt gått in i databasen. Raderna hör till en körning:
+    replay läser om senaste fullständiga hela körningen och sedan varje
+    körning efter den, i ordning, så att artiklar som flyttat till en
+    senare sida sedan en inkrementell körning inte tappas. Äldre körningar
+    rensas (prune) när en ny hel körning gått klart.
+    """
+
+    def __init__(self, store, directory=PAGE_CACHE_DIR):
+        self.store = store
+        self.directory = directory
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.html.z")
+
+    def put(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            with scrape_stage('cache'):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                write_bytes_atomic(path, zlib.compress(content, PAGE_CACHE_LEVEL))
+        return digest
+
+    def get(self, digest):
+        with open(self._path(digest), 'rb') as f:
+            content = zlib.decompress(f.read())
+        if hashlib.sha256(content).hexdigest() != digest:
+            raise ValueError(f"cachad sida {digest[:12]} är skadad")
+        return content
+
+    def start_run(self, scrape_run, incremental):
+        """Ny eller återupptagen körning - en befintlig rad får körningens läge, inte tvärtom"""
+        conn = self.store.connection()
+        with conn:
+            conn.execute("""
+                INSERT INTO page_cache_runs (scrape_run, incremental) VALUES (?, ?)
+                ON CONFLICT(scrape_run) DO UPDATE SET incremental = excluded.incremental, complete = 0
+            """, (scrape_run, int(incremental)))
+
+    def finish_run(self, scrape_run):
+        """Körningen gick klart - en hel körning kan nu vara utgångspunkt för replay"""
+        conn = self.store.connection()
+        with conn:
+            conn.execute("UPDATE page_cache_runs SET complete = 1 WHERE scrape_run = ?", (scrape_run,))
+
+    def record(self, scrape_run, url, page, digest, response):
+        conn = self.store.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_cache (scrape_run, page, url, digest, size, fetched_at, etag, "
+                "last_modified, content_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (scrape_run, page, url, digest, len(response.content), datetime.now().isoformat(timespec='seconds'),
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 response.headers.get('Content-Type')))
+
+    def _base_run(self, conn):
+        """Senaste fullständiga hela körningen, 0 om ingen finns"""
+        return conn.execute("SELECT COALESCE(MAX(scrape_run), 0) FROM page_cache_runs "
+                            "WHERE complete AND NOT incremental").fetchone()[0]
+
+    def replay_runs(self):
+        """[(körning, inkrementell)] att läsa om, i ordning: senaste hela körningen och allt efter den"""
+        conn = self.store.connection()
+        return [(row[0], bool(row[1])) for row in conn.execute("""
+            SELECT r.scrape_run, r.incremental FROM page_cache_runs r
+            WHERE r.scrape_run >= ? AND EXISTS (SELECT 1 FROM page_cache p WHERE p.scrape_run = r.scrape_run)
+            ORDER BY r.scrape_run
+        """, (self._base_run(conn),))]
+
+    def pages(self, scrape_run):
+        """Körningens cachade sidnummer för nuvarande BASE_URL, i ordning"""
+        rows = self.store.connection().execute(
+            "SELECT url, page FROM page_cache WHERE scrape_run = ? ORDER BY page", (scrape_run,))
+        return [row['page'] for row in rows if row['url'] == page_url(row['page'])]
+
+    def load(self, page, scrape_run):
+        row = self.store.connection().execute(
+            "SELECT * FROM page_cache WHERE scrape_run = ? AND url = ?", (scrape_run, page_url(page))).fetchone()
+        if row is None:
+            raise KeyError(f"sida {page} från körning {scrape_run} finns inte i cachen")
+        with scrape_stage('cache'):
+            content = self.get(row['digest'])
+        headers = {name: row[column] for name, column in
+                   (('ETag', 'etag'), ('Last-Modified', 'last_modified'), ('Content-Type', 'content_type'))
+                   if row[column]}
+        return CachedPage(content, headers, row['digest'])
+
+    def prune(self):
+        """Glöm körningar före senaste hela körningen och ta bort filer som ingen sida
+        pekar på längre; antal borttagna filer"""
+        conn = self.store.connection()
+        with conn:
+            base = self._base_run(conn)
+            conn.execute("DELETE FROM page_cache WHERE scrape_run < ?", (base,))
+            conn.execute("DELETE FROM page_cache_runs WHERE scrape_run < ?", (base,))
+        if not os.path.isdir(self.directory):
+            return 0
+        keep = {row[0] for row in conn.execute("SELECT DISTINCT digest FROM page_cache")}
+        removed = 0
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith('.html.z') and entry.name[:-len('.html.z')] not in keep:
+                    os.remove(entry.path)
+                    removed += 1
+        return removed
+
+page_cache = PageCache(store)
+
+SCRAPE_LEASE_TTL = 120  # sekunder; lånet förnyas av keep_alive och vid varje statusuppdatering
+STATUS_CACHE_SECONDS = 1.0  # hur gammal den delade statusen får vara när den läses
+
+class ScrapeCoordinator:
+    """Högst en scraping åt gången, över alla processer (gunicorn-workers).
+
+    Lånet ligger i databasen: den som håller det scrapar och publicerar
+    sin status där, övriga workers läser statusen därifrån. Ett lån som
+    inte förnyats inom `ttl` sekunder räknas som övergivet. Under arbetet
+    förnyas det av keep_alive, så att en sida som väntar på omförsök
+    (Retry-After, backoff) inte låter lånet löpa ut.
+    """
+
+    def __init__(self, store, ttl=SCRAPE_LEASE_TTL):
+        self.store = store
+        self.ttl = ttl
+        # Väcker statusströmmar i den här processen direkt vid varje publicering
+        self.changed = threading.Condition()
+        self.generation = 0
+        self._cached_status = (None, 0.0, None)  # (generation, läst, status)
+
+    def acquire(self):
+        """Ta lånet om det är ledigt - ger en nyckel, eller None om någon annan har det"""
+        token = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        now = time.time()
+        conn = self.store.connection()
+        with conn:
+            cursor = conn.execute("""
+                INSERT INTO scrape_lease (id, holder, expires_at) VALUES (1, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE scrape_lease.expires_at < ?
+            """, (token, now + self.ttl, now))
+        return token if cursor.rowcount == 1 else None
+
+    def renew(self, token):
+        """Förläng lånet - False om det har gått förlorat"""
+        conn = self.store.connection()
+        with conn:
+            cursor = conn.execute("UPDATE scrape_lease SET expires_at = ? WHERE holder = ?",
+                                  (time.time() + self.ttl, token))
+        return cursor.rowcount == 1
+
+    @contextmanager
+    def keep_alive(self, token):
+        """Förnya lånet var ttl/3 sekund i en egen tråd medan blocket körs"""
+        stop = threading.Event()
+        
+        def beat():
+            while not stop.wait(self.ttl / 3):
+                if not self.renew(token):
+                    return  # förlorat - nästa publish märker det
+        
+        thread = threading.Thread(target=beat, name='scrape-lease', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def release(self, token):
+        conn = self.store.connection()
+        with conn:
+            conn.execute("DELETE FROM scrape_lease WHERE holder = ?", (token,))
+
+    def is_held(self):
+        row = self.store.connection().execute("SELECT expires_at FROM scrape_lease WHERE id = 1").fetchone()
+        return row is not None and row[0] >= time.time()
+
+    def publish(self, status, token):
+        """Spara statusen där alla workers ser den och förnya lånet"""
+        conn = self.store.connection()
+        with conn:
+            conn.execute("""
+                INSERT INTO shared_state (key, value) VALUES ('scrape_status', ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, (json.dumps(status),))
+            renewed = conn.execute("UPDATE scrape_lease SET expires_at = ? WHERE holder = ?",
+                                   (time.time() + self.ttl, token)).rowcount == 1
+        with self.changed:
+            self.generation += 1
+            self.changed.notify_all()
+        return renewed
+
+    def wait_for_change(self, generation, timeout):
+        """Vänta tills statusen publicerats i den här processen, eller högst timeout sekunder.
+
+        Scrapar en annan worker märks ändringen först när timeouten löper ut.
+        """
+        with self.changed:
+            self.changed.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+    def status(self):
+        """Senast publicerade status, oavsett vilken process som scrapar.
+
+        Läses om från databasen högst var STATUS_CACHE_SECONDS (eller direkt
+        när den här processen publicerat), hur många som än frågar.
+        """
+        generation, read_at, status = self._cached_status
+        if generation != self.generation or time.monotonic() - read_at > STATUS_CACHE_SECONDS:
+            generation = self.generation
+            status = self._read_status()
+            self._cached_status = (generation, time.monotonic(), status)
+        return dict(status)
+
+    def _read_status(self):
+        row = self.store.connection().execute(
+            "SELECT value FROM shared_state WHERE key = 'scrape_status'").fetchone()
+        if row is None:
+            return dict(scrape_status)
+        status = json.loads(row[0])
+        if status['is_scraping'] and not self.is_held():
+            # Processen som scrapade dog utan att hinna skriva slutstatus
+            status['is_scraping'] = False
+            status['progress'] = "Scrapingen avbröts (processen avslutades)."
+        return status
+
+coordinator = ScrapeCoordinator(store)
+
+# Berikning: artikelns egen sida (url, hos källan) hämtas för ingress och
+# publiceringsdatum, och artikeln klassificeras om med ingressen. Hämtningen
+# sker parallellt men med högst ENRICH_PER_HOST samtidiga förfrågningar
+# (och anslutningar) och en egen anpassande takt per domän. Resultatet
+# sparas i article_sources, så ingen URL hämtas två gånger.
+ENRICH_AFTER_SCRAPE = os.environ.get('ENRICH_AFTER_SCRAPE', '0') == '1'
+ENRICH_WORKERS = int(os.environ.get('ENRICH_WORKERS', 16))
+ENRICH_PER_HOST = 2
+ENRICH_HOSTS = 64           # värdar vars anslutningar hålls öppna samtidigt
+ENRICH_RATE = 1.0           # startakt per domän (förfrågningar/s)
+ENRICH_ATTEMPTS = 2
+ENRICH_BATCH = 50           # resultat per sparande
+ENRICH_LEAD_CHARS = 600
+ENRICH_MAX_BYTES = 2 * 1024 * 1024  # mer än så läses inte av en källsida
+SOURCE_DATE_META = {'article:published_time', 'datepublished', 'date', 'pubdate', 'publishdate',
+                    'dc.date.issued', 'parsely-pub-date', 'sailthru.date', 'og:published_time'}
+SOURCE_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+JSON_LD_DATE_RE = re.compile(r'"datePublished"\s*:\s*"([^"]+)"')
+
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+def source_date(text):
+    """Datum ur en källas metadata (ISO 8601 eller som på listsidorna) -> 'YYYY-MM-DD'"""
+    if not text:
+        return None
+    m = SOURCE_DATE_RE.search(text)
+    if m:
+        try:
+            return date(*map(int, m.groups())).isoformat()
+        except ValueError:
+            return None
+    return iso_date(text)
+
+def extract_source_text(content, parser=HTML_PARSER):
+    """Ingress och publiceringsdatum ur en artikels egen sida.
+
+    Datumet tas från metataggar, <time datetime> eller JSON-LD; ingressen
+    är de första riktiga styckena i <article>/<main>, annars sidans
+    beskrivning. Körs i parsningsprocesserna.
+    """
+    with scrape_stage('source_parse'):
+        soup = BeautifulSoup(content, parser)
+    
+    with scrape_stage('source_extract'):
+        published = None
+        description = None
+        for meta in soup.find_all('meta', content=True):
+            key = (meta.get('property') or meta.get('name') or meta.get('itemprop') or '').lower()
+            if key in SOURCE_DATE_META and published is None:
+                published = source_date(meta['content'])
+            elif key in ('og:description', 'description') and not description:
+                description = clean_text(meta['content'])
+        if published is None:
+            time_tag = soup.find('time', datetime=True)
+            if time_tag is not None:
+                published = source_date(time_tag['datetime'])
+        if published is None:
+            for script in soup.find_all('script', type='application/ld+json'):
+                m = JSON_LD_DATE_RE.search(script.string or '')
+                if m and (published := source_date(m.group(1))):
+                    break
+        
+        container = soup.find('article') or soup.find('main') or soup.body or soup
+        paragraphs = []
+        length = 0
+        for p in container.find_all('p'):
+            text = clean_text(p.get_text(' '))
+            if len(text) < 60:
+                continue  # bildtexter, bylines, knappar
+            paragraphs.append(text)
+            length += len(text) + 1
+            if length >= ENRICH_LEAD_CHARS:
+                break
+        lead = ' '.join(paragraphs) or description
+        if lead and len(lead) > ENRICH_LEAD_CHARS:
+            lead = lead[:ENRICH_LEAD_CHARS].rsplit(' ', 1)[0]
+    
+    return {'lead': lead or None, 'published': published}
+
+def host_slots(url):
+    """Semafor som begränsar samtidiga förfrågningar mot url:ens värd"""
+    host = urlsplit(url).netloc
+    with _host_slots_lock:
+        slots = _host_slots.get(host)
+        if slots is None:
+            slots = _host_slots[host] = threading.BoundedSemaphore(ENRICH_PER_HOST)
+        return slots
+
+def read_source_body(response):
+    """Kroppen som bytes, högst ENRICH_MAX_BYTES - None (oläst) om den inte är HTML
+    eller säger sig vara större. Ingressen står i början, så en avkortad sida duger."""
+    if 'html' not in response.headers.get('Content-Type', 'text/html'):
+        ENRICH_SOURCES.inc(outcome='not_html')
+        return None
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit() and int(length) > ENRICH_MAX_BYTES:
+        ENRICH_SOURCES.inc(outcome='too_large')
+        return None
+    content = bytearray()
+    with scrape_stage('source_fetch'):
+        for chunk in response.iter_content(64 * 1024):
+            content += chunk
+            if len(content) >= ENRICH_MAX_BYTES:
+                del content[ENRICH_MAX_BYTES:]
+                break
+    SCRAPE_BYTES.inc(len(content))
+    return bytes(content)
+
+def fetch_source(session, url):
+    """Hämta och läs en artikels egen sida: rad till article_sources, None vid tillfälligt fel.
+
+    Svaret strömmas: Content-Type och Content-Length kontrolleras innan
+    kroppen läses, och högst ENRICH_MAX_BYTES läses.
+    """
+    try:
+        with host_slots(url):
+            response = fetch_url(session, url, attempts=ENRICH_ATTEMPTS,
+                                 limiter=get_rate_limiter(url, ENRICH_RATE), stage='source_fetch', stream=True)
+            with closing(response):
+                if response.status_code in RETRYABLE_STATUS:
+                    ENRICH_SOURCES.inc(outcome='error')
+                    return None
+                content = read_source_body(response) if response.status_code == 200 else None
+    except requests.RequestException:
+        ENRICH_SOURCES.inc(outcome='error')
+        return None  # försöks igen vid nästa berikning
+    
+    source = {'url': url, 'status': response.status_code, 'lead': None, 'published': None,
+              'fetched_at': datetime.now().isoformat(timespec='seconds')}
+    if response.status_code != 200:
+        ENRICH_SOURCES.inc(outcome='http_error')
+    elif content is not None:
+        source.update(run_in_parse_pool(extract_source_text, content))
+        ENRICH_SOURCES.inc(outcome='ok' if source['lead'] else 'no_text')
+    return source
+
+def interleave_by_host(urls):
+    """Varva URL:erna mellan värdarna så att alla trådar inte väntar på samma domän"""
+    by_host = {}
+    for url in urls:
+        by_host.setdefault(urlsplit(url).netloc, deque()).append(url)
+    queues = deque(by_host.values())
+    while queues:
+        queue = queues.popleft()
+        yield queue.popleft()
+        if queue:
+            queues.append(queue)
+
+def apply_sources(articles, sources):
+    """Klassificera om artiklarna (dictar, ändras på plats) med källornas ingress och fyll i saknat datum"""
+    for article in articles:
+        source = sources.get(article.get('url'))
+        if source is None:
+            continue
+        if source['lead']:
+            article.update(classify_article(article['title'], article.get('source', ''), source['lead']))
+        if not article.get('published') and source['published']:
+            article['published'] = source['published']
+    return articles
+
+def enrich_articles(limit=None, workers=ENRICH_WORKERS, lease=None):
+    """Berika artiklar som inte hämtats än - körs i bakgrunden, med scrapelånet"""
+    if lease is None:
+        lease = coordinator.acquire()
+        if lease is None:
+            print("⏳ En annan process scrapar redan, hoppar över berikningen")
+            return
+    
+    def update_status(**changes):
+        scrape_status.update(changes)
+        return coordinator.publish(scrape_status, lease)
+    
+    try:
+        with coordinator.keep_alive(lease):
+            _enrich(limit, workers, update_status)
+    finally:
+        coordinator.release(lease)
+
+def _save_sources(sources):
+    """Spara en omgång resultat och klassificera om artiklarna med dem; antal ändrade artiklar"""
+    store.save_sources(sources)
+    found = {s['url']: s for s in sources if s['lead'] or s['published']}
+    articles = store.articles_with_urls(found)
+    updates = reclassify_articles(articles, found)
+    store.update_classification(updates)
+    store.fill_published([(a['id'], found[a['url']]['published']) for a in articles
+                          if not a.get('published') and found[a['url']]['published']])
+    sync_indexes()
+    return len(updates)
 
-app = Flask(__name__)
+def _enrich(limit, workers, update_status):
+    urls = store.unenriched_urls(limit)
+    if not urls:
+        update_status(progress="Alla artiklar är redan berikade.")
+        return
+    print(f"🔎 Berikar {len(urls)} artiklar från källorna...")
+    update_status(is_scraping=True, progress=f"Berikar {len(urls)} artiklar...", completed=False, error=None)
+    
+    start = time.perf_counter()
+    done = changed = 0
+    batch = []
+    try:
+        with create_session(ENRICH_PER_HOST, hosts=ENRICH_HOSTS) as session:
+            pool = ThreadPoolExecutor(max_workers=max(workers, 1))
+            try:
+                futures = [pool.submit(fetch_source, session, url) for url in interleave_by_host(urls)]
+                for future in as_completed(futures):
+                    done += 1
+                    source = future.result()
+                    if source is not None:
+                        batch.append(source)
+                    if len(batch) >= ENRICH_BATCH or done == len(urls):
+                        changed += _save_sources(batch) if batch else 0
+                        batch = []
+                        if not update_status(progress=f"Berikar artiklar {done}/{len(urls)}..."):
+                            raise RuntimeError("scrapelånet har gått förlorat")
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+        
+        update_status(is_scraping=False, completed=True,
+                      progress=f"Klart! {done} artiklar berikade, {changed} omklassificerade.")
+        print(f"✅ Berikning klar på {time.perf_counter() - start:.1f}s: {done} hämtade, {changed} omklassificerade.")
+    
+    except Exception as e:
+        if batch:
+            changed += _save_sources(batch)
+        update_status(error=str(e), is_scraping=False, progress=f"Fel: {str(e)}")
+        print(f"❌ Berikningsfel: {e}")
 
-# Global status
-scrape_status = {
-    "is_scraping": False,
-    "completed": False,
-    "progress": "Inte startad",
-    "current_page": 0,
-    "total_articles": 0,
-    "error": None
-}
+def start_scrape_thread(target=None, **kwargs):
+    """Starta scraping (eller `target`, t.ex. enrich_articles) i bakgrunden med
+    scrapelånet - False om en annan tråd/process redan scrapar"""
+    lease = coordinator.acquire()
+    if lease is None:
+        return False
+    thread = threading.Thread(target=target or scrape_laundry_news, kwargs={**kwargs, 'lease': lease}, daemon=True)
+    thread.start()
+    return True
+
+def scrape_laundry_news(max_pages=MAX_PAGES, workers=SCRAPE_WORKERS, incremental=False, resume=True, replay=False,
+                        enrich=ENRICH_AFTER_SCRAPE, lease=None):
+    """Scrapa The Laundry News - körs i bakgrunden.
 
-articles_cache = []
+    I inkrementellt läge gås sidorna igenom nyast först och scrapingen
+    stoppar vid första sidan som bara innehåller redan kända titlar (eller
+    som servern svarar 304 på). Nya artiklar läggs före de befintliga.
 
-def scrape_laundry_news():
-    """Scrapa The Laundry News - körs i bakgrunden"""
-    global articles_cache, scrape_status
+    Finns en kontrollpunkt från en avbruten körning (och resume=True)
+    fortsätter vi från sidan efter den senast klara, med samma läge.
+
+    Med replay=True hämtas ingenting: sidorna i sidcachen parsas om (t.ex.
+    efter en ändring i parsern) - senaste hela körningen och körningarna
+    efter den, var och en som en ny körning med samma läge.
+    Med enrich=True berikas de nya artiklarna efter en lyckad körning.
+
+    Kräver scrapelånet (`lease` från coordinator.acquire()); utan det
+    försöker funktionen ta lånet själv och avstår om någon annan har det.
+    """
+    if lease is None:
+        lease = coordinator.acquire()
+        if lease is None:
+            print("⏳ En annan process scrapar redan, hoppar över")
+            return
+    
+    def update_status(**changes):
+        scrape_status.update(changes)
+        return coordinator.publish(scrape_status, lease)
     
+    try:
+        with coordinator.keep_alive(lease):
+            _scrape(max_pages, workers, incremental, resume, replay, update_status)
+            if enrich and scrape_status.get('completed'):
+                _enrich(None, ENRICH_WORKERS, update_status)
+    finally:
+        coordinator.release(lease)
+
+def replay_source(checkpoint, scrape_run):
+    """(cachad körning, inkrementell) som körningen scrape_run läser om vid replay"""
+    source_run, incremental = checkpoint['replay_runs'][scrape_run - checkpoint['replay_first_run']]
+    return source_run, incremental
+
+def replay_seen(checkpoint, scrape_run, incremental):
+    """Sedda titlar när en cachad körning läses om, som när den kördes: allt som
+    lästs om hittills (inkrementell) eller det körningen själv redan sparat"""
+    runs = range(checkpoint['replay_first_run'], scrape_run + 1) if incremental else [scrape_run]
+    return set().union(*(store.titles(scrape_run=run) for run in runs))
+
+def _scrape(max_pages, workers, incremental, resume, replay, update_status):
     print("🔍 Startar background scraping...")
-    scrape_status["is_scraping"] = True
-    scrape_status["progress"] = "Startar scraping..."
-    scrape_status["completed"] = False
+    # Räknarna gäller körningen - inget från förra körningen ska synas (t.ex. vid 304 på sida 1)
+    update_status(is_scraping=True, progress="Startar scraping...", completed=False, error=None,
+                  current_page=0, total_articles=0)
     
-    articles = []
-    seen = set()
+    checkpoint = load_checkpoint() if resume else None
+    if checkpoint:
+        incremental = checkpoint['incremental']
+        replay = checkpoint.get('replay', False)
+        max_pages = checkpoint['max_pages']
+        scrape_run = checkpoint['scrape_run']
+        first_page = checkpoint['last_page'] + 1
+        found = checkpoint['articles']
+        # Sedda titlar: allt i databasen (inkrementellt) eller det den här körningen redan sparat
+        seen = (replay_seen(checkpoint, scrape_run, incremental) if replay
+                else store.titles() if incremental else store.titles(scrape_run=scrape_run))
+        update_status(resumed=True, resumed_from_page=first_page, total_articles=found)
+        print(f"   Återupptar körning {scrape_run} från sida {first_page}")
+    else:
+        scrape_run = store.next_run()
+        first_page = 1
+        found = 0
+        replay_runs = page_cache.replay_runs() if replay else []
+        if replay:
+            # Varje cachad körning läses om som en egen ny körning, med samma läge
+            incremental = bool(replay_runs) and replay_runs[0][1]
+            max_pages = max(page_cache.pages(replay_runs[0][0]), default=0) if replay_runs else 0
+        seen = store.titles() if incremental and not replay else set()
+        update_status(resumed=False, resumed_from_page=None)
+        checkpoint = {
+            'scrape_run': scrape_run,
+            'incremental': incremental,
+            'replay': replay,
+            'max_pages': max_pages,
+            'last_page': 0,
+            'articles': 0,
+            'failed_pages': [],
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        if replay:
+            checkpoint['replay_runs'] = [[run, run_incremental] for run, run_incremental in replay_runs]
+            checkpoint['replay_first_run'] = scrape_run
+    
+    if not replay:
+        page_cache.start_run(scrape_run, incremental)
+    validators = load_page_validators()
+    failed = set(checkpoint.get('failed_pages', []))  # sidor som ska hämtas om
+    
+    if incremental:
+        # Sidorna hämtas en i taget (med en i förväg) - oftast räcker ett par
+        workers = 1
+    
+    def process(page, result, error):
+        """Ta hand om en hämtad och parsad sida: 'ok', 'stop' (slut på sidor/inget nytt) eller 'failed'"""
+        nonlocal found
+        if not update_status(current_page=page, progress=f"{'Läser om' if replay else 'Scrapar'} sida {page}/{max_pages}..."):
+            raise RuntimeError("scrapelånet har gått förlorat")
+        
+        if error is not None:
+            print(f"   Sida {page} misslyckades ({error}){'' if replay else ', hämtas igen senare'}")
+            return 'failed'
+        response, listing, digest = result
+        
+        if incremental and response.status_code == 304:
+            print(f"   Sida {page} oförändrad (304), klart")
+            return 'stop'
+        
+        if response.status_code in (404, 410):
+            return 'stop'  # förbi sista sidan
+        
+        if response.status_code != 200:
+            print(f"   Sida {page} gav HTTP {response.status_code}, hämtas igen senare")
+            return 'failed'
+        
+        new_articles = select_new(listing, seen)
+        SCRAPE_ARTICLES_PER_PAGE.observe(len(new_articles))
+        # Positionen följer sidnumret, så en sida som hämtas om senare hamnar ändå rätt
+        ingest_articles(new_articles, scrape_run, position=(page - 1) * PAGE_POSITIONS)
+        if not replay:
+            remember_validators(validators, page_url(page), response)
+            if digest is not None:
+                page_cache.record(scrape_run, page_url(page), page, digest, response)
+        found += len(new_articles)
+        
+        failed.discard(page)
+        checkpoint['last_page'] = max(checkpoint['last_page'], page)
+        checkpoint['articles'] = found
+        checkpoint['failed_pages'] = sorted(failed)
+        save_checkpoint(checkpoint)
+        
+        update_status(total_articles=found)
+        
+        if incremental and not new_articles:
+            print(f"   Sida {page} innehöll bara kända artiklar, klart")
+            return 'stop'
+        
+        if page % 25 == 0:
+            print(f"   Scrapade {page} sidor, {found} artiklar hittills...")
+        return 'ok'
+    
+    def run_pass(session, pages, stop_early):
+        """Hämta och behandla sidorna; misslyckade hamnar i `failed`. False om körningen måste avbrytas."""
+        # Hämtning (trådar) -> parsning/klassificering (processer) -> sparande (här, i sidordning)
+        if replay:
+            source_run, _ = replay_source(checkpoint, scrape_run)
+            
+            def fetch(session, page, validators):
+                return replay_cached_page(session, page, validators, source_run)
+        else:
+            fetch = fetch_and_parse_page
+        with closing(iter_pages_in_order(session, pages, workers, None if replay or not incremental else validators,
+                                         fetch=fetch)) as stream:
+            for page, result, error in stream:
+                try:
+                    outcome = process(page, result, error)
+                except Exception as e:
+                    print(f"   Fel på sida {page}: {e}")
+                    return False
+                if outcome == 'failed':
+                    failed.add(page)
+                elif outcome == 'stop':
+                    failed.discard(page)
+                    if stop_early:
+                        break
+        return True
     
     try:
-        max_pages = 657  # Totalt antal sidor
-        for page in range(1, max_pages + 1):
-            try:
-                scrape_status["current_page"] = page
-                scrape_status["progress"] = f"Scrapar sida {page}/{max_pages}..."
-                
-                url = f"https://thelaundrynews.com/page/{page}/" if page > 1 else "https://thelaundrynews.com/"
-                
-                response = requests.get(url, timeout=10, headers={
-                    'User-Agent': 'Mozilla/5.0'
-                })
-                
-                if response.status_code != 200:
+        with create_session(workers) as session:
+            if replay:
+                # Varje cachad körning läses om som en egen körning, i ordning. Bara de sidor
+                # körningen sparade, och inga nya försök - att läsa cachen igen hjälper inte.
+                completed = True
+                last_run = checkpoint['replay_first_run'] + len(checkpoint['replay_runs']) - 1
+                while completed and scrape_run <= last_run:
+                    source_run, _ = replay_source(checkpoint, scrape_run)
+                    completed = run_pass(session, [p for p in page_cache.pages(source_run) if p >= first_page],
+                                         stop_early=True)
+                    if failed:
+                        print(f"⚠️ {len(failed)} sidor från körning {source_run} kunde inte läsas ur sidcachen: "
+                              f"{sorted(failed)}")
+                        failed.clear()
+                    if completed and scrape_run < last_run:
+                        scrape_run += 1
+                        first_page = 1
+                        source_run, incremental = replay_source(checkpoint, scrape_run)
+                        seen = replay_seen(checkpoint, scrape_run, incremental)
+                        max_pages = max(page_cache.pages(source_run), default=0)
+                        checkpoint.update(scrape_run=scrape_run, incremental=incremental, max_pages=max_pages,
+                                          last_page=0)
+                        save_checkpoint(checkpoint)
+                    else:
+                        break
+            else:
+                # Sidor som misslyckades i en avbruten körning först, sedan resten i ordning
+                carried = sorted(p for p in failed if p < first_page)
+                completed = ((not carried or run_pass(session, carried, stop_early=False))
+                             and run_pass(session, range(first_page, max_pages + 1), stop_early=True))
+            
+            for round in range(0 if replay else SCRAPE_RETRY_ROUNDS):
+                if not completed or not failed:
                     break
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Hitta alla externa länkar
-                links = {}
-                for a in soup.find_all('a', href=True):
-                    href = a.get('href')
-                    text = a.get_text(strip=True)
-                    if href and 'http' in href and 'thelaundrynews' not in href and len(text) > 20:
-                        links[text] = href
-                
-                # Hitta artiklar via text-parsing
-                text = soup.get_text()
-                lines = [l.strip() for l in text.split('\n') if l.strip()]
-                
-                source = None
-                for i, line in enumerate(lines):
-                    if re.match(r'\d{1,2} \w+,? \d{4}', line) and i > 0 and i < len(lines) - 1:
-                        date = line
-                        potential_source = lines[i-1]
-                        title = lines[i+1]
-                        
-                        if (potential_source and len(potential_source) < 100 and 
-                            title and 30 < len(title) < 400 and
-                            title not in seen):
-                            
-                            # Hitta länk
-                            url = None
-                            for link_text, link_url in links.items():
-                                if len(set(title.lower().split()) & set(link_text.lower().split())) > 3:
-                                    url = link_url
-                                    break
-                            
-                            # Klassificera
-                            tl = title.lower()
-                            if any(w in tl for w in ['fraud', 'scam']):
-                                topic, severity = 'fraud', 'high'
-                            elif any(w in tl for w in ['trafficking', 'smuggling']):
-                                topic, severity = 'crime', 'high'
-                            elif 'corruption' in tl:
-                                topic, severity = 'corruption', 'high'
-                            else:
-                                topic, severity = 'crime', 'medium'
-                            
-                            # Identifiera penningtvättsmodus
-                            combined_text = (title + ' ' + potential_source).lower()
-                            modus = []
-                            
-                            # Fastigheter & Lyxvaror
-                            if any(w in combined_text for w in ['property', 'real estate', 'housing', 'apartment', 'villa', 'building', 'land']):
-                                modus.append('fastigheter')
-                            if any(w in combined_text for w in ['luxury', 'yacht', 'jet', 'watch', 'jewel', 'art', 'painting', 'car', 'vehicle', 'supercar', 'ferrari', 'lamborghini']):
-                                modus.append('lyxvaror')
-                            if any(w in combined_text for w in ['gold', 'diamond', 'precious metal', 'bullion']):
-                                modus.append('guld-ädelmetall')
-                            
-                            # Finansiella system
-                            if any(w in combined_text for w in ['crypto', 'bitcoin', 'blockchain', 'cryptocurrency', 'digital currency', 'token', 'nft']):
-                                modus.append('kryptovalutor')
-                            if any(w in combined_text for w in ['bank', 'account', 'transfer', 'wire', 'swift', 'offshore', 'shell company', 'nominee']):
-                                modus.append('banker-skalbolag')
-                            if any(w in combined_text for w in ['loan', 'mortgage', 'credit', 'debt', 'lending']):
-                                modus.append('lån')
-                            if any(w in combined_text for w in ['casino', 'gambling', 'betting', 'poker']):
-                                modus.append('spel-kasino')
-                            
-                            # Handel & Business
-                            if any(w in combined_text for w in ['trade', 'export', 'import', 'invoice', 'overvaluation', 'undervaluation', 'mis-invoicing']):
-                                modus.append('handelsbaserat')
-                            if any(w in combined_text for w in ['hawala', 'cash courier', 'money service', 'remittance', 'exchange']):
-                                modus.append('hawala-kontanter')
-                            if any(w in combined_text for w in ['company', 'business', 'corporate', 'subsidiary', 'front business']):
-                                modus.append('företag')
-                            
-                            # Specifika branscher
-                            if any(w in combined_text for w in ['restaurant', 'bar', 'nightclub', 'salon', 'carwash']):
-                                modus.append('kontantintensiva')
-                            if any(w in combined_text for w in ['charity', 'foundation', 'ngo', 'non-profit']):
-                                modus.append('välgörenhet')
-                            if any(w in combined_text for w in ['insurance', 'pension', 'investment fund', 'hedge fund']):
-                                modus.append('försäkring-fonder')
-                            
-                            # Om inget modus hittades
-                            if not modus:
-                                modus.append('övrigt')
-                            
-                            # Ta bara unika modus
-                            modus = list(set(modus))
-                            
-                            # Källtyp
-                            sl = potential_source.lower()
-                            if any(w in sl for w in ['eppo', 'europol', 'fca', 'gov']):
-                                source_type = 'official'
-                            elif any(w in sl for w in ['guardian', 'bbc']):
-                                source_type = 'news'
-                            elif any(w in sl for w in ['occrp', 'global initiative']):
-                                source_type = 'report'
-                            else:
-                                source_type = 'unknown'
-                            
-                            articles.append({
-                                'source': potential_source,
-                                'title': title,
-                                'date': date,
-                                'url': url,
-                                'source_type': source_type,
-                                'topic': topic,
-                                'severity': severity,
-                                'modus': modus
-                            })
-                            
-                            seen.add(title)
-                
-                scrape_status["total_articles"] = len(articles)
-                
-                # Spara progress varje 25:e sida
-                if page % 25 == 0:
-                    print(f"   Scrapade {page} sidor, {len(articles)} artiklar hittills...")
-                    with open('articles.json', 'w', encoding='utf-8') as f:
-                        json.dump(articles, f, ensure_ascii=False, indent=2)
-                    articles_cache = articles
-                
-                # Liten paus för att inte överbelasta servern
-                if page % 10 == 0:
-                    time.sleep(1)
-                
-            except Exception as e:
-                print(f"   Fel på sida {page}: {e}")
-                break
+                delay = SCRAPE_RETRY_ROUND_DELAY * 2 ** round * random.uniform(1, 1.5)
+                update_status(progress=f"Väntar {delay:.0f} s innan {len(failed)} sidor hämtas igen...")
+                print(f"   {len(failed)} sidor misslyckades, nytt försök om {delay:.0f} s")
+                time.sleep(delay)
+                completed = run_pass(session, sorted(failed), stop_early=False)
+        
+        if not replay:
+            save_page_validators(validators)
         
-        # Spara
-        with open('articles.json', 'w', encoding='utf-8') as f:
-            json.dump(articles, f, ensure_ascii=False, indent=2)
+        total = store.count()
+        if not completed or failed:
+            # Kontrollpunkten ligger kvar (med sidorna som saknas) - nästa start fortsätter härifrån
+            checkpoint['failed_pages'] = sorted(failed)
+            save_checkpoint(checkpoint)
+            missing = f", {len(failed)} sidor saknas" if failed else ""
+            update_status(is_scraping=False,
+                          progress=(f"Avbruten efter sida {checkpoint['last_page']}{missing}, "
+                                    f"fortsätter vid nästa start ({total} artiklar totalt)."))
+            print(f"⚠️ Scraping avbruten efter sida {checkpoint['last_page']}{missing}, kontrollpunkt sparad.")
+            return
         
-        articles_cache = articles
-        scrape_status["completed"] = True
-        scrape_status["is_scraping"] = False
-        scrape_status["progress"] = f"Klart! {len(articles)} artiklar scrapade."
+        clear_checkpoint()
+        if not replay:
+            page_cache.finish_run(scrape_run)
+        if not replay and (removed := page_cache.prune()):
+            print(f"   Rensade {removed} inaktuella sidor ur sidcachen")
+        update_status(is_scraping=False, completed=True,
+                      progress=f"Klart! {found} artiklar scrapade ({total} totalt).")
         
-        print(f"✅ Scraping klar! {len(articles)} artiklar sparade.")
+        print(f"✅ Scraping klar! {found} nya/uppdaterade artiklar, {total} totalt.")
         
     except Exception as e:
-        scrape_status["error"] = str(e)
-        scrape_status["is_scraping"] = False
-        scrape_status["progress"] = f"Fel: {str(e)}"
+        update_status(error=str(e), is_scraping=False, progress=f"Fel: {str(e)}")
         print(f"❌ Scraping-fel: {e}")
 
 def load_existing_articles():
-    """Ladda existerande artiklar från fil"""
-    global articles_cache
+    """Kolla om databasen har artiklar - importera articles.json om den är tom"""
+    if store.count() == 0 and os.path.exists(JSON_PATH):
+        # Bara en worker importerar; de andra får artiklarna via sync_indexes
+        lease = coordinator.acquire()
+        if lease is not None:
+            try:
+                with coordinator.keep_alive(lease):
+                    if store.count() == 0:
+                        imported = store.import_json(JSON_PATH)
+                        print(f"✅ Importerade {imported} artiklar från {JSON_PATH}")
+            except Exception as e:
+                print(f"⚠️ Kunde inte importera {JSON_PATH}: {e}")
+            finally:
+                coordinator.release(lease)
+    
+    load_indexes()
+    
+    total = len(article_index)
+    if total > 10:
+        print(f"✅ {total} artiklar i databasen")
+        return True
     
-    if os.path.exists('articles.json'):
+    return False
+
+def group_pending_duplicates():
+    """Dubblettgruppera artiklar från före cluster_id, i bakgrunden efter uppstart"""
+    if not DUPLICATE_GROUPING:
+        return
+    lease = coordinator.acquire()
+    if lease is None:
+        return  # någon annan scrapar; nästa uppstart tar resten
+    try:
+        start = time.perf_counter()
+        grouped = 0
+        while coordinator.renew(lease):
+            batch = store.assign_pending_clusters()
+            if not batch:
+                break
+            grouped += batch
+    finally:
+        coordinator.release(lease)
+    if grouped:
+        sync_indexes()
+        print(f"🔗 Dubblettgrupperade {grouped} artiklar på {time.perf_counter() - start:.1f}s")
+
+# SCRAPE_ON_STARTUP=0 stänger av automatisk scraping vid import (t.ex. i benchmarks)
+SCRAPE_ON_STARTUP = os.environ.get('SCRAPE_ON_STARTUP', '1') == '1'
+
+# Sätts när artiklarna laddats in i indexen; till dess svarar appen ändå (t.ex. /health)
+data_loaded = threading.Event()
+load_error = None  # senaste misslyckade laddningen medan den försöks igen, visas i /health
+
+def load_with_retry():
+    """load_existing_articles tills den lyckas - ett tillfälligt fel (t.ex. 'database is
+    locked' medan en annan worker importerar articles.json) ska inte lämna workern utan data"""
+    global load_error
+    attempt = 0
+    while True:
         try:
-            with open('articles.json', 'r', encoding='utf-8') as f:
-                articles = json.load(f)
-                if len(articles) > 10:
-                    articles_cache = articles
-                    print(f"✅ Laddade {len(articles)} artiklar från cache")
-                    return True
+            has_articles = load_existing_articles()
+            load_error = None
+            return has_articles
         except Exception as e:
-            print(f"⚠️ Kunde inte ladda cache: {e}")
+            delay = backoff_delay(attempt)
+            attempt += 1
+            load_error = {'error': str(e), 'attempts': attempt, 'at': datetime.now().isoformat(timespec='seconds')}
+            print(f"❌ Kunde inte ladda artiklarna ({e}), försöker igen om {delay:.1f}s")
+            time.sleep(delay)
+
+def startup():
+    """Ladda artiklarna i bakgrunden och starta scraping om det behövs.
+
+    Med flera gunicorn-workers startar bara den som får scrapelånet; de
+    andra hoppar över.
+    """
+    has_articles = load_with_retry()
+    data_loaded.set()
+    startup_timings['ready'] = round(time.perf_counter() - STARTUP_STARTED, 3)
+    print("⏱️ Uppstart: " + ", ".join(f"{phase} {value}{'s' if isinstance(value, float) else ''}"
+                                      for phase, value in startup_timings.items()))
+    group_pending_duplicates()
     
-    return False
+    if SCRAPE_ON_STARTUP and (load_checkpoint() or not has_articles):
+        if load_checkpoint():
+            # En tidigare körning avbröts - fortsätt där den slutade
+            print("📥 Avbruten scraping hittades, återupptar...")
+        else:
+            # Starta scraping i bakgrunden automatiskt
+            print("📥 Ingen cache hittades, startar automatisk scraping...")
+        if not start_scrape_thread():
+            print("⏳ En annan worker scrapar redan")
 
-# Försök ladda befintliga artiklar vid uppstart
-if not load_existing_articles():
-    # Starta scraping i bakgrunden automatiskt
-    print("📥 Ingen cache hittades, startar automatisk scraping...")
-    thread = threading.Thread(target=scrape_laundry_news, daemon=True)
-    thread.start()
+startup_timings['module'] = round(time.perf_counter() - STARTUP_STARTED, 3)
+if not in_worker_process():
+    threading.Thread(target=startup, daemon=True).start()
+
+# Vyer som inte kan svara korrekt innan artiklarna laddats
+NEEDS_DATA = {'api_articles', 'api_search', 'export_csv', 'export_excel'}
+
+@app.before_request
+def refresh_indexes():
+    """Plocka upp artiklar som en annan worker skrivit till databasen"""
+    if not data_loaded.is_set():
+        if request.endpoint in NEEDS_DATA:
+            return jsonify({'error': 'Artiklarna laddas fortfarande'}), 503, {'Retry-After': '1'}
+        return None
+    sync_indexes()
+
+TYPE_EMOJI = {'official': '🏛️', 'news': '📰', 'report': '📋', 'unknown': '❓'}
+TYPE_NAME = {'official': 'Officiellt', 'news': 'Nyhet', 'report': 'Rapport', 'unknown': 'Okänd'}
+MODUS_EMOJI = {
+    'fastigheter': '🏢',
+    'kryptovalutor': '₿',
+    'lyxvaror': '💎',
+    'guld-ädelmetall': '🥇',
+    'banker-skalbolag': '🏦',
+    'lån': '💳',
+    'spel-kasino': '🎰',
+    'handelsbaserat': '📦',
+    'hawala-kontanter': '💵',
+    'kontantintensiva': '🍽️',
+    'företag': '🏭',
+    'välgörenhet': '❤️',
+    'försäkring-fonder': '📊',
+    'övrigt': '❓'
+}
+
+DASHBOARD_ARTICLES = 100
+
+# Renderad dashboard per datasetversion - renderas om bara när artiklarna ändrats
+_dashboard_cache = {'version': None, 'html': None}
+_dashboard_lock = threading.Lock()
+
+def render_dashboard():
+    version = article_index.version
+    cached = _dashboard_cache
+    if cached['version'] == version:
+        return cached['html']
+    
+    with _dashboard_lock:
+        if _dashboard_cache['version'] != version:
+            articles, _ = article_index.query(limit=DASHBOARD_ARTICLES)
+            html = render_template(
+                'index.html',
+                stats=article_index.stats(),
+                articles=articles,
+                type_emoji=TYPE_EMOJI,
+                type_name=TYPE_NAME,
+                modus_emoji=MODUS_EMOJI
+            )
+            _dashboard_cache.update(version=version, html=html)
+        return _dashboard_cache['html']
 
 @app.route('/')
 def index():
-    global articles_cache, scrape_status
+    if not data_loaded.is_set():
+        return """
+        <!DOCTYPE html>
+        <html lang="sv">
+        <head>
+            <meta charset="UTF-8">
+            <meta http-equiv="refresh" content="1">
+            <title>Laddar artiklar...</title>
+        </head>
+        <body style="font-family: Arial; text-align: center; padding: 50px;">
+            <h1>⏳ Laddar artiklar...</h1>
+        </body>
+        </html>
+        """
+    
+    status = coordinator.status()
     
     # Om scraping pågår, visa statusida
-    if scrape_status["is_scraping"]:
+    if status["is_scraping"]:
         return f"""
         <!DOCTYPE html>
         <html lang="sv">
         <head>
             <meta charset="UTF-8">
-            <meta http-equiv="refresh" content="5">
+            <noscript><meta http-equiv="refresh" content="5"></noscript>
             <title>Scraping pågår...</title>
             <style>
                 body {{
@@ -271,17 +3281,57 @@ def index():
             <div class="status">
                 <h1>⏳ Scraping pågår...</h1>
                 <div class="loader"></div>
-                <p style="font-size: 1.2em; margin: 20px 0;">{scrape_status['progress']}</p>
-                <p>Sida: {scrape_status['current_page']}/657</p>
-                <p>Artiklar hittade: {scrape_status['total_articles']}</p>
-                <p style="opacity: 0.7; margin-top: 20px;">Sidan uppdateras automatiskt var 5:e sekund...</p>
+                <p id="progress" style="font-size: 1.2em; margin: 20px 0;">{status['progress']}</p>
+                <p>Sida: <span id="current-page">{status['current_page']}</span>/{MAX_PAGES}</p>
+                <p>Artiklar hittade: <span id="total-articles">{status['total_articles']}</span></p>
+                {f"<p>Återupptagen från sida {status['resumed_from_page']}</p>" if status['resumed'] else ""}
+                <p style="opacity: 0.7; margin-top: 20px;">Förloppet uppdateras direkt medan scrapingen pågår...</p>
             </div>
+            <script>
+                // Statusändringar skickas från servern (Server-Sent Events) i stället för att sidan laddas om
+                function showStatus(status) {{
+                    document.getElementById('progress').textContent = status.progress;
+                    document.getElementById('current-page').textContent = status.current_page;
+                    document.getElementById('total-articles').textContent = status.total_articles;
+                }}
+                function finish(status) {{
+                    if (status.error) {{
+                        document.querySelector('.loader').remove();
+                        document.getElementById('progress').textContent = status.progress;
+                    }} else {{
+                        window.location.reload();
+                    }}
+                }}
+                // Servern tar bara emot ett fåtal strömmar (503 därutöver) - fråga då var 2:a sekund
+                async function poll() {{
+                    let status;
+                    try {{
+                        status = await (await fetch('/api/status')).json();
+                    }} catch (error) {{
+                        setTimeout(poll, 2000);
+                        return;
+                    }}
+                    showStatus(status);
+                    status.is_scraping ? setTimeout(poll, 2000) : finish(status);
+                }}
+                const source = new EventSource('/api/status/stream');
+                source.addEventListener('status', (event) => showStatus(JSON.parse(event.data)));
+                source.addEventListener('done', (event) => {{
+                    source.close();
+                    finish(JSON.parse(event.data));
+                }});
+                source.onerror = () => {{
+                    if (source.readyState === EventSource.CLOSED) {{
+                        poll();
+                    }}
+                }};
+            </script>
         </body>
         </html>
         """
     
     # Om inga artiklar finns ännu
-    if not articles_cache:
+    if not len(article_index):
         return """
         <!DOCTYPE html>
         <html lang="sv">
@@ -324,425 +3374,22 @@ def index():
         </html>
         """
     
-    articles = articles_cache
-    
-    html = """
-    <!DOCTYPE html>
-    <html lang="sv">
-    <head>
-        <meta charset="UTF-8">
-        <title>The Laundry News - Dashboard</title>
-        <style>
-            * { margin: 0; padding: 0; box-sizing: border-box; }
-            body {
-                font-family: Arial, sans-serif;
-                background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
-                min-height: 100vh;
-                padding: 20px;
-            }
-            .container {
-                max-width: 1400px;
-                margin: 0 auto;
-                background: white;
-                border-radius: 12px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            }
-            header {
-                background: linear-gradient(135deg, #1e3c72 0%, #2a5298 100%);
-                color: white;
-                padding: 40px;
-                text-align: center;
-                position: relative;
-            }
-            h1 { font-size: 2.8em; margin-bottom: 10px; }
-            .header-buttons {
-                position: absolute;
-                top: 20px;
-                right: 20px;
-                display: flex;
-                gap: 10px;
-            }
-            .refresh-btn, .export-btn {
-                background: rgba(255,255,255,0.2);
-                color: white;
-                border: 2px solid white;
-                padding: 10px 20px;
-                border-radius: 8px;
-                cursor: pointer;
-                font-size: 1em;
-                text-decoration: none;
-                display: inline-block;
-            }
-            .refresh-btn:hover, .export-btn:hover {
-                background: rgba(255,255,255,0.3);
-            }
-            .stats {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 20px;
-                padding: 30px;
-                background: #f8f9fa;
-            }
-            .stat-card {
-                padding: 25px;
-                background: white;
-                border-radius: 10px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-                border-left: 5px solid #2a5298;
-            }
-            .stat-value {
-                font-size: 2.5em;
-                font-weight: bold;
-                color: #2a5298;
-            }
-            .stat-label {
-                color: #666;
-                font-size: 0.95em;
-                margin-top: 5px;
-            }
-            .content {
-                padding: 30px;
-                max-height: 800px;
-                overflow-y: auto;
-            }
-            .article {
-                padding: 20px;
-                margin-bottom: 15px;
-                background: #f8f9fa;
-                border-radius: 8px;
-                border-left: 5px solid #2a5298;
-                transition: all 0.3s;
-            }
-            .article:hover {
-                background: #e9ecef;
-                transform: translateX(8px);
-            }
-            .article-title {
-                font-weight: 600;
-                color: #1e3c72;
-                margin-bottom: 10px;
-                font-size: 1.1em;
-            }
-            .article-title a {
-                color: #1e3c72;
-                text-decoration: none;
-            }
-            .article-title a:hover {
-                color: #2a5298;
-                text-decoration: underline;
-            }
-            .article-meta {
-                display: flex;
-                gap: 15px;
-                flex-wrap: wrap;
-                font-size: 0.9em;
-            }
-            .article-source {
-                color: #2a5298;
-                font-weight: 700;
-            }
-            .source-badge {
-                background: #e3f2fd;
-                color: #1565c0;
-                padding: 4px 10px;
-                border-radius: 4px;
-                font-size: 0.85em;
-                font-weight: 600;
-            }
-            .link-icon {
-                color: #2a5298;
-                font-size: 0.85em;
-            }
-            .filters {
-                padding: 20px 30px;
-                background: #e9ecef;
-                border-bottom: 2px solid #dee2e6;
-            }
-            .filter-group {
-                margin-bottom: 15px;
-            }
-            .filter-label {
-                font-weight: 600;
-                color: #1e3c72;
-                margin-right: 10px;
-                display: inline-block;
-                min-width: 100px;
-            }
-            .filter-btn {
-                background: white;
-                border: 2px solid #2a5298;
-                color: #2a5298;
-                padding: 8px 16px;
-                margin: 4px;
-                border-radius: 6px;
-                cursor: pointer;
-                font-size: 0.9em;
-                transition: all 0.3s;
-            }
-            .filter-btn:hover {
-                background: #f0f0f0;
-            }
-            .filter-btn.active {
-                background: #2a5298;
-                color: white;
-            }
-            .hidden {
-                display: none !important;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <header>
-                <div class="header-buttons">
-                    <a href="/export/excel" class="export-btn">📥 Ladda ner Excel</a>
-                    <a href="/export/csv" class="export-btn">📥 Ladda ner CSV</a>
-                    <button class="refresh-btn" onclick="window.location.href='/start-scrape'">🔄 Ny scraping</button>
-                </div>
-                <h1>🔍 The Laundry News</h1>
-                <p style="opacity: 0.9; font-size: 1.1em;">Auto-scrapade artiklar med källänkar</p>
-            </header>
-            
-            <div class="stats">
-                <div class="stat-card">
-                    <div class="stat-value">""" + str(len(articles)) + """</div>
-                    <div class="stat-label">📰 Totalt artiklar</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">""" + str(len(set(a['source'] for a in articles))) + """</div>
-                    <div class="stat-label">🌐 Unika källor</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">""" + str(len([a for a in articles if a.get('url')])) + """</div>
-                    <div class="stat-label">🔗 Med länkar</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">""" + str(len([a for a in articles if a.get('severity') == 'high'])) + """</div>
-                    <div class="stat-label">🔴 Högrisk</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">""" + str(len([a for a in articles if 'kryptovalutor' in a.get('modus', [])])) + """</div>
-                    <div class="stat-label">₿ Krypto</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value">""" + str(len([a for a in articles if 'fastigheter' in a.get('modus', [])])) + """</div>
-                    <div class="stat-label">🏢 Fastigheter</div>
-                </div>
-            </div>
-            
-            <div class="filters">
-                <div class="filter-group">
-                    <span class="filter-label">Källtyp:</span>
-                    <button class="filter-btn active" onclick="filterByType('all')">Alla</button>
-                    <button class="filter-btn" onclick="filterByType('official')">🏛️ Officiellt</button>
-                    <button class="filter-btn" onclick="filterByType('news')">📰 Nyheter</button>
-                    <button class="filter-btn" onclick="filterByType('report')">📋 Rapporter</button>
-                    <button class="filter-btn" onclick="filterByType('unknown')">❓ Okänd</button>
-                </div>
-                <div class="filter-group">
-                    <span class="filter-label">Allvarlighetsgrad:</span>
-                    <button class="filter-btn active" onclick="filterBySeverity('all')">Alla</button>
-                    <button class="filter-btn" onclick="filterBySeverity('high')">🔴 Hög risk</button>
-                    <button class="filter-btn" onclick="filterBySeverity('medium')">🟡 Medel risk</button>
-                </div>
-                <div class="filter-group">
-                    <span class="filter-label">Ämne:</span>
-                    <button class="filter-btn active" onclick="filterByTopic('all')">Alla</button>
-                    <button class="filter-btn" onclick="filterByTopic('fraud')">Bedrägeri</button>
-                    <button class="filter-btn" onclick="filterByTopic('crime')">Brottslighet</button>
-                    <button class="filter-btn" onclick="filterByTopic('corruption')">Korruption</button>
-                </div>
-                <div class="filter-group">
-                    <span class="filter-label">Penningtvättsmodus:</span>
-                    <button class="filter-btn active" onclick="filterByModus('all')">Alla</button>
-                    <button class="filter-btn" onclick="filterByModus('fastigheter')">🏢 Fastigheter</button>
-                    <button class="filter-btn" onclick="filterByModus('kryptovalutor')">₿ Kryptovalutor</button>
-                    <button class="filter-btn" onclick="filterByModus('lyxvaror')">💎 Lyxvaror</button>
-                    <button class="filter-btn" onclick="filterByModus('guld-ädelmetall')">🥇 Guld/Ädelmetall</button>
-                    <button class="filter-btn" onclick="filterByModus('banker-skalbolag')">🏦 Banker/Skalbolag</button>
-                    <button class="filter-btn" onclick="filterByModus('lån')">💳 Lån</button>
-                    <button class="filter-btn" onclick="filterByModus('spel-kasino')">🎰 Spel/Kasino</button>
-                    <button class="filter-btn" onclick="filterByModus('handelsbaserat')">📦 Handelsbaserat</button>
-                    <button class="filter-btn" onclick="filterByModus('hawala-kontanter')">💵 Hawala/Kontanter</button>
-                    <button class="filter-btn" onclick="filterByModus('kontantintensiva')">🍽️ Kontantintensiva</button>
-                    <button class="filter-btn" onclick="filterByModus('företag')">🏭 Företag</button>
-                    <button class="filter-btn" onclick="filterByModus('välgörenhet')">❤️ Välgörenhet</button>
-                    <button class="filter-btn" onclick="filterByModus('försäkring-fonder')">📊 Försäkring/Fonder</button>
-                </div>
-            </div>
-            
-            <div class="content">
-                <h2 style="color: #1e3c72; margin-bottom: 20px;">Artiklar</h2>
-    """
-    
-    type_emoji = {'official': '🏛️', 'news': '📰', 'report': '📋', 'unknown': '❓'}
-    type_name = {'official': 'Officiellt', 'news': 'Nyhet', 'report': 'Rapport', 'unknown': 'Okänd'}
-    
-    for a in articles[:100]:
-        title_html = a['title']
-        if a.get('url'):
-            title_html = f'<a href="{a["url"]}" target="_blank">{a["title"]} ↗</a>'
-        
-        st = a.get('source_type', 'unknown')
-        severity = a.get('severity', 'medium')
-        topic = a.get('topic', 'crime')
-        modus_list = a.get('modus', ['övrigt'])
-        modus_str = ','.join(modus_list)
-        
-        html += f"""
-                <div class="article" data-type="{st}" data-severity="{severity}" data-topic="{topic}" data-modus="{modus_str}">
-                    <div class="article-title">{title_html}</div>
-                    <div class="article-meta">
-                        <span class="article-source">{a['source']}</span>
-                        <span>{a['date']}</span>
-                        <span class="source-badge">{type_emoji[st]} {type_name[st]}</span>
-        """
-        
-        # Lägg till modus-badges
-        modus_emoji = {
-            'fastigheter': '🏢',
-            'kryptovalutor': '₿',
-            'lyxvaror': '💎',
-            'guld-ädelmetall': '🥇',
-            'banker-skalbolag': '🏦',
-            'lån': '💳',
-            'spel-kasino': '🎰',
-            'handelsbaserat': '📦',
-            'hawala-kontanter': '💵',
-            'kontantintensiva': '🍽️',
-            'företag': '🏭',
-            'välgörenhet': '❤️',
-            'försäkring-fonder': '📊',
-            'övrigt': '❓'
-        }
-        
-        for m in modus_list:
-            emoji = modus_emoji.get(m, '❓')
-            html += f'<span class="source-badge" style="background: #fff3cd; color: #856404;">{emoji} {m.title()}</span>'
-        
-        html += """
-                    </div>
-        """
-        
-        # Visa primärkälla-länk tydligt
-        if a.get('url'):
-            html += f"""
-                    <div style="margin-top: 10px; padding: 8px; background: #e8f4f8; border-radius: 4px;">
-                        <strong>🔗 Primärkälla:</strong> <a href="{a['url']}" target="_blank" style="color: #0066cc; text-decoration: none;">{a['url']}</a>
-                    </div>
-            """
-        
-        html += """
-                </div>
-        """
-    
-    html += """
-            </div>
-        </div>
-        <script>
-            let currentType = 'all';
-            let currentSeverity = 'all';
-            let currentTopic = 'all';
-            let currentModus = 'all';
-            
-            function filterByType(type) {
-                currentType = type;
-                applyFilters();
-                updateActiveButton('type', type);
-            }
-            
-            function filterBySeverity(severity) {
-                currentSeverity = severity;
-                applyFilters();
-                updateActiveButton('severity', severity);
-            }
-            
-            function filterByTopic(topic) {
-                currentTopic = topic;
-                applyFilters();
-                updateActiveButton('topic', topic);
-            }
-            
-            function filterByModus(modus) {
-                currentModus = modus;
-                applyFilters();
-                updateActiveButton('modus', modus);
-            }
-            
-            function applyFilters() {
-                const articles = document.querySelectorAll('.article');
-                let visibleCount = 0;
-                
-                articles.forEach(article => {
-                    const type = article.dataset.type;
-                    const severity = article.dataset.severity;
-                    const topic = article.dataset.topic;
-                    const modusList = article.dataset.modus ? article.dataset.modus.split(',') : [];
-                    
-                    const typeMatch = currentType === 'all' || type === currentType;
-                    const severityMatch = currentSeverity === 'all' || severity === currentSeverity;
-                    const topicMatch = currentTopic === 'all' || topic === currentTopic;
-                    const modusMatch = currentModus === 'all' || modusList.includes(currentModus);
-                    
-                    if (typeMatch && severityMatch && topicMatch && modusMatch) {
-                        article.classList.remove('hidden');
-                        visibleCount++;
-                    } else {
-                        article.classList.add('hidden');
-                    }
-                });
-                
-                console.log(`Visar ${visibleCount} artiklar`);
-            }
-            
-            function updateActiveButton(filterType, value) {
-                const buttons = document.querySelectorAll('.filter-btn');
-                buttons.forEach(btn => {
-                    const onclick = btn.getAttribute('onclick');
-                    if (onclick) {
-                        if (filterType === 'type' && onclick.includes('filterByType')) {
-                            btn.classList.remove('active');
-                            if (onclick.includes(`'${value}'`)) {
-                                btn.classList.add('active');
-                            }
-                        } else if (filterType === 'severity' && onclick.includes('filterBySeverity')) {
-                            btn.classList.remove('active');
-                            if (onclick.includes(`'${value}'`)) {
-                                btn.classList.add('active');
-                            }
-                        } else if (filterType === 'topic' && onclick.includes('filterByTopic')) {
-                            btn.classList.remove('active');
-                            if (onclick.includes(`'${value}'`)) {
-                                btn.classList.add('active');
-                            }
-                        } else if (filterType === 'modus' && onclick.includes('filterByModus')) {
-                            btn.classList.remove('active');
-                            if (onclick.includes(`'${value}'`)) {
-                                btn.classList.add('active');
-                            }
-                        }
-                    }
-                });
-            }
-        </script>
-    </body>
-    </html>
-    """
-    
-    return html
+    return render_dashboard()
 
 @app.route('/start-scrape')
 def start_scrape():
     """Starta en ny scraping manuellt"""
-    global scrape_status
+    # Inkrementell uppdatering om vi redan har data, ?full=1 tvingar full scraping.
+    # ?replay=1 bygger om artiklarna från sidcachen utan att hämta något.
+    # En avbruten körning återupptas, om inte ?restart=1 anges.
+    replay = request.args.get('replay') == '1'
+    incremental = store.count() > 0 and request.args.get('full') != '1' and not replay
+    resume = request.args.get('restart') != '1'
     
-    if scrape_status["is_scraping"]:
+    # Starta scraping i bakgrunden - om ingen annan worker redan gör det
+    if not start_scrape_thread(incremental=incremental, resume=resume, replay=replay):
         return "<h1>⏳ Scraping pågår redan! <a href='/'>Tillbaka</a></h1>"
     
-    # Starta scraping i bakgrunden
-    thread = threading.Thread(target=scrape_laundry_news, daemon=True)
-    thread.start()
-    
     # Redirecta till huvudsidan som visar status
     return """
     <html>
@@ -756,105 +3403,471 @@ def start_scrape():
     </html>
     """
 
-@app.route('/export/excel')
-def export_excel():
-    """Exportera alla artiklar till Excel"""
-    global articles_cache
+@app.route('/api/reclassify', methods=['POST'])
+def api_reclassify():
+    """Klassificera om alla artiklar med aktuella regler utan att scrapa"""
+    # Scrapelånet hålls under omklassificeringen så att ingen scraping startar samtidigt
+    lease = coordinator.acquire()
+    if lease is None:
+        return jsonify({'error': 'Scraping pågår'}), 409
+    
+    start = time.perf_counter()
+    try:
+        with coordinator.keep_alive(lease):
+            updates = reclassify_articles(store.iter_articles(), store.sources())
+            store.update_classification(updates)
+    finally:
+        coordinator.release(lease)
+    sync_indexes()
     
-    if not articles_cache:
+    return jsonify({
+        'articles': store.count(),
+        'changed': len(updates),
+        'seconds': round(time.perf_counter() - start, 3)
+    })
+
+@app.route('/api/enrich', methods=['POST'])
+def api_enrich():
+    """Hämta artiklarnas egna sidor och klassificera om dem, i bakgrunden (?limit=N för de N nyaste)"""
+    limit = request.args.get('limit', type=int)
+    if not start_scrape_thread(target=enrich_articles, limit=limit):
+        return jsonify({'error': 'Scraping pågår'}), 409
+    return jsonify({'started': True, 'pending': len(store.unenriched_urls(limit))}), 202
+
+# Exportkolumner: rubrik och hur värdet hämtas ur en artikel
+EXPORT_COLUMNS = [
+    ('Källa', lambda a: a.get('source', '')),
+    ('Rubrik', lambda a: a.get('title', '')),
+    ('Länk', lambda a: a.get('url', '')),
+    ('Datum', lambda a: a.get('date', '')),
+    ('Källtyp', lambda a: a.get('source_type', '')),
+    ('Ämne', lambda a: a.get('topic', '')),
+    ('Allvarlighetsgrad', lambda a: a.get('severity', '')),
+    ('Penningtvättsmodus', lambda a: ', '.join(a.get('modus', []))),
+]
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS]
+EXPORT_BATCH = 500
+
+def export_rows(articles):
+    """En rad (lista med värden) per artikel, i EXPORT_COLUMNS-ordning"""
+    for article in articles:
+        yield [value(article) for _, value in EXPORT_COLUMNS]
+
+def iter_filtered_articles(filters=None, since=None, until=None, batch_size=EXPORT_BATCH):
+    """Alla artiklar som matchar filtren, nyast först, hämtade sida för sida ur indexet"""
+    cursor = None
+    while True:
+        articles, cursor = article_index.query(filters, since=since, until=until,
+                                               cursor=cursor, limit=batch_size)
+        yield from articles
+        if cursor is None:
+            break
+
+def parse_export_args(args):
+    """(filter, since, until) från samma query-parametrar som dashboarden/API:t"""
+    return parse_article_filters(args), parse_iso_date(args.get('since')), parse_iso_date(args.get('until'))
+
+def export_filename(extension):
+    return f'laundry_news_artiklar_{datetime.now().strftime("%Y%m%d")}.{extension}'
+
+def stream_csv(rows):
+    """Koda rader till CSV i små bitar - utf-8-sig (BOM) för Excel-kompatibilitet"""
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_HEADERS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % EXPORT_BATCH == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+@app.route('/export/csv')
+def export_csv():
+    """Exportera artiklar till CSV, strömmat rad för rad.
+
+    Tar samma filter som /api/articles (source_type, severity, topic,
+    modus, source, since, until).
+    """
+    if not len(article_index):
         return "<h1>❌ Ingen data att exportera. Starta scraping först!</h1>"
     
-    # Skapa DataFrame
-    export_data = []
-    for article in articles_cache:
-        export_data.append({
-            'Källa': article.get('source', ''),
-            'Rubrik': article.get('title', ''),
-            'Länk': article.get('url', ''),
-            'Datum': article.get('date', ''),
-            'Källtyp': article.get('source_type', ''),
-            'Ämne': article.get('topic', ''),
-            'Allvarlighetsgrad': article.get('severity', ''),
-            'Penningtvättsmodus': ', '.join(article.get('modus', []))
-        })
-    
-    df = pd.DataFrame(export_data)
-    
-    # Skapa Excel-fil i minnet
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Artiklar')
+    try:
+        filters, since, until = parse_export_args(request.args)
+    except ValueError as e:
+        return f"<h1>❌ Ogiltigt filter: {e}</h1>", 400
+    
+    rows = export_rows(iter_filtered_articles(filters, since, until))
+    return Response(
+        stream_csv(rows),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={export_filename("csv")}'}
+    )
+
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', 'export_cache')
+EXCEL_COLUMN_WIDTHS = [30, 80, 60, 15, 15, 15, 20, 40]  # Källa, Rubrik, Länk, Datum, Källtyp, Ämne, Allvarlighetsgrad, Modus
+EXCEL_ATTEMPTS = 3  # skrivningar innan synken hålls borta under den sista
+_excel_lock = threading.Lock()
+
+def write_excel(path, rows):
+    """Skriv en xlsx i openpyxls write-only-läge (rad för rad, konstant minne)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+    from openpyxl.utils import get_column_letter
+    
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Artiklar')
+    
+    # Justera kolumnbredd
+    for i, width in enumerate(EXCEL_COLUMN_WIDTHS, 1):
+        worksheet.column_dimensions[get_column_letter(i)].width = width
+    
+    # Rubrikrad i samma stil som pandas to_excel
+    header = []
+    for title in EXPORT_HEADERS:
+        cell = WriteOnlyCell(worksheet, value=title)
+        cell.font = Font(bold=True)
+        cell.border = Border(*(Side(style='thin'),) * 4)
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        header.append(cell)
+    worksheet.append(header)
+    
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(path)
+
+def excel_path(version):
+    # Databasens id med i namnet: en ny databas kan ha hunnit till samma version
+    return os.path.join(EXPORT_CACHE_DIR, f'artiklar_{store.dataset_id():x}_v{version}.xlsx')
+
+def open_if_exists(path):
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+def write_excel_version(hold_sync=False):
+    """Skriv hela indexet till en xlsx namngiven efter versionen indexet håller.
+
+    Ger sökvägen, eller None om indexet synkades medan filen skrevs (raderna
+    kan då vara från två versioner). hold_sync håller synken borta under
+    skrivningen, så att det alltid lyckas.
+    """
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=EXPORT_CACHE_DIR, prefix='.tmp-', suffix='.xlsx')
+    os.close(fd)
+    try:
+        if hold_sync:
+            with _index_sync_lock:
+                version = _index_sync['version']
+                write_excel(tmp_path, export_rows(iter_filtered_articles()))
+        else:
+            with _index_sync_lock:
+                version = _index_sync['version']  # inte mitt i en synk
+            write_excel(tmp_path, export_rows(iter_filtered_articles()))
+            if _index_sync['version'] != version:
+                os.unlink(tmp_path)
+                return None
+        path = excel_path(version)
+        os.replace(tmp_path, path)
+        return path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def cached_excel_export():
+    """Öppnad xlsx för den datasetversion indexet håller - genereras bara om data ändrats.
+
+    Nyckeln är _index_sync['version'], inte databasens version: raderna kommer
+    ur indexet. Filen öppnas innan något städas, och närmast föregående version
+    sparas, så en fil som en annan tråd eller worker just hittat tas inte bort
+    under den.
+    """
+    file = open_if_exists(excel_path(_index_sync['version']))
+    if file is not None:
+        return file
+    
+    with _excel_lock:
+        file = open_if_exists(excel_path(_index_sync['version']))
+        if file is not None:
+            return file
+        for attempt in range(EXCEL_ATTEMPTS):
+            path = write_excel_version(hold_sync=attempt == EXCEL_ATTEMPTS - 1)
+            if path is not None:
+                break
+        file = open(path, 'rb')
         
-        # Justera kolumnbredd
-        worksheet = writer.sheets['Artiklar']
-        worksheet.column_dimensions['A'].width = 30  # Källa
-        worksheet.column_dimensions['B'].width = 80  # Rubrik
-        worksheet.column_dimensions['C'].width = 60  # Länk
-        worksheet.column_dimensions['D'].width = 15  # Datum
-        worksheet.column_dimensions['E'].width = 15  # Källtyp
-        worksheet.column_dimensions['F'].width = 15  # Ämne
-        worksheet.column_dimensions['G'].width = 20  # Allvarlighetsgrad
-        worksheet.column_dimensions['H'].width = 40  # Modus
-    
-    output.seek(0)
+        # Städa bort äldre versioner, utom den senaste före den här
+        older = []
+        for entry in os.scandir(EXPORT_CACHE_DIR):
+            if entry.name.endswith('.xlsx') and not entry.name.startswith('.tmp-') and entry.path != path:
+                try:
+                    older.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass  # en annan worker hann före
+        for _, old_path in sorted(older, reverse=True)[1:]:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+    return file
+
+@app.route('/export/excel')
+def export_excel():
+    """Exportera alla artiklar till Excel (cachad fil per datasetversion)"""
+    if not len(article_index):
+        return "<h1>❌ Ingen data att exportera. Starta scraping först!</h1>"
     
     return send_file(
-        output,
+        cached_excel_export(),
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         as_attachment=True,
-        download_name=f'laundry_news_artiklar_{datetime.now().strftime("%Y%m%d")}.xlsx'
+        download_name=export_filename('xlsx')
     )
 
-@app.route('/export/csv')
-def export_csv():
-    """Exportera alla artiklar till CSV"""
-    global articles_cache
-    
-    if not articles_cache:
-        return "<h1>❌ Ingen data att exportera. Starta scraping först!</h1>"
-    
-    # Skapa DataFrame
-    export_data = []
-    for article in articles_cache:
-        export_data.append({
-            'Källa': article.get('source', ''),
-            'Rubrik': article.get('title', ''),
-            'Länk': article.get('url', ''),
-            'Datum': article.get('date', ''),
-            'Källtyp': article.get('source_type', ''),
-            'Ämne': article.get('topic', ''),
-            'Allvarlighetsgrad': article.get('severity', ''),
-            'Penningtvättsmodus': ', '.join(article.get('modus', []))
-        })
-    
-    df = pd.DataFrame(export_data)
-    
-    # Skapa CSV i minnet
-    output = BytesIO()
-    df.to_csv(output, index=False, encoding='utf-8-sig')  # utf-8-sig för Excel-kompatibilitet
-    output.seek(0)
+@app.route('/export/json')
+def export_json():
+    """Exportera alla artiklar i articles.json-format"""
+    output = StringIO()
+    store.export_json(output)
     
     return send_file(
-        output,
-        mimetype='text/csv',
+        BytesIO(output.getvalue().encode('utf-8')),
+        mimetype='application/json',
         as_attachment=True,
-        download_name=f'laundry_news_artiklar_{datetime.now().strftime("%Y%m%d")}.csv'
+        download_name=export_filename('json')
     )
 
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+
+API_ORDERS = ['scrape', 'date']
+
+# Cursorn är sorteringsnyckeln: "körning-position-id", med order=date "dag-körning-position-id"
+def encode_cursor(key):
+    if key is None:
+        return None
+    if len(key) == 4:
+        return f"{-key[0]}-{-key[1]}-{key[2]}-{key[3]}"
+    return f"{-key[0]}-{key[1]}-{key[2]}"
+
+def decode_cursor(cursor, order='scrape'):
+    parts = [int(part) for part in cursor.split('-')]
+    if len(parts) != (4 if order == 'date' else 3):
+        raise ValueError("cursorn hör inte till den här sorteringen")
+    if order == 'date':
+        day, scrape_run, position, article_id = parts
+        return (-day, -scrape_run, position, article_id)
+    scrape_run, position, article_id = parts
+    return (-scrape_run, position, article_id)
+
+def parse_iso_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def parse_article_filters(args):
+    """Facettfilter från query-parametrar, t.ex. ?modus=fastigheter,lyxvaror&severity=high"""
+    filters = {}
+    for facet in INDEX_FACETS:
+        values = [v for v in args.get(facet, '').split(',') if v and v != 'all']
+        if values:
+            filters[facet] = values
+    return filters
+
 @app.route('/api/articles')
 def api_articles():
-    return jsonify(articles_cache)
+    """Artiklar nyast först med filter, datumintervall, cursor-paginering och fältval.
+
+    ?source_type=&severity=&topic=&modus=&source=  (kommaseparerat = ELLER)
+    ?since=YYYY-MM-DD&until=YYYY-MM-DD  (publiceringsdatum)
+    ?order=scrape|date  (senast scrapade eller senast publicerade först)
+    ?limit=100&cursor=<next_cursor>&fields=title,url,date
+    """
+    try:
+        limit = min(int(request.args.get('limit', API_DEFAULT_LIMIT)), API_MAX_LIMIT)
+        if limit < 1:
+            raise ValueError("limit måste vara minst 1")
+        order = request.args.get('order', 'scrape')
+        if order not in API_ORDERS:
+            raise ValueError(f"order måste vara en av {', '.join(API_ORDERS)}")
+        cursor = decode_cursor(request.args['cursor'], order) if request.args.get('cursor') else None
+        since = parse_iso_date(request.args.get('since'))
+        until = parse_iso_date(request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': f"Ogiltig parameter: {e}"}), 400
+    
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or PUBLIC_FIELDS
+    unknown = [f for f in fields if f not in PUBLIC_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Okända fält: {', '.join(unknown)}"}), 400
+    
+    articles, next_key = article_index.query(parse_article_filters(request.args), since=since, until=until,
+                                             cursor=cursor, limit=limit, order=order)
+    return jsonify({
+        'articles': [{f: a.get(f) for f in fields} for a in articles],
+        'count': len(articles),
+        'next_cursor': encode_cursor(next_key)
+    })
+
+@app.route('/api/clusters/<int:cluster_id>')
+def api_cluster(cluster_id):
+    """Alla artiklar om samma nyhet (nära dubbletter), äldst först. cluster_id är den första artikelns id."""
+    articles = store.cluster(cluster_id)
+    if not articles:
+        return jsonify({'error': 'Okänt cluster_id'}), 404
+    return jsonify({
+        'cluster_id': cluster_id,
+        'articles': [{f: a.get(f) for f in PUBLIC_FIELDS} for a in articles],
+        'count': len(articles)
+    })
+
+@app.route('/api/analytics')
+def api_analytics():
+    """Antal artiklar per vecka eller månad per modus, ämne, allvarlighetsgrad, källa och källtyp.
+
+    ?period=month|week  ?since=YYYY-MM-DD&until=YYYY-MM-DD  (publiceringsdatum)
+    ?facets=modus,topic  (standard alla)  ?top=10  (största källorna per period)
+    Läses ur aggregat som hålls uppdaterade när artiklar sparas.
+    """
+    try:
+        period = request.args.get('period', 'month')
+        if period not in TrendAggregates.PERIODS:
+            raise ValueError(f"period måste vara en av {', '.join(TrendAggregates.PERIODS)}")
+        facets = [f for f in request.args.get('facets', '').split(',') if f] or None
+        unknown = [f for f in facets or () if f not in TrendAggregates.FACETS]
+        if unknown:
+            raise ValueError(f"okända facetter: {', '.join(unknown)}")
+        top = int(request.args.get('top', 10))
+        if top < 1:
+            raise ValueError("top måste vara minst 1")
+        return jsonify(article_index.analytics(period, facets, since=parse_iso_date(request.args.get('since')),
+                                               until=parse_iso_date(request.args.get('until')), top=top))
+    except ValueError as e:
+        return jsonify({'error': f"Ogiltig parameter: {e}"}), 400
+
+SEARCH_DEFAULT_LIMIT = 20
+
+@app.route('/api/search')
+def api_search():
+    """Fulltextsökning i titel och källa, rankad med BM25.
+
+    ?q=crypto* "money laundering" bank  (fras, prefix, ord - alla måste träffa)
+    Samma facettfilter som /api/articles, plus ?limit= och ?fields=.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Parametern q saknas'}), 400
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)), API_MAX_LIMIT)
+        if limit < 1:
+            raise ValueError("limit måste vara minst 1")
+    except ValueError as e:
+        return jsonify({'error': f"Ogiltig parameter: {e}"}), 400
+    
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or PUBLIC_FIELDS
+    unknown = [f for f in fields if f not in PUBLIC_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Okända fält: {', '.join(unknown)}"}), 400
+    
+    allowed = []
+    for facet, values in parse_article_filters(request.args).items():
+        allowed.append(article_index.ids_for(facet, values))
+    
+    start = time.perf_counter()
+    hits, total = search_index.search(query, allowed=allowed, limit=limit)
+    elapsed = time.perf_counter() - start
+    
+    results = []
+    for article_id, score in hits:
+        article = article_index.articles.get(article_id)
+        if article is not None:
+            results.append({**{f: article.get(f) for f in fields}, 'score': round(score, 4)})
+    
+    return jsonify({
+        'query': query,
+        'results': results,
+        'count': len(results),
+        'total': total,
+        'ms': round(elapsed * 1000, 3)
+    })
 
 @app.route('/api/status')
 def api_status():
-    return jsonify(scrape_status)
+    return jsonify(coordinator.status())
+
+# Varje ström håller en av workerns trådar (gunicorn --threads 8), så bara
+# ett fåtal per process; övriga klienter får 503 och frågar /api/status i
+# stället. Strömmen stängs efter en kort stund och webbläsaren återansluter.
+STATUS_STREAM_POLL = 2.0          # sekunder mellan kontroller när en annan worker scrapar
+STATUS_STREAM_HEARTBEAT = 15      # kommentarrad så att proxyer inte stänger en tyst anslutning
+STATUS_STREAM_MAX_SECONDS = 45    # därefter stängs strömmen och webbläsaren återansluter själv
+STATUS_STREAM_MAX_CLIENTS = int(os.environ.get('STATUS_STREAM_MAX_CLIENTS', 2))  # per process
+_status_stream_slots = threading.BoundedSemaphore(STATUS_STREAM_MAX_CLIENTS)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/status/stream')
+def api_status_stream():
+    """Scrapingstatusen som Server-Sent Events.
+
+    Skickar 'status' vid varje ändring (sida, antal artiklar, fel) och
+    'done' när ingen scraping längre pågår, varefter strömmen stängs.
+    Högst STATUS_STREAM_MAX_CLIENTS samtidiga strömmar per process,
+    därutöver 503 - klienten frågar då /api/status.
+    """
+    if not _status_stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'För många statusströmmar, använd /api/status'}), 503, {'Retry-After': '5'}
+    
+    def generate():
+        yield "retry: 2000\n\n"
+        started = last_sent = time.monotonic()
+        generation = coordinator.generation
+        last = None
+        while True:
+            status = coordinator.status()
+            if status != last:
+                yield sse_event('status', status)
+                last = status
+                last_sent = time.monotonic()
+            if not status['is_scraping']:
+                yield sse_event('done', status)
+                return
+            
+            now = time.monotonic()
+            if now - started > STATUS_STREAM_MAX_SECONDS:
+                return
+            if now - last_sent > STATUS_STREAM_HEARTBEAT:
+                yield ": ping\n\n"
+                last_sent = now
+            generation = coordinator.wait_for_change(generation, STATUS_STREAM_POLL)
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Servern stänger svaret även om klienten gått innan första raden skickats
+    response.call_on_close(_status_stream_slots.release)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Mätvärden i Prometheus textformat"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
 
 @app.route('/health')
 def health():
     return jsonify({
-        'status': 'ok', 
-        'articles': len(articles_cache),
-        'scraping': scrape_status['is_scraping']
+        'status': 'ok' if load_error is None else 'error',
+        'loaded': data_loaded.is_set(),
+        'load_error': load_error,
+        'articles': len(article_index),
+        'scraping': coordinator.status()['is_scraping'],
+        'startup': startup_timings
     })
 
 if __name__ == '__main__':
@@ -0,0 +1,154 @@
+"""Jämför sidextraktion: gamla vägen (html.parser + textrader) mot nya
+(snabbaste parsern + DOM-kort) på listsidor.
+
+    python bench/extract_benchmark.py                          # sidorna i bench/pages
+    python bench/extract_benchmark.py --json                   # maskinläsbart resultat
+    python bench/extract_benchmark.py --record 5 --pages live  # spara 5 livesidor i live/ först
+
+Träffsäkerhet räknas mot expected.json i sidkatalogen (om sidan finns där).
+Sidorna i bench/pages är syntetiska - skrivna i sajtens WordPress-markup,
+inte sparade från sajten - så precision och recall mot dem visar bara att
+extraktionen klarar den markupen, inte hur träffsäker den är på riktiga
+sidor. Det mäts med sidor sparade med --record och en egen expected.json.
+
+Appen körs i en temporär katalog (egen databas och snapshot), så
+befintliga filer i arbetskatalogen rörs inte.
+"""
+import argparse
+import atexit
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Appen läser sökvägar och startinställningar vid import
+START_DIR = os.getcwd()
+if __name__ == '__mp_main__':
+    # Appens parsningsprocesser importerar skriptet igen; de ärver miljön och katalogen
+    WORK_DIR = START_DIR
+else:
+    WORK_DIR = tempfile.mkdtemp(prefix='laundry-extract-')
+    atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+    os.environ.setdefault('SCRAPE_ON_STARTUP', '0')
+    os.environ['ARTICLES_DB'] = os.path.join(WORK_DIR, 'articles.db')
+    os.environ['ARTICLES_SNAPSHOT'] = os.path.join(WORK_DIR, 'articles.snapshot')
+    os.environ['EXPORT_CACHE_DIR'] = os.path.join(WORK_DIR, 'export_cache')
+    os.environ['PAGE_CACHE_DIR'] = os.path.join(WORK_DIR, 'page_cache')
+    os.chdir(WORK_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import app  # noqa: E402
+
+PAGES_DIR = os.path.join(BENCH_DIR, 'pages')
+
+VARIANTS = [
+    ('html.parser + text (gammal)', 'html.parser', app.extract_text_lines),
+    ('html.parser + kort', 'html.parser', app.extract_cards),
+    (f'{app.HTML_PARSER} + kort (ny)', app.HTML_PARSER, app.extract_cards),
+]
+
+def keep(candidate):
+    """Samma filter som parse_page använder"""
+    source, date, title, url = candidate
+    return bool(source) and len(source) < 100 and bool(title) and 30 < len(title) < 400
+
+def accuracy(candidates, expected):
+    found = {c[2]: c for c in candidates if keep(c)}
+    wanted = {e['title']: e for e in expected}
+    hits = [t for t in found if t in wanted]
+    exact = [t for t in hits
+             if (found[t][0], found[t][1], found[t][3]) ==
+                (wanted[t]['source'], wanted[t]['date'], wanted[t]['url'])]
+    return {
+        'expected': len(wanted),
+        'extracted': len(found),
+        'precision': len(hits) / len(found) if found else 0.0,
+        'recall': len(hits) / len(wanted) if wanted else 0.0,
+        'exact': len(exact) / len(wanted) if wanted else 0.0,
+    }
+
+def run(pages, expected, repeat):
+    results = []
+    for name, parser, extract in VARIANTS:
+        parse_s = extract_s = 0.0
+        scores = []
+        for filename, content in pages:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                soup = BeautifulSoup(content, parser)
+                t1 = time.perf_counter()
+                candidates = extract(soup)
+                t2 = time.perf_counter()
+                parse_s += t1 - t0
+                extract_s += t2 - t1
+            if filename in expected:
+                scores.append(accuracy(candidates, expected[filename]))
+        n = len(pages) * repeat
+        result = {
+            'variant': name,
+            'pages': len(pages),
+            'parse_ms': 1000 * parse_s / n,
+            'extract_ms': 1000 * extract_s / n,
+            'total_ms': 1000 * (parse_s + extract_s) / n,
+        }
+        if scores:
+            for key in ('precision', 'recall', 'exact'):
+                result[key] = sum(s[key] for s in scores) / len(scores)
+        results.append(result)
+    return results
+
+def record(count, pages_dir):
+    with app.create_session(1) as session:
+        for page in range(1, count + 1):
+            response = app.fetch_page(session, page)
+            response.raise_for_status()
+            path = os.path.join(pages_dir, f'page_{page:03d}.html')
+            with open(path, 'wb') as f:
+                f.write(response.content)
+            print(f'sparade {path}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', default=PAGES_DIR)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--record', type=int, default=0, metavar='N')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    args.pages = os.path.join(START_DIR, args.pages)
+
+    if args.record:
+        os.makedirs(args.pages, exist_ok=True)
+        record(args.record, args.pages)
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.pages, '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append((os.path.basename(path), f.read()))
+    expected = {}
+    expected_path = os.path.join(args.pages, 'expected.json')
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding='utf-8') as f:
+            expected = json.load(f)
+
+    results = run(pages, expected, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'variant':32} {'parse ms':>9} {'extr ms':>8} {'tot ms':>8} {'precision':>10} {'recall':>7} {'exakt':>6}")
+    for r in results:
+        print(f"{r['variant']:32} {r['parse_ms']:9.2f} {r['extract_ms']:8.2f} {r['total_ms']:8.2f}"
+              f" {r.get('precision', float('nan')):10.2f} {r.get('recall', float('nan')):7.2f}"
+              f" {r.get('exact', float('nan')):6.2f}")
+    if expected and os.path.samefile(args.pages, PAGES_DIR):
+        print("(syntetiska sidor: träffsäkerheten gäller markupen i bench/pages, inte riktiga sidor)")
+
+if __name__ == '__main__':
+    main()
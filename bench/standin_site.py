@@ -0,0 +1,302 @@
+"""Lokal ersättare för thelaundrynews.com: syntetiska listsidor i samma
+WordPress-markup som de (också syntetiska) sidorna i bench/pages.
+
+    python bench/standin_site.py                               # 30 sidor på port 8765
+    python bench/standin_site.py --pages 200 --latency 0.1     # 100 ms svarstid per sida
+    python bench/standin_site.py --sources                     # artikellänkarna går till lokala källor
+
+Sidan N finns på / (N=1) och /page/N/, sidor efter sista ger 404. Varje
+svar har en ETag så att inkrementell scraping får 304 på oförändrade sidor.
+Innehållet är deterministiskt: samma sidnummer ger alltid samma artiklar.
+
+Med sources=True får varje källa en egen lokal server (egen port = egen
+domän för appen) som serverar artiklarnas sidor med ingress och datum,
+för att prova berikningen. Var sjuttonde artikel ger 404.
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SOURCES = [
+    ('Reuters', 'https://www.reuters.com'),
+    ('OCCRP', 'https://www.occrp.org'),
+    ('BBC News', 'https://www.bbc.co.uk'),
+    ('The Guardian', 'https://www.theguardian.com'),
+    ('Europol', 'https://www.europol.europa.eu'),
+    ('EPPO', 'https://www.eppo.europa.eu'),
+    ('FinCEN', 'https://www.fincen.gov'),
+    ('Global Initiative', 'https://globalinitiative.net'),
+    ('Bloomberg', 'https://www.bloomberg.com'),
+    ('FATF', 'https://www.fatf-gafi.org'),
+]
+SUBJECTS = ['Property developer', 'Gold trader', 'Crypto exchange', 'Bank', 'Casino operator',
+            'Lawyer', 'Restaurant chain', 'Charity director', 'Shipping firm', 'Pension fund manager',
+            'Car dealer', 'Hawala network', 'Art dealer', 'Insurance broker', 'Shell company']
+ACTIONS = ['charged over', 'investigated over', 'fined for', 'convicted of', 'linked to',
+           'sanctioned over', 'raided in probe into', 'jailed for']
+OBJECTS = ['laundering drug proceeds through luxury property', 'bitcoin mixing service used by fraudsters',
+           'invoice fraud scheme across three countries', 'cash smuggling operation at the border',
+           'betting syndicate linked to match fixing', 'yacht purchases hidden behind nominee directors',
+           'sanctions evasion using front companies', 'fake loans issued to a criminal network',
+           'trade-based money laundering through textile exports', 'misuse of donations for terror financing',
+           'life insurance policies bought with criminal cash', 'gold bullion sold without due diligence']
+DETAILS = ['Investigators said the money was moved through shell companies registered offshore.',
+           'Part of the proceeds was used to buy luxury apartments and a villa on the coast.',
+           'Prosecutors traced cash deposits made at two casinos over several months.',
+           'The funds were converted to cryptocurrency and sent to wallets abroad.',
+           'The group bought gold bullion to hide the origin of the money.',
+           'Fake invoices for textile exports were used to move the money between countries.',
+           'Donations to a charity were diverted to accounts controlled by the suspects.',
+           'Cash from a chain of restaurants was mixed with the criminal proceeds.',
+           'Loans were issued to companies controlled by the network and never repaid.',
+           'Life insurance policies were bought and cancelled shortly afterwards.']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December']
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="en-GB">
+<head>
+  <meta charset="UTF-8">
+  <title>The Laundry News &#8211; Page {page}</title>
+</head>
+<body class="home blog paged paged-{page}">
+  <header id="masthead" class="site-header">
+    <p class="site-title"><a href="/">The Laundry News</a></p>
+    <nav class="main-navigation"><ul>
+      <li><a href="/">Home</a></li>
+      <li><a href="/about/">About</a></li>
+    </ul></nav>
+  </header>
+  <div id="content" class="site-content">
+    <main id="main" class="site-main">
+"""
+CARD = """      <article id="post-{post}" class="post type-post status-publish format-standard hentry">
+        <div class="entry-meta">
+          <span class="source">{source}</span>
+          <span class="posted-on"><time class="entry-date published">{date}</time></span>
+        </div>
+        <h2 class="entry-title"><a href="{url}" target="_blank" rel="noopener">{title}</a></h2>
+        <div class="entry-summary"><p>Read the full story at {source}.</p></div>
+      </article>
+"""
+PAGE_FOOT = """    </main>
+  </div>
+  <footer class="site-footer"><p>&copy; The Laundry News</p></footer>
+</body>
+</html>
+"""
+
+ARTICLE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8">
+  <title>{title}</title>
+  <meta property="og:description" content="{title}">
+  <meta property="article:published_time" content="{published}T08:30:00Z">
+</head>
+<body>
+  <header><nav><a href="/">Home</a> <a href="/news/">News</a></nav></header>
+  <main>
+    <article>
+      <h1>{title}</h1>
+      <p class="byline">By Staff Reporter</p>
+      {paragraphs}
+      <figure><figcaption>Photo: archive</figcaption></figure>
+    </article>
+  </main>
+  <footer><p>Related: markets, sport, weather and more news from around the world.</p></footer>
+</body>
+</html>
+"""
+
+def render_page(page, per_page=12, source_urls=None):
+    """Listsida nummer `page` (nyast först: lägre sidnummer = senare datum).
+
+    `source_urls` ersätter källornas domäner i artikellänkarna (samma ordning som SOURCES).
+    """
+    rnd = random.Random(page)
+    parts = [PAGE_HEAD.format(page=page)]
+    for i in range(per_page):
+        source, domain = rnd.choice(SOURCES)
+        if source_urls:
+            domain = source_urls[SOURCES.index((source, domain))]
+        title = f"{rnd.choice(SUBJECTS)} {rnd.choice(ACTIONS)} {rnd.choice(OBJECTS)} ({page}-{i})"
+        year = 2025 - page // 40
+        parts.append(CARD.format(
+            post=page * 100 + i,
+            source=escape(source),
+            date=f"{rnd.randint(1, 28)} {rnd.choice(MONTHS)}, {year}",
+            url=f"{domain}/news/{page}-{i}",
+            title=escape(title),
+        ))
+    parts.append(PAGE_FOOT)
+    return ''.join(parts).encode('utf-8')
+
+def render_article(page, i):
+    """Artikeln bakom länken /news/{page}-{i}: ingress med detaljer som inte står i rubriken"""
+    rnd = random.Random(page * 1000 + i)
+    details = rnd.sample(DETAILS, 2)
+    paragraphs = [f"Authorities announced the case on Tuesday after an investigation lasting {rnd.randint(2, 30)} months. "
+                  f"{details[0]}",
+                  f"{details[1]} The suspects deny wrongdoing and the case continues.",
+                  "Share this article"]
+    return ARTICLE.format(
+        title=f"News {page}-{i}",
+        published=f"{2025 - page // 40}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        paragraphs='\n      '.join(f"<p>{escape(p)}</p>" for p in paragraphs),
+    ).encode('utf-8')
+
+class StandInSite:
+    """Trådad HTTP-server som serverar `pages` listsidor med `latency` sekunders fördröjning"""
+
+    def __init__(self, pages=30, latency=0.0, per_page=12, host='127.0.0.1', port=0, sources=False):
+        self.pages = pages
+        self.latency = latency
+        self.per_page = per_page
+        self.requests = 0
+        self.source_requests = 0
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.source_servers = []
+        if sources:
+            for _ in SOURCES:
+                server = ThreadingHTTPServer((host, 0), self._source_handler())
+                server.daemon_threads = True
+                self.source_servers.append(server)
+        self.threads = []
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def source_urls(self):
+        return [f"http://{host}:{port}" for host, port in (s.server_address[:2] for s in self.source_servers)]
+
+    def page(self, page):
+        with self.lock:
+            if page not in self.cache:
+                body = render_page(page, self.per_page, self.source_urls)
+                self.cache[page] = (body, '"%s"' % hashlib.sha1(body).hexdigest()[:16])
+            return self.cache[page]
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with site.lock:
+                    site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                parts = [p for p in self.path.split('?')[0].split('/') if p]
+                if not parts:
+                    page = 1
+                elif len(parts) == 2 and parts[0] == 'page' and parts[1].isdigit():
+                    page = int(parts[1])
+                else:
+                    page = 0
+                if not 1 <= page <= site.pages:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body, etag = site.page(page)
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=UTF-8')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def _source_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with site.lock:
+                    site.source_requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                parts = [p for p in self.path.split('?')[0].split('/') if p]
+                numbers = parts[1].split('-') if len(parts) == 2 and parts[0] == 'news' else []
+                if len(numbers) != 2 or not all(n.isdigit() for n in numbers) or \
+                        (int(numbers[0]) * 100 + int(numbers[1])) % 17 == 0:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = render_article(int(numbers[0]), int(numbers[1]))
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=UTF-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        for server in [self.server] + self.source_servers:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in [self.server] + self.source_servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.0, help='sekunder per svar')
+    parser.add_argument('--per-page', type=int, default=12)
+    parser.add_argument('--sources', action='store_true', help='servera artiklarnas sidor från lokala källor')
+    args = parser.parse_args()
+
+    site = StandInSite(args.pages, args.latency, args.per_page, port=args.port, sources=args.sources)
+    print(f"Serverar {args.pages} sidor på {site.base_url} (fördröjning {args.latency}s)")
+    if args.sources:
+        print(f"Källor: {', '.join(site.source_urls)}")
+    for server in site.source_servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""Benchmarksvit som körs helt offline: mikrobenchmarks på de syntetiska
+listsidorna i bench/pages och en hel scraping mot den lokala sajten i bench/standin_site.py.
+
+    python bench/suite.py                                # alla benchmarks, tabell
+    python bench/suite.py --json --out resultat.json     # maskinläsbart
+    python bench/suite.py --compare baslinje.json        # jämför mot en tidigare körning
+    python bench/suite.py --only parse,classify          # bara vissa
+    python bench/suite.py --site-pages 100 --site-latency 0.05 --workers 8
+    python bench/suite.py --only scrape --scrape-repeat 5   # fler mätningar av scrapingen
+
+Varje resultat har median, min och standardavvikelse över mätningarna;
+--compare markerar förändringar som ryms i mätningarnas spridning.
+
+Appen körs i en temporär katalog (egen databas, kontrollpunkt, snapshot),
+så befintliga filer i repot rörs inte.
+"""
+import argparse
+import atexit
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+PAGES_DIR = os.path.join(BENCH_DIR, 'pages')
+
+# Appen läser sökvägar och startinställningar vid import
+START_DIR = os.getcwd()
+if __name__ == '__mp_main__':
+    # Appens parsningsprocesser importerar skriptet igen; de ärver miljön och katalogen
+    WORK_DIR = START_DIR
+else:
+    WORK_DIR = tempfile.mkdtemp(prefix='laundry-bench-')
+    atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+    os.environ.setdefault('SCRAPE_ON_STARTUP', '0')
+    os.environ['ARTICLES_DB'] = os.path.join(WORK_DIR, 'articles.db')
+    os.environ['ARTICLES_SNAPSHOT'] = os.path.join(WORK_DIR, 'articles.snapshot')
+    os.environ['EXPORT_CACHE_DIR'] = os.path.join(WORK_DIR, 'export_cache')
+    os.environ['PAGE_CACHE_DIR'] = os.path.join(WORK_DIR, 'page_cache')
+    os.chdir(WORK_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# Appens utskrifter (även från bakgrundstrådar) går till stderr; stdout är bara resultatet
+OUTPUT = sys.stdout
+sys.stdout = sys.stderr
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import app  # noqa: E402
+from standin_site import StandInSite  # noqa: E402
+
+RESULT_FORMAT = 1
+
+def measure(fn, repeat, number=1):
+    """Kör fn number gånger per mätning, repeat mätningar; ms per anrop"""
+    fn()  # uppvärmning
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append(1000 * (time.perf_counter() - start) / number)
+    return summarize(samples, 'ms', number)
+
+def summarize(samples, unit, number=1):
+    return {
+        'unit': unit,
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'repeat': len(samples),
+        'number': number,
+    }
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(PAGES_DIR, '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+def synthetic_articles(pages, count):
+    """count artiklar byggda av bench/pages-sidornas artiklar, med unika titlar"""
+    base = [a for content in pages for a in app.parse_page(content, set())]
+    articles = []
+    for i in range(count):
+        article = dict(base[i % len(base)])
+        article['title'] = f"{article['title']} #{i}"
+        articles.append(article)
+    return articles
+
+def bench_parse(pages, args):
+    return measure(lambda: [BeautifulSoup(c, app.HTML_PARSER) for c in pages], args.repeat), len(pages)
+
+def bench_extract_cards(pages, args):
+    soups = [BeautifulSoup(c, app.HTML_PARSER) for c in pages]
+    return measure(lambda: [app.extract_cards(s) for s in soups], args.repeat), len(pages)
+
+def bench_extract_text(pages, args):
+    # Textheuristiken muterar inte soupen, så samma träd kan återanvändas
+    soups = [BeautifulSoup(c, app.HTML_PARSER) for c in pages]
+    return measure(lambda: [app.extract_text_lines(s) for s in soups], args.repeat), len(pages)
+
+def bench_link_match(pages, args):
+    indexes = []
+    for content in pages:
+        soup = BeautifulSoup(content, app.HTML_PARSER)
+        links = {a.get_text(strip=True): a['href'] for a in soup.find_all('a', href=True)
+                 if app.is_external_link(a['href']) and len(a.get_text(strip=True)) > 20}
+        titles = [c[2] for c in app.extract_cards(soup)]
+        indexes.append((links, titles))
+
+    def run():
+        for links, titles in indexes:
+            index = app.LinkIndex(links)
+            for title in titles:
+                index.best_match(title)
+    return measure(run, args.repeat), len(pages)
+
+def bench_classify(pages, args):
+    candidates = [(c[0], c[2]) for content in pages
+                  for c in app.extract_cards(BeautifulSoup(content, app.HTML_PARSER))]
+    return measure(lambda: [app.classify_article(t, s) for s, t in candidates], args.repeat), len(candidates)
+
+def bench_parse_page(pages, args):
+    return measure(lambda: [app.parse_page(c, set()) for c in pages], args.repeat), len(pages)
+
+def bench_export_csv(pages, args):
+    articles = synthetic_articles(pages, args.export_rows)
+    return measure(lambda: b''.join(app.stream_csv(app.export_rows(articles))), max(args.repeat // 4, 3)), len(articles)
+
+def bench_export_excel(pages, args):
+    articles = synthetic_articles(pages, args.export_rows)
+    path = os.path.join(WORK_DIR, 'bench.xlsx')
+    return measure(lambda: app.write_excel(path, app.export_rows(articles)), max(args.repeat // 4, 3)), len(articles)
+
+def bench_analytics(pages, args):
+    # Materialiserade aggregat: frågan läser bara matriserna, oavsett antal artiklar
+    articles = synthetic_articles(pages, args.export_rows)
+    for i, article in enumerate(articles):
+        article.update(id=i + 1, scrape_run=1, position=i)
+    index = app.FacetIndex()
+    index.rebuild(articles)
+    return measure(lambda: (index.analytics('month'), index.analytics('week')), args.repeat), 2
+
+MICRO = {
+    # namn: (funktion, vad 'per' avser)
+    'parse': (bench_parse, 'sida'),
+    'extract_cards': (bench_extract_cards, 'sida'),
+    'extract_text': (bench_extract_text, 'sida'),
+    'link_match': (bench_link_match, 'sida'),
+    'classify': (bench_classify, 'artikel'),
+    'parse_page': (bench_parse_page, 'sida'),
+    'export_csv': (bench_export_csv, 'rad'),
+    'export_excel': (bench_export_excel, 'rad'),
+    'analytics': (bench_analytics, 'fråga'),
+}
+
+def stage_totals():
+    """Summerad tid och antal per scrapingsteg ur /metrics-histogrammet"""
+    with app.SCRAPE_STAGE_SECONDS.lock:
+        return {key[0]: {'seconds': total, 'count': count}
+                for key, (_, total, count) in app.SCRAPE_STAGE_SECONDS.values.items()}
+
+SCRAPE_SCENARIOS = (('scrape_full', False, False), ('scrape_incremental', True, False), ('scrape_replay', False, True))
+
+def bench_scrape(args):
+    """Full scraping, en inkrementell, en replay ur sidcachen och berikning mot den lokala sajten.
+
+    Scenarierna körs --scrape-repeat gånger i följd. Första fulla
+    körningen lägger in artiklarna, de följande uppdaterar samma artiklar;
+    mätningarna finns var för sig i 'samples'. Före varje ny berikning
+    glöms de hämtade källorna, så att samma sidor hämtas igen.
+    """
+    app.data_loaded.wait()
+    app.SCRAPE_RATE = args.rate
+    app.ENRICH_RATE = args.rate
+    # Parsningsprocesserna startas före mätningen
+    for content in load_pages():
+        app.parse_listing_in_pool(content)
+    runs = {name: [] for name, _, _ in SCRAPE_SCENARIOS + (('enrich', None, None),)}
+    with StandInSite(args.site_pages, args.site_latency, sources=True) as site:
+        app.BASE_URL = site.base_url
+        for _ in range(args.scrape_repeat):
+            for name, incremental, replay in SCRAPE_SCENARIOS:
+                before = stage_totals()
+                requests_before = site.requests
+                start = time.perf_counter()
+                app.scrape_laundry_news(max_pages=args.site_pages + 1, workers=args.workers,
+                                        incremental=incremental, resume=False, replay=replay)
+                elapsed = time.perf_counter() - start
+                after = stage_totals()
+                requests = site.requests - requests_before
+                pages = (sum(len(app.page_cache.pages(run)) for run, _ in app.page_cache.replay_runs())
+                         if replay else requests)
+                runs[name].append({
+                    'elapsed': elapsed,
+                    'requests': requests,
+                    'pages': pages,
+                    'articles': app.scrape_status['total_articles'],
+                    'error': app.scrape_status['error'],
+                    'stages_s': {stage: totals['seconds'] - before.get(stage, {}).get('seconds', 0.0)
+                                 for stage, totals in after.items()},
+                })
+
+            conn = app.store.connection()
+            with conn:
+                conn.execute("DELETE FROM article_sources")
+            requests_before = site.source_requests
+            start = time.perf_counter()
+            app.enrich_articles()
+            elapsed = time.perf_counter() - start
+            requests = site.source_requests - requests_before
+            runs['enrich'].append({'elapsed': elapsed, 'requests': requests, 'pages': requests,
+                                   'articles': requests, 'error': app.scrape_status['error']})
+
+    results = {}
+    for name, samples in runs.items():
+        elapsed = [run['elapsed'] for run in samples]
+        result = summarize(elapsed, 's')
+        last = samples[-1]
+        result.update(
+            samples=elapsed,
+            requests=last['requests'],
+            pages_per_s=last['pages'] / result['median'] if result['median'] else None,
+            articles=last['articles'],
+            error=next((run['error'] for run in samples if run['error']), None),
+        )
+        if 'stages_s' in last:
+            result['stages_s'] = {stage: statistics.median(run['stages_s'].get(stage, 0.0) for run in samples)
+                                  for stage in sorted(last['stages_s'])}
+        results[name] = result
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def spread(result):
+    """Standardavvikelsen relativt medianen, None om den inte går att säga (en mätning, äldre resultat)"""
+    if result.get('repeat', 1) < 2 or 'stdev' not in result or not result['median']:
+        return None
+    return result['stdev'] / result['median']
+
+def compare(results, baseline):
+    """Medianförändring mot baslinjen; '~' när den ryms inom två standardavvikelser
+    (den största av de båda körningarnas), '?' när spridningen är okänd"""
+    print(f"\n{'benchmark':22} {'baslinje':>12} {'nu':>12} {'förändring':>11} {'spridning':>10}", file=OUTPUT)
+    for name, result in results['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            continue
+        change = (result['median'] - old['median']) / old['median'] * 100 if old['median'] else float('nan')
+        spreads = [spread(result), spread(old)]
+        if None in spreads:
+            noise, mark = '', '?'
+        else:
+            noise = f"±{200 * max(spreads):.1f}%"
+            mark = '~' if abs(change) <= 200 * max(spreads) else ''
+        print(f"{name:22} {old['median']:10.3f}{old['unit']:>2} {result['median']:10.3f}{result['unit']:>2}"
+              f" {change:+10.1f}% {noise:>10} {mark}", file=OUTPUT)
+    print("~ = inom bruset (två standardavvikelser), ? = spridningen okänd (en mätning)", file=OUTPUT)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', default='', help='kommaseparerade benchmarknamn')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--export-rows', type=int, default=5000)
+    parser.add_argument('--site-pages', type=int, default=30)
+    parser.add_argument('--site-latency', type=float, default=0.02, help='sekunder per svar')
+    parser.add_argument('--workers', type=int, default=app.SCRAPE_WORKERS)
+    parser.add_argument('--rate', type=float, default=1000, help='max förfrågningar per sekund')
+    parser.add_argument('--scrape-repeat', type=int, default=3, help='mätningar per scrapingscenario')
+    parser.add_argument('--json', action='store_true', help='skriv resultatet som JSON på stdout')
+    parser.add_argument('--out', help='spara resultatet som JSON i en fil')
+    parser.add_argument('--compare', metavar='BASLINJE', help='JSON från en tidigare körning')
+    args = parser.parse_args()
+    # Relativa sökvägar gäller katalogen skriptet startades i, inte arbetskatalogen
+    args.out = args.out and os.path.join(START_DIR, args.out)
+    args.compare = args.compare and os.path.join(START_DIR, args.compare)
+
+    only = {name for name in args.only.split(',') if name}
+    pages = load_pages()
+    output = {
+        'format': RESULT_FORMAT,
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'parser': app.HTML_PARSER,
+        'config': {key: value for key, value in vars(args).items() if key not in ('json', 'out', 'compare', 'only')},
+        'results': {},
+    }
+
+    for name, (bench, per) in MICRO.items():
+        if only and name not in only:
+            continue
+        result, items = bench(pages, args)
+        result.update(per=per, items=items, per_item=result['median'] / items)
+        output['results'][name] = result
+    if not only or only & {'scrape_full', 'scrape_incremental', 'scrape_replay', 'enrich', 'scrape'}:
+        output['results'].update(bench_scrape(args))
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(output, indent=2, ensure_ascii=False), file=OUTPUT)
+    else:
+        print(f"{'benchmark':22} {'median':>10} {'min':>10} {'stdav':>10} {'n':>3} {'per enhet':>16}", file=OUTPUT)
+        for name, r in output['results'].items():
+            per_item = f"{r['per_item']:.4f} ms/{r['per']}" if 'per_item' in r else f"{r['pages_per_s']:.1f} sidor/s"
+            print(f"{name:22} {r['median']:8.3f}{r['unit']:>2} {r['min']:8.3f}{r['unit']:>2}"
+                  f" {r['stdev']:8.3f}{r['unit']:>2} {r['repeat']:3d} {per_item:>16}", file=OUTPUT)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(output, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""Gemensamt för testerna: appen importeras mot en tom temporär katalog.
+
+Miljövariablerna måste vara satta före importen - databasen, snapshoten
+och cacharna öppnas på modulnivå. Checkpoint och valideringsfilen skrivs
+i arbetskatalogen, så testerna körs i den temporära katalogen. Ingen
+scraping vid start och ingen processpool för parsningen.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+WORK_DIR = tempfile.mkdtemp(prefix='laundry-news-tests-')
+os.environ.update(
+    SCRAPE_ON_STARTUP='0',
+    SCRAPE_PARSE_PROCESSES='0',
+    ARTICLES_DB=os.path.join(WORK_DIR, 'articles.db'),
+    ARTICLES_SNAPSHOT=os.path.join(WORK_DIR, 'articles.snapshot'),
+    PAGE_CACHE_DIR=os.path.join(WORK_DIR, 'page_cache'),
+    EXPORT_CACHE_DIR=os.path.join(WORK_DIR, 'exports'),
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORK_DIR)
+
+import app  # noqa: E402
+
+# Uppstarten laddar (de inga) artiklarna i en bakgrundstråd
+app.data_loaded.wait()
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
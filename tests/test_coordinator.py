@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+import app
+
+@pytest.fixture
+def coordinator(tmp_path):
+    return app.ScrapeCoordinator(app.ArticleStore(str(tmp_path / 'articles.db')), ttl=0.3)
+
+def test_only_one_holder(coordinator):
+    token = coordinator.acquire()
+    assert token
+    assert coordinator.is_held()
+    assert coordinator.acquire() is None
+    coordinator.release(token)
+    assert not coordinator.is_held()
+    assert coordinator.acquire()
+
+def test_expired_lease_is_taken_over(coordinator):
+    old = coordinator.acquire()
+    time.sleep(0.4)
+    assert not coordinator.is_held()
+    new = coordinator.acquire()
+    assert new and new != old
+    # Den gamla innehavaren har förlorat lånet och kan inte förnya eller släppa det
+    assert not coordinator.renew(old)
+    assert not coordinator.publish(dict(app.scrape_status, is_scraping=True), old)
+    coordinator.release(old)
+    assert coordinator.is_held()
+    assert coordinator.renew(new)
+
+def test_keep_alive_renews_lease(coordinator):
+    token = coordinator.acquire()
+    with coordinator.keep_alive(token):
+        time.sleep(0.8)
+        assert coordinator.is_held()
+        assert coordinator.acquire() is None
+    time.sleep(0.4)
+    assert coordinator.acquire()
+
+def test_status_of_dead_holder_is_not_scraping(coordinator, monkeypatch):
+    monkeypatch.setattr(app, 'STATUS_CACHE_SECONDS', 0.1)
+    token = coordinator.acquire()
+    assert coordinator.publish(dict(app.scrape_status, is_scraping=True, progress='Sida 3'), token)
+    assert coordinator.status()['is_scraping']
+    time.sleep(0.4)
+    status = coordinator.status()
+    assert not status['is_scraping']
+    assert 'avbröts' in status['progress']
+
+def test_status_is_cached_between_publishes(coordinator, monkeypatch):
+    token = coordinator.acquire()
+    coordinator.publish(dict(app.scrape_status, progress='första'), token)
+    reads = []
+    read_status = coordinator._read_status
+    monkeypatch.setattr(coordinator, '_read_status', lambda: reads.append(1) or read_status())
+    for _ in range(5):
+        assert coordinator.status()['progress'] == 'första'
+    assert len(reads) == 1
+    coordinator.publish(dict(app.scrape_status, progress='andra'), token)
+    assert coordinator.status()['progress'] == 'andra'
+    assert len(reads) == 2
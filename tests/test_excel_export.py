@@ -0,0 +1,66 @@
+import os
+
+from openpyxl import load_workbook
+
+import app
+
+def articles(prefix, count):
+    return [{'title': f"{prefix} laundering case {i}", 'source': 'BBC News', 'date': '1 March, 2024',
+             'url': f"https://bbc.example/{prefix}-{i}", **app.classify_article(f"{prefix} case {i}", 'BBC News')}
+            for i in range(count)]
+
+def rows(file):
+    with file:
+        # Write-only-filer saknar dimension, så raderna räknas
+        return sum(1 for _ in load_workbook(file, read_only=True)['Artiklar'].iter_rows()) - 1
+
+def workbooks():
+    return sorted(name for name in os.listdir(app.EXPORT_CACHE_DIR) if name.endswith('.xlsx'))
+
+def test_workbook_is_named_after_the_index_version():
+    app.ingest_articles(articles('First', 5), app.store.next_run(), 0)
+    # En annan worker har skrivit till databasen, men indexet här har inte synkats än
+    app.store.upsert_articles(articles('Unsynced', 3), app.store.next_run())
+    assert app.store.dataset_version() > app._index_sync['version']
+    
+    file = app.cached_excel_export()
+    assert os.path.basename(file.name) == os.path.basename(app.excel_path(app._index_sync['version']))
+    assert rows(file) == len(app.article_index)
+    app.sync_indexes()
+
+def test_sync_during_write_is_not_cached_under_the_old_version(monkeypatch):
+    app.sync_indexes()
+    write_excel = app.write_excel
+    calls = []
+
+    def write_and_sync(path, rows):
+        calls.append(1)
+        write_excel(path, rows)
+        if len(calls) == 1:
+            app.ingest_articles(articles('Concurrent', 2), app.store.next_run(), 0)
+
+    monkeypatch.setattr(app, 'write_excel', write_and_sync)
+    file = app.cached_excel_export()
+    assert len(calls) == 2
+    assert os.path.basename(file.name) == os.path.basename(app.excel_path(app._index_sync['version']))
+    assert rows(file) == len(app.article_index)
+
+def test_previous_version_is_kept_and_open_file_survives_cleanup():
+    first = app.cached_excel_export()
+    app.ingest_articles(articles('Second', 2), app.store.next_run(), 0)
+    second = app.cached_excel_export()
+    app.ingest_articles(articles('Third', 2), app.store.next_run(), 0)
+    third = app.cached_excel_export()
+    kept = workbooks()
+    assert os.path.basename(first.name) not in kept
+    assert {os.path.basename(second.name), os.path.basename(third.name)} <= set(kept)
+    assert len(kept) == 2
+    # Filen som redan öppnats går att läsa fast den städats bort
+    assert rows(first) == rows(third) - 4
+    second.close()
+
+def test_export_route_sends_the_workbook():
+    response = app.app.test_client().get('/export/excel')
+    assert response.status_code == 200
+    assert response.data[:2] == b'PK'
+    response.close()
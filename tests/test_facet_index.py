@@ -0,0 +1,134 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import app
+
+SOURCES = ['BBC News', 'Reuters', 'The Guardian', 'OCCRP', 'Europol', 'Rare Wire']
+MODUS = [label for label, _ in app.CLASSIFICATION_RULES['modus']]
+
+def make_articles(n, seed=1, start_id=1):
+    rnd = random.Random(seed)
+    articles = []
+    for i in range(n):
+        day = date(2023, 1, 1) + timedelta(days=rnd.randrange(500))
+        published = day.isoformat() if rnd.random() < 0.3 else None
+        # Ungefär var tionde saknar datum; 'Rare Wire' och 'spel-kasino' är sällsynta (postningslistorna)
+        text = '' if rnd.random() < 0.1 else f"{day.day} {day.strftime('%B')}, {day.year}"
+        source = 'Rare Wire' if rnd.random() < 0.02 else rnd.choice(SOURCES[:-1])
+        modus = rnd.sample([m for m in MODUS if m != 'spel-kasino'], rnd.randint(0, 2))
+        if rnd.random() < 0.02:
+            modus.append('spel-kasino')
+        articles.append({
+            'id': start_id + i,
+            'title': f"Artikel {start_id + i}",
+            'source': source,
+            'date': text,
+            'published': published,
+            'url': f"https://example.com/{start_id + i}" if rnd.random() < 0.9 else None,
+            'source_type': rnd.choice(['news', 'official', 'report', 'unknown']),
+            'topic': rnd.choice(['fraud', 'crime', 'corruption']),
+            'severity': rnd.choice(['high', 'medium']),
+            'modus': modus or [app.DEFAULT_CLASSIFICATION['modus']],
+            'scrape_run': rnd.randint(1, 8),
+            'position': rnd.randrange(1000),
+            'cluster_id': None,
+        })
+    return articles
+
+def article_day(article):
+    if article['published']:
+        return date.fromisoformat(article['published'])
+    return app.parse_article_date(article['date'])
+
+def brute_force(articles, filters, since=None, until=None, order='scrape'):
+    """Filtrera och sortera dictarna direkt - det query() ska ge"""
+    found = []
+    for article in articles:
+        day = article_day(article)
+        if not all(set(article['modus']) & set(values) if facet == 'modus' else article[facet] in values
+                   for facet, values in filters.items()):
+            continue
+        if day is None and (since or until or order == 'date'):
+            continue
+        if since and day < since or until and day > until:
+            continue
+        found.append(article)
+    key = lambda a: (-a['scrape_run'], a['position'], a['id'])
+    if order == 'date':
+        key = lambda a: (-article_day(a).toordinal(), -a['scrape_run'], a['position'], a['id'])
+    return [a['id'] for a in sorted(found, key=key)]
+
+def query_all(index, limit, **kwargs):
+    """Alla sidor via cursorn"""
+    ids, cursor = [], None
+    while True:
+        page, cursor = index.query(cursor=cursor, limit=limit, **kwargs)
+        assert len(page) <= limit
+        ids.extend(a['id'] for a in page)
+        if cursor is None:
+            return ids
+
+FILTERS = [
+    {},
+    {'source': ['Reuters']},
+    {'source': ['Rare Wire']},
+    {'source': ['Rare Wire', 'OCCRP'], 'severity': ['high']},
+    {'modus': ['spel-kasino']},
+    {'modus': ['fastigheter', 'lån'], 'topic': ['fraud']},
+    {'modus': ['spel-kasino'], 'source': ['Rare Wire']},
+    {'source': ['Nobody']},
+]
+
+@pytest.fixture(scope='module')
+def articles():
+    return make_articles(3000)
+
+@pytest.fixture(scope='module')
+def index(articles):
+    index = app.FacetIndex()
+    index.rebuild(articles)
+    return index
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('order', ['scrape', 'date'])
+def test_query_matches_brute_force(index, articles, filters, order):
+    assert query_all(index, 97, filters=filters, order=order) == brute_force(articles, filters, order=order)
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('since, until', [(date(2023, 6, 1), None), (None, date(2023, 2, 1)),
+                                          (date(2024, 1, 1), date(2024, 1, 31)), (date(2023, 3, 1), date(2024, 3, 1))])
+@pytest.mark.parametrize('order', ['scrape', 'date'])
+def test_date_range_matches_brute_force(index, articles, filters, since, until, order):
+    expected = brute_force(articles, filters, since, until, order)
+    assert query_all(index, 50, filters=filters, since=since, until=until, order=order) == expected
+
+def test_selective_filter_uses_posting_lists(index):
+    index._sort()
+    conditions = index._conditions({'source': ['Rare Wire']})
+    assert index._selective_rows(conditions, 'scrape', 0, len(index)) is not None
+    assert index._selective_rows(index._conditions({'source': ['Reuters']}), 'scrape', 0, len(index)) is None
+
+def test_cursor_continues_after_last_article(index, articles):
+    expected = brute_force(articles, {'source': ['Rare Wire']})
+    first, cursor = index.query(filters={'source': ['Rare Wire']}, limit=10)
+    rest, _ = index.query(filters={'source': ['Rare Wire']}, cursor=cursor, limit=len(expected))
+    assert [a['id'] for a in first + rest] == expected
+
+def test_add_replaces_and_appends_like_rebuild(articles):
+    index = app.FacetIndex()
+    index.rebuild(articles[:2000])
+    changed = [dict(a, source='Rare Wire', modus=['spel-kasino'], scrape_run=9) for a in articles[:2000:50]]
+    index.add(changed + articles[2000:])
+    final = {a['id']: a for a in articles}
+    final.update((a['id'], a) for a in changed)
+    final = sorted(final.values(), key=lambda a: a['id'])
+    
+    rebuilt = app.FacetIndex()
+    rebuilt.rebuild(final)
+    for filters in FILTERS:
+        for order in ('scrape', 'date'):
+            assert query_all(index, 200, filters=filters, order=order) == brute_force(final, filters, order=order)
+    assert index.stats() == rebuilt.stats()
+    assert index.get(changed[0]['id'])['source'] == 'Rare Wire'
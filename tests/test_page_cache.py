@@ -0,0 +1,129 @@
+from html import escape
+
+import pytest
+
+import app
+
+PER_PAGE = 12
+
+PAGE = """<!DOCTYPE html>
+<html lang="en-GB">
+<head><meta charset="UTF-8"><title>The Laundry News &#8211; Page {page}</title></head>
+<body class="home blog paged-{page}">
+  <main id="main" class="site-main">
+{cards}  </main>
+</body>
+</html>
+"""
+
+CARD = """    <article id="post-{post}" class="post type-post status-publish hentry">
+      <div class="entry-meta">
+        <span class="source">BBC News</span>
+        <span class="posted-on"><time class="entry-date published">1 March, 2024</time></span>
+      </div>
+      <h2 class="entry-title"><a href="https://bbc.example/{post}" target="_blank">{title}</a></h2>
+    </article>
+"""
+
+class Site:
+    """Listsidorna, nyast först; publish lägger nya artiklar överst så att de äldre flyttar nedåt"""
+
+    def __init__(self, count):
+        self.posts = list(range(count, 0, -1))
+        self.requests = 0
+
+    def publish(self, count):
+        newest = self.posts[0]
+        self.posts[:0] = range(newest + count, newest, -1)
+
+    def titles(self):
+        return [f"Bank fined over laundering case number {post}" for post in self.posts]
+
+    def render(self, page):
+        posts = self.posts[(page - 1) * PER_PAGE:page * PER_PAGE]
+        if not posts:
+            return None
+        cards = ''.join(CARD.format(post=post, title=escape(f"Bank fined over laundering case number {post}"))
+                        for post in posts)
+        return PAGE.format(page=page, cards=cards).encode('utf-8')
+
+class Response:
+    def __init__(self, status_code, content=b''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'Content-Type': 'text/html; charset=UTF-8'}
+
+@pytest.fixture
+def site(monkeypatch):
+    site = Site(65)
+
+    def fetch_page(session, page, validators=None, attempts=1):
+        site.requests += 1
+        content = site.render(page)
+        return Response(200, content) if content else Response(404)
+
+    monkeypatch.setattr(app, 'fetch_page', fetch_page)
+    return site
+
+def stored():
+    """Sajtens (titel, scrape_run) i listordning: senaste körningen först, sedan position.
+    Databasen delas med de andra testerna, så deras artiklar räknas inte."""
+    return app.store.connection().execute(
+        "SELECT title, scrape_run FROM articles WHERE title LIKE 'Bank fined over laundering case number %' "
+        "ORDER BY scrape_run DESC, position").fetchall()
+
+def scrape(**kwargs):
+    app.scrape_laundry_news(max_pages=20, workers=2, resume=False, **kwargs)
+    assert app.scrape_status['error'] is None
+
+def test_replay_after_incremental_run_restores_every_article(site):
+    scrape(incremental=False)
+    site.publish(5)
+    scrape(incremental=True)
+    live = stored()
+    assert [title for title, _ in live] == site.titles()
+    
+    requests = site.requests
+    scrape(incremental=False, replay=True)
+    assert site.requests == requests  # inget nätverk
+    replayed = stored()
+    assert [title for title, _ in replayed] == site.titles()
+    # Varje artikel lades in på nytt av replay, ingen ligger kvar från den levande körningen
+    live_runs = dict(live)
+    assert all(run > live_runs[title] for title, run in replayed)
+
+def test_replay_uses_runs_from_last_full_run(site):
+    scrape(incremental=False)
+    full = app.store.connection().execute("SELECT MAX(scrape_run) FROM articles").fetchone()[0]
+    site.publish(3)
+    scrape(incremental=True)
+    assert [run for run, _ in app.page_cache.replay_runs()][0] == full
+    assert [incremental for _, incremental in app.page_cache.replay_runs()] == [False, True]
+    assert app.page_cache.pages(full) == list(range(1, 7))
+
+def test_prune_keeps_pages_of_last_full_run(site):
+    scrape(incremental=False)
+    site.publish(PER_PAGE)
+    scrape(incremental=False)
+    app.page_cache.prune()
+    runs = app.page_cache.replay_runs()
+    assert len(runs) == 1 and not runs[0][1]
+    for page in app.page_cache.pages(runs[0][0]):
+        assert app.page_cache.load(page, runs[0][0]).content == site.render(page)
+
+def test_empty_incremental_run_does_not_lend_its_id(site):
+    scrape(incremental=False)
+    scrape(incremental=True)  # inget nytt: sparar inga artiklar, men sida 1 cachas
+    empty = app.page_cache.replay_runs()[-1]
+    assert empty[1]
+    site.posts[40] = 10000  # en rubrik på sida 4 ändras
+    scrape(incremental=False)
+    full = app.store.connection().execute("SELECT MAX(scrape_run) FROM articles").fetchone()[0]
+    assert full > empty[0]
+    assert app.page_cache.replay_runs() == [(full, False)]
+    
+    live = dict(stored())
+    scrape(incremental=False, replay=True)
+    replayed = stored()
+    assert [title for title, _ in replayed][:len(site.posts)] == site.titles()
+    assert all(run > live[title] for title, run in replayed[:len(site.posts)])
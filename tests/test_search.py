@@ -0,0 +1,22 @@
+import pytest
+
+import app
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'x'])
+def test_invalid_limit_is_rejected_like_api_articles(client, limit):
+    search = client.get('/api/search', query_string={'q': 'laundering', 'limit': limit})
+    articles = client.get('/api/articles', query_string={'limit': limit})
+    assert search.status_code == articles.status_code == 400
+    if limit != 'x':
+        assert 'minst 1' in search.get_json()['error']
+
+def test_limit_caps_results(client):
+    app.ingest_articles([{'title': f"Search laundering case {i}", 'source': 'BBC News', 'date': '1 March, 2024',
+                          **app.classify_article(f"Search laundering case {i}", 'BBC News')} for i in range(5)],
+                        app.store.next_run(), 0)
+    result = client.get('/api/search', query_string={'q': 'search laundering', 'limit': 2}).get_json()
+    assert result['count'] == 2 and result['total'] == 5
@@ -0,0 +1,29 @@
+import sqlite3
+
+import app
+
+def test_failed_load_is_retried_and_reported(monkeypatch):
+    calls = []
+    health = []
+
+    def load_existing_articles():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError('database is locked')
+        return False
+
+    def sleep(seconds):
+        # Medan laddningen väntar på nästa försök syns felet i /health
+        health.append(app.app.test_client().get('/health').get_json())
+
+    monkeypatch.setattr(app, 'load_existing_articles', load_existing_articles)
+    monkeypatch.setattr(app, 'backoff_delay', lambda attempt: 0.0)
+    monkeypatch.setattr(app.time, 'sleep', sleep)
+    assert app.load_with_retry() is False
+    assert len(calls) == 3
+    assert [h['status'] for h in health] == ['error', 'error']
+    assert health[-1]['load_error']['error'] == 'database is locked'
+    assert health[-1]['load_error']['attempts'] == 2
+    
+    result = app.app.test_client().get('/health').get_json()
+    assert result['status'] == 'ok' and result['load_error'] is None